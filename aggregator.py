@@ -26,29 +26,54 @@ Presence in player_flow is accepted but ignored (MVP).
 from __future__ import annotations
 
 import argparse
-import calendar
-import math
+import functools
+import heapq
 import json
+import math
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Set, Tuple
 
-SCHEMA_VERSION = "2.1-hb-cadence-rehydrate"
+from heatflow.archive import list_frame_archives
+from heatflow.columns import ColumnExporter
+from heatflow.common import (
+    SCHEMA_VERSION, STREAM_FILES, WORLD_ZDOS_BUCKET_S, WORLD_ZDOS_SCHEMA, WORLD_ZDOS_TYPE, atomic_write_json,
+    ensure_dir, fk, hms_compact, ignore_sigint, iso_utc, parse_fk, parse_ts_to_epoch_s, parse_zk, read_tail_lines, zk,
+)
+from heatflow.deltas import live_delta_name, load_live_seq, write_live_frame
+from heatflow.events import parse_event_line, record_ingest
+from heatflow.frames import (
+    FRAME_REFS_FILENAME, append_frame_ref, encode_frame, frame_content_hash, list_frames, scan_frame_time_range,
+)
+from heatflow.groups import PlayerGroups
+from heatflow.ingest import ParallelIngest
+from heatflow.live import (
+    CadenceView, LiveAgg, flow_edge_count, new_view, parse_cadences, world_count_items, world_zone_count,
+)
+from heatflow.locations import LOCATION_CELL_M, LocationIndex
+from heatflow.precompress import Precompressor, write_bytes_output, write_json_output
+from heatflow.retention import RetentionEngine, parse_retention
+from heatflow.rotation import OnlineRotation, load_rotate_request
+from heatflow.segments import (
+    peek_pending_event_s, pending_bytes, read_new_lines_chunk, read_new_lines_with_reset, rotated_segments,
+    rotated_tail_lines,
+)
+from heatflow.shards import ShardPool, ZoneShards
+from heatflow.spikes import SPIKE_ALERTS_FILENAME, ZoneSpikes
+from heatflow.state_store import STATE_DB_FILENAME, StateStore
+from heatflow.streams import FileSig, StreamState, file_sig, load_offsets, save_offsets, stream_state_dict
+from heatflow.tiles import ZoneBiomes
+from heatflow.tracks import TrackStore
+from heatflow.windows import (
+    EventWindows, new_windows, windows_add, windows_mark, windows_report, windows_safe_offsets, windows_seal,
+    windows_watermark,
+)
+from heatflow.worlds import load_worlds_config
 
 HEALTH_FILENAME = "health.json"
 HEALTH_WRITE_EVERY_S = 3.0
-MAX_FUTURE_EVENT_S = 86400  # 24h guardrail for timestamps
-
-# Stream filenames (fixed names; dirs are configurable)
-STREAM_FILES = {
-    "player_positions": "player_positions.jsonl",
-    "player_flow": "player_flow.jsonl",
-    "hotspots_world_zdos": "hotspots_world_zdos.jsonl",
-}
-
-WORLD_ZDOS_TYPE = "hotspots_world_zdos"
-WORLD_ZDOS_SCHEMA = "zdo_schema"
 
 WORLD_ZDOS_TOPN = 500
 WORLD_ZDOS_QUANTILE_EVERY = 10
@@ -77,56 +102,6 @@ def script_dir() -> str:
     except Exception:
         return os.path.abspath(".")
 
-def ensure_dir(p: str) -> None:
-    os.makedirs(p, exist_ok=True)
-
-def atomic_write_text(path: str, text: str) -> None:
-    ensure_dir(os.path.dirname(path) or ".")
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
-        f.write(text)
-    # Windows can be picky if file is open elsewhere; retry a bit.
-    retries = 25 if os.name == "nt" else 3
-    for i in range(retries):
-        try:
-            os.replace(tmp, path)
-            return
-        except PermissionError:
-            if i == retries - 1:
-                raise
-            time.sleep(0.04)
-
-def atomic_write_json(path: str, obj: Any) -> None:
-    atomic_write_text(path, json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
-
-def parse_ts_to_epoch_s(ts: Any) -> Optional[int]:
-    if not isinstance(ts, str) or not ts.endswith("Z"):
-        return None
-    core = ts[:-1]
-    if "." in core:
-        core = core.split(".", 1)[0]
-    try:
-        st = time.strptime(core, "%Y-%m-%dT%H:%M:%S")
-        return int(calendar.timegm(st))
-    except Exception:
-        return None
-
-def iso_utc(epoch_s: int) -> str:
-    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch_s))
-
-def hms_compact(epoch_s: int) -> str:
-    return time.strftime("%Y%m%dT%H%M%S", time.gmtime(epoch_s))
-
-
-
-def parse_compact_to_epoch_s(compact: str) -> Optional[int]:
-    """Parse YYYYMMDDTHHMMSS (UTC) to epoch seconds."""
-    try:
-        st = time.strptime(compact, "%Y%m%dT%H%M%S")
-        return int(calendar.timegm(st))
-    except Exception:
-        return None
-
 def compute_world_quantiles(values: List[int]) -> Dict[str, Any]:
     if not values:
         return {"p90": None, "p99": None, "n_zones": 0, "max": 0}
@@ -156,6 +131,8 @@ def apply_world_zdos_event(live: LiveAgg, evt: Dict[str, Any]) -> bool:
     if epoch != live.hotspots_world_epoch:
         live.hotspots_world_epoch = epoch
         live.hotspots_world_seen.clear()
+        if live.shards is not None:
+            live.shards.new_epoch()
     zones = evt.get("zones")
     if not isinstance(zones, list):
         return False
@@ -171,15 +148,23 @@ def apply_world_zdos_event(live: LiveAgg, evt: Dict[str, Any]) -> bool:
         if val <= 0:
             continue
         key = zk(int(zx_), int(zy_))
-        if key not in live.hotspots_world_seen:
+        if live.world_touched is not None:
+            live.world_touched[key] = epoch
+        if live.spikes is not None and live.spikes.owner is live:
+            live.spikes.feed(key, val, epoch)
+        if live.shards is not None:
+            live.shards.add_zone(key, val)
+        elif key not in live.hotspots_world_seen:
             live.hotspots_world_counts[key] = val
             live.hotspots_world_seen.add(key)
         else:
             live.hotspots_world_counts[key] = live.hotspots_world_counts.get(key, 0) + val
         ok = True
+    if ok:
+        live.frame_dirty.add("hotspots")
     return ok
 
-def load_world_zdos_cache(path: str, live: LiveAgg) -> bool:
+def load_world_zdos_cache(path: str, live: LiveAgg, bucket_s: int = WORLD_ZDOS_BUCKET_S) -> bool:
     if not os.path.exists(path):
         return False
     try:
@@ -187,7 +172,7 @@ def load_world_zdos_cache(path: str, live: LiveAgg) -> bool:
             raw = json.load(f)
         if not isinstance(raw, dict) or raw.get("schema") != "world_zdos_cache.v1":
             return False
-        if int(raw.get("bucket_s", 0) or 0) != 30:
+        if int(raw.get("bucket_s", 0) or 0) != bucket_s:
             return False
         epoch = raw.get("epoch")
         if not isinstance(epoch, int):
@@ -223,15 +208,15 @@ def load_world_zdos_cache(path: str, live: LiveAgg) -> bool:
     except Exception:
         return False
 
-def save_world_zdos_cache(path: str, live: LiveAgg, last_event_t: Optional[str] = None) -> None:
+def save_world_zdos_cache(path: str, live: LiveAgg, last_event_t: Optional[str] = None, bucket_s: int = WORLD_ZDOS_BUCKET_S) -> None:
     counts = [
         {"zx": parse_zk(k)[0], "zy": parse_zk(k)[1], "count": int(v)}
-        for k, v in live.hotspots_world_counts.items()
+        for k, v in world_count_items(live)
         if v > 0
     ]
     obj = {
         "schema": "world_zdos_cache.v1",
-        "bucket_s": 30,
+        "bucket_s": int(bucket_s),
         "epoch": int(live.hotspots_world_epoch),
         "last_event_t": last_event_t,
         "counts": counts,
@@ -239,33 +224,16 @@ def save_world_zdos_cache(path: str, live: LiveAgg, last_event_t: Optional[str]
     }
     atomic_write_json(path, obj)
 
-def read_tail_lines(path: str, want_lines: int, max_bytes: int = 10_000_000) -> List[str]:
-    try:
-        size = os.path.getsize(path)
-    except Exception:
-        return []
-    if size <= 0:
-        return []
-    chunk = 2_000_000
-    data = ""
-    while chunk <= max_bytes:
-        start = max(0, size - chunk)
-        try:
-            with open(path, "rb") as f:
-                f.seek(start)
-                data = f.read().decode("utf-8", errors="replace")
-        except Exception:
-            return []
-        lines = data.splitlines()
-        if len(lines) >= want_lines or start == 0:
-            return lines
-        chunk *= 2
-    return data.splitlines()
-
-def rehydrate_world_zdos_from_tail(live: LiveAgg, path: str) -> Tuple[bool, int, int, Optional[str]]:
+def rehydrate_world_zdos_from_tail(
+    live: LiveAgg, path: str, bucket_s: int = WORLD_ZDOS_BUCKET_S, archive_dir: Optional[str] = None
+) -> Tuple[bool, int, int, Optional[str]]:
     if not os.path.exists(path):
         return False, 0, 0, None
-    lines = read_tail_lines(path, WORLD_ZDOS_REHYDRATE_FRAMES * 4)
+    want = WORLD_ZDOS_REHYDRATE_FRAMES * 4
+    lines = read_tail_lines(path, want)
+    if len(lines) < want and archive_dir is not None:
+        # Freshly rotated live file: the rest of the tail is in the newest rotated segments.
+        lines = rotated_tail_lines(path, archive_dir, want - len(lines)) + lines
     if not lines:
         return False, 0, 0, None
     by_bucket: Dict[int, Dict[str, Any]] = {}
@@ -283,7 +251,7 @@ def rehydrate_world_zdos_from_tail(live: LiveAgg, path: str) -> Tuple[bool, int,
         if evt.get("type") != WORLD_ZDOS_TYPE or evt.get("schema") != WORLD_ZDOS_SCHEMA:
             continue
         try:
-            if int(evt.get("bucket_s", 0) or 0) != 30:
+            if int(evt.get("bucket_s", 0) or 0) != bucket_s:
                 continue
         except (TypeError, ValueError):
             # Malformed bucket_s in tail; skip (main loop would count schema error).
@@ -293,16 +261,16 @@ def rehydrate_world_zdos_from_tail(live: LiveAgg, path: str) -> Tuple[bool, int,
             continue
         if latest_ts is None or ts > latest_ts:
             latest_ts = ts
-        bucket_s = parse_ts_to_epoch_s(ts)
-        if bucket_s is None:
+        evt_s = parse_ts_to_epoch_s(ts)
+        if evt_s is None:
             continue
-        prev = by_bucket.get(bucket_s)
+        prev = by_bucket.get(evt_s)
         if prev is None:
-            by_bucket[bucket_s] = evt
+            by_bucket[evt_s] = evt
         else:
             prev_ts = prev.get("t")
             if isinstance(prev_ts, str) and prev_ts < ts:
-                by_bucket[bucket_s] = evt
+                by_bucket[evt_s] = evt
     if not by_bucket:
         return False, 0, 0, None
     buckets = sorted(by_bucket.keys())
@@ -315,320 +283,6 @@ def rehydrate_world_zdos_from_tail(live: LiveAgg, path: str) -> Tuple[bool, int,
     live.hotspots_world_meta = compute_world_quantiles(list(live.hotspots_world_counts.values()))
     return True, len(by_bucket), len(buckets), latest_ts
 
-def scan_frame_time_range(frames_dir: str) -> Tuple[Optional[int], Optional[int]]:
-    """Return (earliest_bucket_s, latest_bucket_s) based on existing archive frames."""
-    try:
-        names = os.listdir(frames_dir)
-    except Exception:
-        return None, None
-
-    earliest = None
-    latest = None
-    for fn in names:
-        # Expected: frame_YYYYMMDDTHHMMSS.json
-        if not (fn.startswith("frame_") and fn.endswith(".json")):
-            continue
-        core = fn[len("frame_"):-len(".json")]
-        es = parse_compact_to_epoch_s(core)
-        if es is None:
-            continue
-        if earliest is None or es < earliest:
-            earliest = es
-        if latest is None or es > latest:
-            latest = es
-    return earliest, latest
-
-def list_frames(frames_dir: str) -> List[Dict[str, Any]]:
-    """Return sorted list of existing frames as [{sec, url}, ...]."""
-    try:
-        names = os.listdir(frames_dir)
-    except Exception:
-        return []
-
-    out: List[Dict[str, Any]] = []
-    for fn in names:
-        if not (fn.startswith("frame_") and fn.endswith(".json")):
-            continue
-        core = fn[len("frame_"):-len(".json")]
-        es = parse_compact_to_epoch_s(core)
-        if es is None:
-            continue
-        out.append({"sec": es, "url": f"frames/{fn}"})
-
-    out.sort(key=lambda x: x["sec"])
-    return out
-@dataclass
-class FileSig:
-    inode: int
-    size: int
-    mtime_ns: int
-
-@dataclass
-class StreamState:
-    path: str
-    sig: FileSig
-    offset: int
-    total_lines: int
-    total_events: int
-    parse_errors: int
-    schema_errors: int
-    dropped_events: int
-    legacy_world_zdos: int
-    last_event_ts: Optional[str]
-    last_ingest_ts: Optional[str]
-
-def _file_sig(path: str) -> Optional[FileSig]:
-    try:
-        st = os.stat(path)
-        inode = int(getattr(st, "st_ino", 0) or 0)
-        size = int(st.st_size)
-        mtime_ns = int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9)))
-        return FileSig(inode=inode, size=size, mtime_ns=mtime_ns)
-    except FileNotFoundError:
-        return None
-    except Exception:
-        return None
-
-def _sig_dict(sig: FileSig) -> Dict[str, int]:
-    return {"inode": sig.inode, "size": sig.size, "mtime_ns": sig.mtime_ns}
-
-def _sig_from_dict(d: Any) -> FileSig:
-    if not isinstance(d, dict):
-        return FileSig(0, 0, 0)
-    return FileSig(
-        inode=int(d.get("inode", 0) or 0),
-        size=int(d.get("size", 0) or 0),
-        mtime_ns=int(d.get("mtime_ns", 0) or 0),
-    )
-
-def load_offsets(state_dir: str) -> Dict[str, StreamState]:
-    p = os.path.join(state_dir, "offsets.json")
-    if not os.path.exists(p):
-        return {}
-    try:
-        with open(p, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-
-        out: Dict[str, StreamState] = {}
-
-        # Backward compatible: older format might have been {stream:{inode,offset}}
-        if isinstance(raw, dict) and "streams" not in raw:
-            for k, v in raw.items():
-                if not isinstance(v, dict):
-                    continue
-                out[k] = StreamState(
-                    path="",
-                    sig=FileSig(inode=int(v.get("inode", 0) or 0), size=0, mtime_ns=0),
-                    offset=int(v.get("offset", 0) or 0),
-                    total_lines=int(v.get("total_lines", 0) or 0),
-                    total_events=int(v.get("total_events", 0) or 0),
-                    parse_errors=int(v.get("parse_errors", 0) or 0),
-                    schema_errors=int(v.get("schema_errors", 0) or 0),
-                    dropped_events=int(v.get("dropped_events", 0) or 0),
-                    legacy_world_zdos=int(v.get("legacy_world_zdos", 0) or 0),
-                    last_event_ts=v.get("last_event_ts"),
-                    last_ingest_ts=v.get("last_ingest_ts"),
-                )
-            return out
-
-        if not isinstance(raw, dict):
-            return {}
-
-        streams = raw.get("streams", {})
-        if not isinstance(streams, dict):
-            return {}
-
-        for k, v in streams.items():
-            if not isinstance(v, dict):
-                continue
-            out[k] = StreamState(
-                path=str(v.get("path", "")),
-                sig=_sig_from_dict(v.get("sig")),
-                offset=int(v.get("offset", 0) or 0),
-                total_lines=int(v.get("total_lines", 0) or 0),
-                total_events=int(v.get("total_events", 0) or 0),
-                parse_errors=int(v.get("parse_errors", 0) or 0),
-                schema_errors=int(v.get("schema_errors", 0) or 0),
-                dropped_events=int(v.get("dropped_events", 0) or 0),
-                legacy_world_zdos=int(v.get("legacy_world_zdos", 0) or 0),
-                last_event_ts=v.get("last_event_ts"),
-                last_ingest_ts=v.get("last_ingest_ts"),
-            )
-        return out
-    except Exception:
-        return {}
-
-def save_offsets(state_dir: str, states: Dict[str, StreamState]) -> None:
-    p = os.path.join(state_dir, "offsets.json")
-    raw = {
-        "schema": SCHEMA_VERSION,
-        "saved_at": iso_utc(int(time.time())),
-        "streams": {
-            k: {
-                "path": v.path,
-                "sig": _sig_dict(v.sig),
-                "offset": v.offset,
-                "total_lines": v.total_lines,
-                "total_events": v.total_events,
-                "parse_errors": v.parse_errors,
-                "schema_errors": v.schema_errors,
-                "dropped_events": v.dropped_events,
-                "legacy_world_zdos": v.legacy_world_zdos,
-                "last_event_ts": v.last_event_ts,
-                "last_ingest_ts": v.last_ingest_ts,
-            }
-            for k, v in states.items()
-        },
-    }
-    atomic_write_json(p, raw)
-
-def _is_sig_equal(a: FileSig, b: FileSig) -> bool:
-    return a.inode == b.inode and a.size == b.size and a.mtime_ns == b.mtime_ns
-
-def detect_reset_reason(prev: StreamState, cur_sig: FileSig) -> Optional[str]:
-    """Return a non-empty string reason if this stream should reset its counters."""
-    # If file shrank below our offset -> truncated or replaced
-    if cur_sig.size < prev.offset:
-        return "truncate/replace (size < offset)"
-
-    # Linux: inode change is a strong signal of replace
-    if prev.sig.inode != 0 and cur_sig.inode != 0 and cur_sig.inode != prev.sig.inode:
-        return "replace (inode changed)"
-
-    # Windows heuristic (inode often 0):
-    # If mtime changed and size is <= previous size while we believed we were at EOF,
-    # it's likely a replace.
-    if prev.sig.inode == 0 and cur_sig.inode == 0:
-        if cur_sig.mtime_ns != prev.sig.mtime_ns and cur_sig.size <= prev.sig.size and prev.offset >= prev.sig.size:
-            return "replace (win heuristic mtime+size)"
-
-    return None
-
-def read_new_lines_with_reset(state: StreamState) -> Tuple[StreamState, List[str], Optional[str]]:
-    """Read new lines; detect file replacement/truncate; if detected, reset counters & offset."""
-    sig = _file_sig(state.path)
-    if sig is None:
-        # File not present yet; keep state, don't reset
-        return state, [], None
-
-    reason = detect_reset_reason(state, sig)
-    if reason is not None:
-        # Reset counters as requested when a new/changed file goes in
-        state = StreamState(
-            path=state.path,
-            sig=FileSig(0, 0, 0),  # will be replaced below
-            offset=0,
-            total_lines=0,
-            total_events=0,
-            parse_errors=0,
-            schema_errors=0,
-            dropped_events=0,
-            legacy_world_zdos=0,
-            last_event_ts=None,
-            last_ingest_ts=None,
-        )
-
-    # If this is a brand new signature (first time seeing file), we want to backfill from 0 anyway.
-    offset = max(0, state.offset)
-
-    try:
-        with open(state.path, "r", encoding="utf-8", errors="replace") as f:
-            f.seek(offset)
-            data = f.read()
-            new_offset = f.tell()
-        lines = data.splitlines() if data else []
-    except Exception:
-        return state, [], None
-
-    new_state = StreamState(
-        path=state.path,
-        sig=sig,
-        offset=new_offset,
-        total_lines=state.total_lines,
-        total_events=state.total_events,
-        parse_errors=state.parse_errors,
-        schema_errors=state.schema_errors,
-        dropped_events=state.dropped_events,
-        legacy_world_zdos=state.legacy_world_zdos,
-        last_event_ts=state.last_event_ts,
-        last_ingest_ts=state.last_ingest_ts,
-    )
-    return new_state, lines, reason
-
-
-def is_ts_sane(ts: Any, now_s: int) -> bool:
-    es = parse_ts_to_epoch_s(ts)
-    if es is None:
-        return False
-    if es < 0:
-        return False
-    if es > now_s + MAX_FUTURE_EVENT_S:
-        return False
-    return True
-
-def validate_player_positions(evt: Dict[str, Any], now_s: int) -> bool:
-    if evt.get("type") != "player_positions":
-        return False
-    if not is_ts_sane(evt.get("t"), now_s):
-        return False
-    players = evt.get("players")
-    if not isinstance(players, list):
-        return False
-    for p in players:
-        if not isinstance(p, dict):
-            continue
-        pid = p.get("id")
-        if isinstance(pid, str) and pid:
-            return True
-    return False
-
-def validate_player_flow(evt: Dict[str, Any], now_s: int) -> bool:
-    if evt.get("type") != "player_flow":
-        return False
-    if not is_ts_sane(evt.get("t"), now_s):
-        return False
-    trans = evt.get("transitions")
-    if not isinstance(trans, list):
-        return False
-    for tr in trans:
-        if not isinstance(tr, dict):
-            continue
-        fx, fy = tr.get("fx"), tr.get("fy")
-        tx, ty = tr.get("tx"), tr.get("ty")
-        n = tr.get("n")
-        if all(isinstance(v, (int, float)) for v in (fx, fy, tx, ty, n)):
-            return True
-    return False
-
-def validate_world_zdos(evt: Dict[str, Any], now_s: int) -> Tuple[bool, bool]:
-    if evt.get("type") != WORLD_ZDOS_TYPE:
-        return False, False
-    schema = evt.get("schema")
-    if not isinstance(schema, str) or schema != WORLD_ZDOS_SCHEMA:
-        return False, False
-    if not is_ts_sane(evt.get("t"), now_s):
-        return False, False
-    try:
-        bucket_s = int(evt.get("bucket_s", 0) or 0)
-    except Exception:
-        return False, False
-    if bucket_s != 30:
-        return False, False
-    epoch = evt.get("epoch")
-    if not isinstance(epoch, int):
-        return False, False
-    zones = evt.get("zones")
-    if not isinstance(zones, list):
-        return False, False
-    for z in zones:
-        if not isinstance(z, dict):
-            continue
-        zx_, zy_ = z.get("zx"), z.get("zy")
-        cnt = z.get("count")
-        if all(isinstance(v, (int, float)) for v in (zx_, zy_, cnt)):
-            return True, False
-    return (len(zones) == 0), False
-
 def build_health_report(
     now_s: int,
     start_s: int,
@@ -639,6 +293,7 @@ def build_health_report(
     last_write_manifest: Optional[str],
     last_write_frame_live: Optional[str],
     last_write_frame_archive: Optional[str],
+    sections: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     per_stream: Dict[str, Any] = {}
     for k, st in states.items():
@@ -652,7 +307,9 @@ def build_health_report(
             "last_event_ts": st.last_event_ts,
             "last_ingest_ts": st.last_ingest_ts,
         }
-    return {
+        if st.segment:
+            per_stream[k]["segment"] = {"file": os.path.basename(st.segment), "offset": st.offset}
+    report = {
         "start_time_utc": iso_utc(start_s),
         "uptime_seconds": max(0, now_s - start_s),
         "input_dir": os.path.abspath(input_dir),
@@ -660,8 +317,8 @@ def build_health_report(
         "streams": per_stream,
         "state_sizes": {
             "players": len(live.players_latest),
-            "flow_edges": len(live.flow_state),
-            "world_zdos_zones": len(live.hotspots_world_counts),
+            "flow_edges": flow_edge_count(live),
+            "world_zdos_zones": world_zone_count(live),
         },
         "last_write_ts": {
             "manifest": last_write_manifest,
@@ -669,6 +326,9 @@ def build_health_report(
             "frame_archive": last_write_frame_archive,
         },
     }
+    # Optional subsystem sections (catchup, windows, ...) supplied by the main loop.
+    report.update(sections or {})
+    return report
 
 def write_health(
     out_dir: str,
@@ -680,6 +340,7 @@ def write_health(
     last_write_manifest: Optional[str],
     last_write_frame_live: Optional[str],
     last_write_frame_archive: Optional[str],
+    sections: Optional[Dict[str, Any]] = None,
 ) -> None:
     health = build_health_report(
         now_s,
@@ -691,10 +352,10 @@ def write_health(
         last_write_manifest,
         last_write_frame_live,
         last_write_frame_archive,
+        sections,
     )
     atomic_write_json(os.path.join(out_dir, HEALTH_FILENAME), health)
 
-
 def rehydrate_live_from_tail(live: LiveAgg, states: Dict[str, StreamState], max_bytes: int = 2_000_000, max_lines: int = 5000) -> None:
     """
     Best-effort: rebuild the in-memory live aggregates after restart even when offsets are at EOF.
@@ -745,50 +406,64 @@ def rehydrate_live_from_tail(live: LiveAgg, states: Dict[str, StreamState], max_
         except Exception:
             continue
 
-def zk(zx: int, zy: int) -> str:
-    return f"{zx},{zy}"
-
-def fk(a: str, b: str) -> str:
-    return f"{a}->{b}"
-
-def parse_zk(k: str) -> Tuple[int, int]:
-    a, b = k.split(",", 1)
-    return int(a), int(b)
-
-def parse_fk(k: str) -> Tuple[int, int, int, int]:
-    left, right = k.split("->", 1)
-    ax, ay = parse_zk(left)
-    bx, by = parse_zk(right)
-    return ax, ay, bx, by
-
-@dataclass
-class LiveAgg:
-    hotspots_world_counts: Dict[str, int]
-    hotspots_world_epoch: int
-    hotspots_world_meta: Dict[str, Any]
-    hotspots_world_seen: Set[str]
-    flow_sum: Dict[str, int]
-    flow_state: Dict[str, Dict[str, Any]]
-    flow_updated: Set[str]
-    players_latest: Dict[str, Dict[str, Any]]
-    players_ttl: Dict[str, int]
-    players_updated: Set[str]
-    dirty_flow: bool
-
-def new_live() -> LiveAgg:
-    return LiveAgg(
-        hotspots_world_counts={},
-        hotspots_world_epoch=0,
-        hotspots_world_meta={},
-        hotspots_world_seen=set(),
-        flow_sum={},
-        flow_state={},
-        flow_updated=set(),
-        players_latest={},
-        players_ttl={},
-        players_updated=set(),
-        dirty_flow=False,
-    )
+def _flow_pop_min(live: LiveAgg, counts: Dict[str, Any], value: Any) -> Tuple[str, int]:
+    """Pop the smallest-count key from the lazy min-heap (stale entries are skipped)."""
+    while live.flow_heap:
+        c, key = heapq.heappop(live.flow_heap)
+        cur = counts.get(key)
+        if cur is not None and value(cur) == c:
+            return key, c
+    # Heap lost track (should not happen): fall back to a scan.
+    key = min(counts, key=lambda k: value(counts[k]))
+    return key, value(counts[key])
+
+def flow_add_bounded(live: LiveAgg, key: str, n: int) -> None:
+    """Space-Saving update of the per-bucket edge sums, holding at most live.flow_cap keys.
+
+    A new edge arriving at capacity replaces the current minimum m and starts at m + n with
+    error m, so every tracked count overestimates its true value by at most flow_err[key].
+    """
+    live.flow_bucket_total += n
+    if key in live.flow_sum:
+        c = live.flow_sum[key] + n
+        live.flow_sum[key] = c
+    elif len(live.flow_sum) < live.flow_cap:
+        c = n
+        live.flow_sum[key] = c
+        live.flow_err[key] = 0
+    else:
+        victim, vc = _flow_pop_min(live, live.flow_sum, lambda v: v)
+        del live.flow_sum[victim]
+        live.flow_err.pop(victim, None)
+        live.flow_updated.discard(victim)
+        live.flow_evicted_mass += vc
+        live.flow_evicted_edges += 1
+        c = vc + n
+        live.flow_sum[key] = c
+        live.flow_err[key] = vc
+    heapq.heappush(live.flow_heap, (c, key))
+    if len(live.flow_heap) > 4 * live.flow_cap + 64:
+        live.flow_heap = [(v, k) for k, v in live.flow_sum.items()]
+        heapq.heapify(live.flow_heap)
+
+def flow_hh_report(live: LiveAgg, edges_emitted: int) -> Dict[str, Any]:
+    """Heavy-hitter accounting for hotspots_meta/health (only meaningful when flow_cap > 0)."""
+    max_err = max(live.flow_err.values(), default=0)
+    return {
+        "mode": "space_saving",
+        "capacity": live.flow_cap,
+        "top_k": live.flow_topk,
+        "edges_tracked": flow_edge_count(live),
+        "edges_emitted": edges_emitted,
+        # Per-bucket overestimate of any tracked edge count; Space-Saving bounds it by total/capacity.
+        "error_bound": max_err,
+        "error_bound_max": live.flow_bucket_total // live.flow_cap if live.flow_cap else 0,
+        "bucket_transitions": live.flow_bucket_total,
+        "evicted_mass": live.flow_evicted_mass,
+        "evicted_edges": live.flow_evicted_edges,
+        "trimmed_count": live.flow_trimmed_count,
+        "trimmed_edges": live.flow_trimmed_edges,
+    }
 
 def ingest_event(live: LiveAgg, evt: Dict[str, Any], is_rehydrate: bool = False) -> bool:
     typ = evt.get("type")
@@ -833,7 +508,10 @@ def ingest_event(live: LiveAgg, evt: Dict[str, Any], is_rehydrate: bool = False)
             a = zk(int(fx), int(fy))
             b = zk(int(tx), int(ty))
             key = fk(a, b)
-            live.flow_sum[key] = live.flow_sum.get(key, 0) + int(n)
+            if live.flow_cap > 0:
+                flow_add_bounded(live, key, int(n))
+            else:
+                live.flow_sum[key] = live.flow_sum.get(key, 0) + int(n)
             if not is_rehydrate:
                 live.flow_updated.add(key)
             live.dirty_flow = True
@@ -845,73 +523,467 @@ def ingest_event(live: LiveAgg, evt: Dict[str, Any], is_rehydrate: bool = False)
 
     return False
 
-def build_frame_live(live: LiveAgg, bucket_s: int, counts: Dict[str, int]) -> Dict[str, Any]:
-    world_items = sorted(live.hotspots_world_counts.items(), key=lambda kv: kv[1], reverse=True)
-    if len(world_items) > WORLD_ZDOS_TOPN:
-        world_items = world_items[:WORLD_ZDOS_TOPN]
+def frame_world_zdos(live: LiveAgg) -> Dict[str, Any]:
+    """The frame's `hotspots` section."""
+    if live.shards is not None:
+        world_items = live.shards.world_top(WORLD_ZDOS_TOPN)
+    else:
+        world_items = sorted(live.hotspots_world_counts.items(), key=lambda kv: kv[1], reverse=True)
+        if len(world_items) > WORLD_ZDOS_TOPN:
+            world_items = world_items[:WORLD_ZDOS_TOPN]
     world_zdos = [{"zx": parse_zk(k)[0], "zy": parse_zk(k)[1], "count": int(v)} for k, v in world_items if v > 0]
+    bio = live.biomes
+    if bio is not None:
+        for z in world_zdos:
+            z["biome"] = bio.biome(z["zx"], z["zy"])
+    if live.locations is not None:
+        live.locations.label(world_zdos)
+    hotspots: Dict[str, Any] = {"world_zdos": world_zdos}
+    if live.spikes is not None:
+        hotspots["world_zdos_spikes"] = live.spikes.top()
+    return hotspots
+
+def frame_flow(live: LiveAgg) -> List[Dict[str, Any]]:
+    """The frame's `flow` section."""
     flows: List[Dict[str, Any]] = []
-    for k, st in live.flow_state.items():
+    edge_items: Any = live.flow_state.items()
+    if live.shards is not None:
+        edge_items = live.shards.flow_items(live.flow_topk)
+    elif live.flow_topk > 0 and len(live.flow_state) > live.flow_topk:
+        edge_items = heapq.nlargest(live.flow_topk, edge_items, key=lambda kv: kv[1].get("c", 0))
+    bio = live.biomes
+    for k, st in edge_items:
+        # Expired edges are removed by apply_flow_ttl, so every entry here is live.
         v = st.get("c", 0)
-        if st.get("ttl", 0) <= 0 or v <= 0:
+        if v <= 0:
             continue
         ax, ay, bx, by = parse_fk(k)
-        flows.append({"a": {"zx": ax, "zy": ay}, "b": {"zx": bx, "zy": by}, "c": int(v)})
+        if bio is not None:
+            flows.append({
+                "a": {"zx": ax, "zy": ay, "biome": bio.biome(ax, ay)},
+                "b": {"zx": bx, "zy": by, "biome": bio.biome(bx, by)},
+                "c": int(v),
+                "last_seen": st.get("last_seen"),
+            })
+        else:
+            flows.append({"a": {"zx": ax, "zy": ay}, "b": {"zx": bx, "zy": by}, "c": int(v), "last_seen": st.get("last_seen")})
+    if live.locations is not None:
+        live.locations.label([end for e in flows for end in (e["a"], e["b"])])
+    return flows
 
-    return {
+def frame_section(live: LiveAgg, name: str, stamp: Any, build: Any) -> Any:
+    """A cached frame section: rebuilt only if marked dirty since the last build or `stamp` changed.
+
+    The returned object is shared with earlier frames until it is rebuilt; frames are read-only.
+    """
+    ent = live.frame_parts.get(name)
+    if ent is not None and name not in live.frame_dirty and ent[0] == stamp:
+        live.frame_stats["reused"] += 1
+        return ent[1]
+    obj = build(live)
+    live.frame_parts[name] = [stamp, obj, None]
+    live.frame_dirty.discard(name)
+    live.frame_stats["built"] += 1
+    return obj
+
+def build_frame_live(live: LiveAgg, bucket_s: int, counts: Dict[str, int]) -> Dict[str, Any]:
+    locs = live.locations
+    if locs is not None:
+        locs.begin_frame()
+    loc_rev = locs.rebuilds if locs is not None else 0
+    spike_rev = live.spikes.version if live.spikes is not None else 0
+    # Shard processes expire edges on their own, so the sharded flow section is rebuilt every frame.
+    flow_rev = live.frame_no if live.shards is not None else 0
+    hotspots = frame_section(live, "hotspots", (loc_rev, spike_rev), frame_world_zdos)
+    flows = frame_section(live, "flow", (loc_rev, flow_rev), frame_flow)
+    if "players" in live.frame_dirty:
+        live.frame_dirty.add("player_groups")
+    players = frame_section(live, "players", 0, lambda lv: list(lv.players_latest.values()))
+    groups = None
+    if live.groups is not None:
+        groups = frame_section(live, "player_groups", loc_rev, lambda lv: lv.groups.build(lv, players))
+    if locs is not None:
+        locs.frame_done()
+
+    hotspots_meta: Dict[str, Any] = {"world_zdos": {**live.hotspots_world_meta, "epoch": live.hotspots_world_epoch}}
+    if live.flow_cap > 0 or live.flow_topk > 0:
+        live.flow_meta = flow_hh_report(live, len(flows))
+        hotspots_meta["flow"] = live.flow_meta
+
+    frame: Dict[str, Any] = {
         "meta": {
             "schema": SCHEMA_VERSION,
             "t": iso_utc(bucket_s),
             "counts": counts,
             "presence": "ignored",
         },
-        "players": list(live.players_latest.values()),
-        "flow": flows,
-        "hotspots": {"world_zdos": world_zdos},
-        "hotspots_meta": {"world_zdos": {**live.hotspots_world_meta, "epoch": live.hotspots_world_epoch}},
+        "players": players,
     }
-
-def apply_player_ttl(live: LiveAgg, ttl_frames: int) -> None:
-    """Frame-based TTL for player markers (decrement once per emitted frame)."""
-    to_remove: List[str] = []
-    for pid in list(live.players_latest.keys()):
-        if pid in live.players_updated:
-            live.players_ttl[pid] = ttl_frames
-        else:
-            if pid not in live.players_ttl:
-                live.players_ttl[pid] = ttl_frames
-            live.players_ttl[pid] -= 1
-        if live.players_ttl.get(pid, 0) <= 0:
-            to_remove.append(pid)
-    for pid in to_remove:
-        live.players_latest.pop(pid, None)
-        live.players_ttl.pop(pid, None)
+    if groups is not None:
+        frame["player_groups"] = groups
+    frame["flow"] = flows
+    frame["hotspots"] = hotspots
+    frame["hotspots_meta"] = hotspots_meta
+    return frame
+
+def advance_frame(live: LiveAgg) -> int:
+    """Start the next emitted frame; TTL expiry is scheduled in frame numbers."""
+    live.frame_no += 1
+    return live.frame_no
+
+def apply_player_ttl(live: LiveAgg, ttl_frames: int, bucket_s: int = 0) -> None:
+    """Frame-based TTL for player markers.
+
+    A player refreshed in frame n expires in frame n + ttl_frames (same as decrementing a
+    counter once per emitted frame) and carries the refreshing bucket as `last_seen`. Only
+    refreshed players and the wheel slot due this frame are touched.
+    """
+    n = live.frame_no
+    if live.players_updated:
+        live.frame_dirty.add("players")
+    seen_t = iso_utc(bucket_s)
+    for pid in live.players_updated:
+        p = live.players_latest.get(pid)
+        if p is None:
+            continue
+        p["last_seen"] = seen_t
+        exp = n + ttl_frames
+        live.players_exp[pid] = exp
+        live.players_wheel.setdefault(exp, []).append(pid)
     live.players_updated.clear()
-
-def apply_flow_ttl(live: LiveAgg, ttl_frames: int) -> None:
-    """Frame-based TTL for directed flow edges (decrement once per emitted frame)."""
-    # Update edges seen in this cadence bucket.
+    for pid in live.players_wheel.pop(n, ()):
+        # Stale slots (player refreshed since) are skipped by the expiry check.
+        if live.players_exp.get(pid) == n:
+            live.players_latest.pop(pid, None)
+            live.players_exp.pop(pid, None)
+            live.frame_dirty.add("players")
+
+def apply_flow_ttl(live: LiveAgg, ttl_frames: int, bucket_s: int = 0) -> None:
+    """Frame-based TTL for directed flow edges.
+
+    Edges seen in this cadence bucket take the bucket's count and `last_seen` and expire
+    ttl_frames later (one frame earlier for tail-rehydrated edges, which never counted as
+    updated). Only refreshed edges and the wheel slot due this frame are touched.
+    """
+    n = live.frame_no
+    seen_t = iso_utc(bucket_s)
+    if live.shards is not None:
+        live.shards.stage_flow(live, ttl_frames, seen_t)
+        live.flow_updated.clear()
+        return
+    if live.flow_sum:
+        live.frame_dirty.add("flow")
     for key, count in live.flow_sum.items():
-        live.flow_state[key] = {"ttl": ttl_frames, "c": count}
-
-    # Decrement edges not updated this frame.
-    to_remove: List[str] = []
-    for key, st in live.flow_state.items():
-        if key in live.flow_updated:
+        exp = n + ttl_frames if key in live.flow_updated else n + ttl_frames - 1
+        st = live.flow_state.get(key)
+        if st is None:
+            live.flow_state[key] = {"c": count, "exp": exp, "last_seen": seen_t}
+        else:
+            st["c"] = count
+            st["exp"] = exp
+            st["last_seen"] = seen_t
+        if exp <= n:
+            live.flow_state.pop(key, None)
             continue
-        st["ttl"] = int(st.get("ttl", ttl_frames)) - 1
-        if st["ttl"] <= 0:
-            to_remove.append(key)
-    for key in to_remove:
-        live.flow_state.pop(key, None)
+        live.flow_wheel.setdefault(exp, []).append(key)
+    for key in live.flow_wheel.pop(n, ()):
+        st = live.flow_state.get(key)
+        if st is not None and st.get("exp") == n:
+            live.flow_state.pop(key, None)
+            live.frame_dirty.add("flow")
+
+    if live.flow_cap > 0 and len(live.flow_state) > live.flow_cap:
+        # Heavy-hitter mode: drop the weakest live edges beyond capacity (stale wheel slots
+        # for them are skipped by the expiry check).
+        excess = len(live.flow_state) - live.flow_cap
+        for key, st in heapq.nsmallest(excess, live.flow_state.items(), key=lambda kv: kv[1].get("c", 0)):
+            live.flow_trimmed_count += int(st.get("c", 0))
+            live.flow_trimmed_edges += 1
+            live.flow_state.pop(key, None)
+            live.frame_dirty.add("flow")
 
     live.flow_updated.clear()
 
-def build_manifest(root: str, input_dir: str, out_dir: str, state_dir: str, states: Dict[str, StreamState], cadence_s: int, now_s: int) -> Dict[str, Any]:
+def seal_bucket(
+    live: LiveAgg,
+    bucket_s: int,
+    states: Dict[str, StreamState],
+    frames_written: int,
+    world_cache_path: Optional[str],
+    ttl_frames: int = 10,
+    world_bucket_s: int = WORLD_ZDOS_BUCKET_S,
+) -> Dict[str, Any]:
+    """Close one cadence bucket: apply TTLs, refresh quantiles, build the frame, reset per-bucket sums."""
+    advance_frame(live)
+    apply_player_ttl(live, ttl_frames=ttl_frames, bucket_s=bucket_s)
+    apply_flow_ttl(live, ttl_frames=ttl_frames, bucket_s=bucket_s)
+    if frames_written % WORLD_ZDOS_QUANTILE_EVERY == 0 or not live.hotspots_world_meta:
+        if live.shards is not None:
+            live.hotspots_world_meta = live.shards.world_quantiles()
+        else:
+            live.hotspots_world_meta = compute_world_quantiles(list(live.hotspots_world_counts.values()))
+        if world_cache_path:
+            try:
+                save_world_zdos_cache(
+                    world_cache_path, live,
+                    last_event_t=states["hotspots_world_zdos"].last_event_ts, bucket_s=world_bucket_s,
+                )
+            except Exception:
+                pass
+    if live.spikes is not None and live.spikes.owner is live:
+        live.spikes.step(bucket_s)
+    counts = {k: states[k].total_events for k in STREAM_FILES.keys()}
+    frame = build_frame_live(live, bucket_s, counts)
+    # Reset per-bucket aggregates so flow represents "current" risk, not lifetime accumulation.
+    live.flow_sum.clear()
+    live.flow_err.clear()
+    live.flow_heap.clear()
+    live.flow_bucket_total = 0
+    live.dirty_flow = False
+    return frame
+
+# Catch-up reads streams in steps of at most this many bytes, oldest event time first.
+CATCHUP_STEP_BYTES = 256 * 1024
+
+@dataclass
+class CatchupState:
+    """Progress of an event-time catch-up pass over a backlog (see run_catchup_round)."""
+    started_s: int
+    lag_s: int
+    bytes_total: int
+    bytes_done: int
+    frames_emitted: int
+    last_event_s: Optional[int]
+
+def start_catchup(states: Dict[str, StreamState], now_s: int, lag_threshold_s: int) -> Optional[CatchupState]:
+    """Enter catch-up when the oldest unread event is older than `lag_threshold_s`."""
+    if lag_threshold_s <= 0:
+        return None
+    oldest: Optional[int] = None
+    total = 0
+    for st in states.values():
+        pend = pending_bytes(st)
+        if pend <= 0:
+            continue
+        total += pend
+        es = peek_pending_event_s(st)
+        if es is not None and (oldest is None or es < oldest):
+            oldest = es
+    if oldest is None or now_s - oldest <= lag_threshold_s:
+        return None
+    return CatchupState(
+        started_s=now_s,
+        lag_s=now_s - oldest,
+        bytes_total=total,
+        bytes_done=0,
+        frames_emitted=0,
+        last_event_s=None,
+    )
+
+def run_catchup_round(
+    cu: CatchupState,
+    sinks: List[Tuple[EventWindows, Any, Any]],
+    states: Dict[str, StreamState],
+    chunk_bytes: int,
+    now_s: int,
+    world_bucket_s: int = WORLD_ZDOS_BUCKET_S,
+    ingest: Optional[ParallelIngest] = None,
+) -> bool:
+    """Consume up to `chunk_bytes` of backlog into the event-time windows, then seal what the
+    watermark allows (archive frames only).
+
+    `sinks` holds one (windows, apply, emit) triple per cadence view; every parsed event is
+    buffered in each of them, so all cadences are fed by a single parse of each line.
+
+    Streams are read in event-time order: each step reads at most CATCHUP_STEP_BYTES from the
+    pending stream with the oldest newest-event, so a dense stream never runs ahead of a sparse
+    one by more than one step and no event is late because of chunk boundaries. The `max_open`
+    force-seal is off here; the windows hold at most about one step per stream beyond the
+    watermark.
+
+    With `ingest` set, steps are parsed in worker processes (see ParallelIngest).
+
+    Returns True while backlog remains.
+    """
+    windows = sinks[0][0]
+    step = max(65536, min(chunk_bytes, CATCHUP_STEP_BYTES))
+    stuck: Set[str] = set()
+    done = 0
+    while done < chunk_bytes:
+        pend = [k for k in STREAM_FILES.keys() if k not in stuck and pending_bytes(states[k]) > 0]
+        if not pend:
+            break
+        stream_key = min(pend, key=lambda k: windows.stream_max_s.get(k, -1))
+        st = states[stream_key]
+        before = st.offset
+        before_seg = st.segment
+        if ingest is not None:
+            st2, events, reset_reason = ingest.read_chunk(stream_key, st, step, now_s, world_bucket_s)
+        else:
+            st2, lines, reset_reason = read_new_lines_chunk(st, step)
+        if reset_reason:
+            print(f"[aggv2] stream_reset {stream_key}: {reset_reason}", flush=True)
+            before = 0
+            windows.marks[stream_key] = []
+        states[stream_key] = st2
+        read = max(0, st2.offset - before)
+        if read == 0 and st2.segment == before_seg:
+            stuck.add(stream_key)  # no complete line yet; the live path takes it
+        cu.bytes_done += read
+        done += read
+        if ingest is None:
+            if lines:
+                st2.total_lines += len(lines)
+            events = []
+            for ln in lines:
+                parsed = parse_event_line(st2, ln, now_s, world_bucket_s)
+                if parsed is not None:
+                    events.append(parsed)
+        for evt, legacy_world in events:
+            for w, _, _ in sinks:
+                windows_add(w, stream_key, evt, legacy_world, now_s)
+        windows_mark(windows, stream_key, st2.offset, st2.segment)
+
+    idle = {k: pending_bytes(states[k]) <= 0 or k in stuck for k in STREAM_FILES.keys()}
+    for w, apply, emit in sinks:
+        cu.frames_emitted += windows_seal(w, windows_watermark(w, idle, now_s), apply, emit, force=False)
+    if windows.stream_max_s:
+        cu.last_event_s = max(windows.stream_max_s.values())
+
+    remaining = sum(pending_bytes(st) for st in states.values())
+    if remaining <= 0 or len(stuck) == sum(1 for st in states.values() if pending_bytes(st) > 0):
+        return False
+    if cu.last_event_s is not None and now_s - cu.last_event_s < windows.cadence_s:
+        # Within one bucket of real time: the live path takes the small remainder.
+        return False
+    return True
+
+def catchup_report(cu: CatchupState, states: Dict[str, StreamState], now_s: int) -> Dict[str, Any]:
+    remaining = sum(pending_bytes(st) for st in states.values())
+    elapsed = max(1, now_s - cu.started_s)
+    rate = cu.bytes_done / elapsed
+    return {
+        "active": True,
+        "started_at": iso_utc(cu.started_s),
+        "lag_s_at_start": cu.lag_s,
+        "event_time": iso_utc(cu.last_event_s) if cu.last_event_s is not None else None,
+        "event_lag_s": (now_s - cu.last_event_s) if cu.last_event_s is not None else None,
+        "bytes_done": cu.bytes_done,
+        "bytes_remaining": remaining,
+        "progress": round(cu.bytes_done / max(1, cu.bytes_done + remaining), 4),
+        "rate_bytes_s": int(rate),
+        "eta_s": int(remaining / rate) if rate > 0 else None,
+        "frames_emitted": cu.frames_emitted,
+    }
+
+def write_archive_frame(
+    out_dir: str,
+    view: CadenceView,
+    label: int,
+    frame: Dict[str, Any],
+    dedupe: bool,
+    precomp: Optional[Precompressor] = None,
+    encoded: Optional[Tuple[bytes, str]] = None,
+) -> bool:
+    """Write frames/frame_<label>.json, or, if the body matches the previous bucket, append a
+    reference to that frame to frame_refs.jsonl instead. Returns True if a file was written.
+
+    `encoded` is (bytes, content hash) of `frame` from encode_frame, to skip serializing it again.
+    """
+    frames_dir = os.path.join(out_dir, view.frames_dir)
+    name = f"frame_{hms_compact(label)}.json"
+    if dedupe:
+        h = encoded[1] if encoded is not None else frame_content_hash(frame)
+        if h == view.last_hash and view.last_file and os.path.exists(os.path.join(frames_dir, view.last_file)):
+            append_frame_ref(frames_dir, label, view.last_file)
+            view.frames_deduped += 1
+            return False
+        view.last_hash = h
+        view.last_file = name
+    if encoded is not None:
+        write_bytes_output(os.path.join(frames_dir, name), encoded[0], precomp)
+    else:
+        write_json_output(os.path.join(frames_dir, name), frame, precomp)
+    return True
+
+def copy_world_state(src: LiveAgg, dst: LiveAgg) -> None:
+    """Seed another view's world ZDO cache from the primary's restored state."""
+    dst.hotspots_world_counts = dict(src.hotspots_world_counts)
+    dst.hotspots_world_seen = set(src.hotspots_world_seen)
+    dst.hotspots_world_epoch = src.hotspots_world_epoch
+    dst.hotspots_world_meta = dict(src.hotspots_world_meta)
+
+def view_report(view: CadenceView) -> Dict[str, Any]:
+    return {
+        "cadence_s": view.cadence_s,
+        "ttl_frames": view.ttl_frames,
+        "frames_dir": view.frames_dir,
+        "frame_live": view.live_name,
+        "frames_written": view.frames_written,
+        "frames_deduped": view.frames_deduped,
+        "last_frame": iso_utc(view.last_frame_written_s) if view.last_frame_written_s > 0 else None,
+        "last_write_ts": {
+            "frame_live": view.last_write_frame_live,
+            "frame_archive": view.last_write_frame_archive,
+        },
+        "state_sizes": {
+            "players": len(view.live.players_latest),
+            "flow_edges": flow_edge_count(view.live),
+            "world_zdos_zones": world_zone_count(view.live),
+        },
+        "windows": windows_report(view.windows) if view.windows is not None else None,
+        "flow_heavy_hitters": view.live.flow_meta or None,
+        "live_delta": {"seq": view.live_seq, "keep": view.delta_keep, **view.delta_stats} if view.delta_keep > 0 else None,
+    }
+
+def manifest_cadence_section(out_dir: str, view: CadenceView, store: Optional[StateStore] = None) -> Dict[str, Any]:
+    frames_dir = os.path.join(out_dir, view.frames_dir)
+    if store is not None:
+        earliest, latest = store.time_range(view.frames_dir)
+    else:
+        earliest, latest = scan_frame_time_range(frames_dir)
+    section: Dict[str, Any] = {
+        "cadence_s": view.cadence_s,
+        "ttl_frames": view.ttl_frames,
+        "primary": view.primary,
+        "frame_live": view.live_name,
+        "frames_dir": view.frames_dir,
+        "frame_template": f"{view.frames_dir}/frame_{{compact}}.json",
+        "earliest": iso_utc(earliest) if earliest is not None else None,
+        "latest": iso_utc(latest) if latest is not None else None,
+    }
+    if view.delta_keep > 0:
+        section["live_delta_template"] = live_delta_name(view, "{seq}")
+        section["live_deltas"] = view.delta_keep
+    if not view.primary:
+        # The primary cadence's frames are the top-level manifest `frames` list.
+        section["frames"] = [
+            {**f, "url": f"{view.frames_dir}/{f['url'].split('/', 1)[1]}"}
+            for f in (store.list_frames(view.frames_dir) if store is not None else list_frames(frames_dir))
+        ]
+    return section
+
+def build_manifest(
+    root: str,
+    input_dir: str,
+    out_dir: str,
+    state_dir: str,
+    states: Dict[str, StreamState],
+    cadence_s: int,
+    now_s: int,
+    views: Optional[List[CadenceView]] = None,
+    archive_dir: Optional[str] = None,
+    store: Optional[StateStore] = None,
+) -> Dict[str, Any]:
     # Viewer scrubbing MUST be based on what frames actually exist.
     frames_dir = os.path.join(out_dir, "frames")
-    earliest, latest = scan_frame_time_range(frames_dir)
-    frames = list_frames(frames_dir)
+    if store is not None:
+        # Indexed lookups instead of listing the frames dir (kept in step per emitted bucket).
+        earliest, latest = store.time_range("frames")
+        frames = store.list_frames("frames")
+    else:
+        earliest, latest = scan_frame_time_range(frames_dir)
+        frames = list_frames(frames_dir)
 
     # Keep event-time info for debugging/ops (not for scrubbing).
     evt_earliest = None
@@ -936,6 +1008,7 @@ def build_manifest(root: str, input_dir: str, out_dir: str, state_dir: str, stat
         "frame_live": "frame_live.json",
         "frames_dir": "frames",
         "frame_template": "frames/frame_{compact}.json",
+        "frame_refs": f"frames/{FRAME_REFS_FILENAME}",
         "compact_format": "YYYYMMDDTHHMMSS"
     },
 },
@@ -956,6 +1029,14 @@ def build_manifest(root: str, input_dir: str, out_dir: str, state_dir: str, stat
             "event_earliest": iso_utc(evt_earliest) if evt_earliest is not None else None,
             "event_latest": iso_utc(evt_latest) if evt_latest is not None else None,
         },
+        "cadences": {str(v.cadence_s): manifest_cadence_section(out_dir, v, store) for v in (views or [])},
+        # Rotated months in seekable archives; tools/serve_atlas.py serves them under "archive/"
+        # (raw index/data for HTTP Range readers, or archive/frame/{compact}.json per frame).
+        "archives": {
+            "url_prefix": "archive/",
+            "frame_template": "archive/frame/{compact}.json",
+            "months": list_frame_archives(archive_dir) if archive_dir else [],
+        },
         "notes": {
             "hotspots_world_zdos_type": WORLD_ZDOS_TYPE,
         },
@@ -978,272 +1059,758 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--input", default=_env("HEATFLOW_INPUT_DIR"))
     ap.add_argument("--out", default=_env("HEATFLOW_OUT_DIR"))
     ap.add_argument("--state", default=_env("HEATFLOW_STATE_DIR"))
+    # sqlite: offsets, world cache and frame index in state/state.sqlite3, one transaction per bucket.
+    ap.add_argument("--state-store", choices=("json", "sqlite"), default=_env("HEATFLOW_STATE_STORE", "json"))
+    ap.add_argument("--archive-dir", default=_env("HEATFLOW_ARCHIVE_DIR"))  # tools/rotate_monthly.py output
+    # Rotated raw segments (input dir + <archive>/<month>/raw): 0 = live file only, 1 = follow rollovers,
+    # 2 = also replay them for streams without a saved position.
+    ap.add_argument("--stream-segments", type=int, default=_env_int("HEATFLOW_STREAM_SEGMENTS", 1))
     ap.add_argument("--poll", type=float, default=_env_float("HEATFLOW_POLL_S", 1.0))
-    ap.add_argument("--cadence", type=int, default=_env_int("HEATFLOW_CADENCE_S", 30))
+    # One or more cadences, e.g. "30" or "10,300:4" (cadence_s[:ttl_frames]); the first is primary.
+    ap.add_argument("--cadence", default=_env("HEATFLOW_CADENCE_S", "30"))
+    ap.add_argument("--world-bucket", type=int, default=_env_int("HEATFLOW_WORLD_BUCKET_S", WORLD_ZDOS_BUCKET_S))
     ap.add_argument("--frame-every", type=int, default=_env_int("HEATFLOW_FRAME_EVERY_S", 1))  # deprecated
     ap.add_argument("--heartbeat", type=float, default=_env_float("HEATFLOW_HEARTBEAT_S", 5.0))
+    ap.add_argument("--catchup-lag", type=int, default=_env_int("HEATFLOW_CATCHUP_LAG_S", 300))  # 0 disables
+    ap.add_argument("--catchup-chunk-mb", type=float, default=_env_float("HEATFLOW_CATCHUP_CHUNK_MB", 8.0))
+    ap.add_argument("--ingest-workers", type=int, default=_env_int("HEATFLOW_INGEST_WORKERS", 0))  # catch-up parse processes; 0/1 = in-process
+    ap.add_argument("--zone-shards", type=int, default=_env_int("HEATFLOW_ZONE_SHARDS", 0))  # world zone/flow state processes; 0 = in-process
+    # Heavy-hitter mode for flow edges: cap tracked edges (Space-Saving) and/or emit only the top K.
+    ap.add_argument("--flow-max-edges", type=int, default=_env_int("HEATFLOW_FLOW_MAX_EDGES", 0))
+    ap.add_argument("--flow-topk", type=int, default=_env_int("HEATFLOW_FLOW_TOPK", 0))
+    # 1: quiet buckets identical to the previous one become references in frame_refs.jsonl.
+    ap.add_argument("--dedupe-frames", type=int, default=_env_int("HEATFLOW_DEDUPE_FRAMES", 1))
+    # 1: also json.dumps every frame and count mismatches against the incremental encoder (debug).
+    ap.add_argument("--frame-encode-check", type=int, default=_env_int("HEATFLOW_FRAME_ENCODE_CHECK", 0))
+    # Keep this many live_delta_<seq>.json patches next to frame_live.json (0 = off).
+    ap.add_argument("--live-deltas", type=int, default=_env_int("HEATFLOW_LIVE_DELTAS", 0))
+    # Archive thinning, e.g. "30s:7d,5m:90d,1h" (resolution:age, last tier without age = forever), and
+    # a disk budget for all frames dirs of a world (0 = none).
+    ap.add_argument("--retention", default=_env("HEATFLOW_RETENTION", ""))
+    ap.add_argument("--retention-budget-mb", type=float, default=_env_float("HEATFLOW_RETENTION_BUDGET_MB", 0.0))
+    # Precompressed siblings for static hosting, e.g. "gz" or "gz,zst,br" (zst/br need optional modules).
+    ap.add_argument("--precompress", default=_env("HEATFLOW_PRECOMPRESS", ""))
+    ap.add_argument("--compress-workers", type=int, default=_env_int("HEATFLOW_COMPRESS_WORKERS", 2))
+    ap.add_argument("--event-time", action="store_true", default=_env("HEATFLOW_EVENT_TIME", "0") not in ("0", "false", "no"))
+    ap.add_argument("--lateness", type=int, default=_env_int("HEATFLOW_LATENESS_S", 10))
+    ap.add_argument("--columns", default=_env("HEATFLOW_COLUMNS_DIR", ""))  # columnar .npy export dir; empty = off
+    ap.add_argument("--tracks", default=_env("HEATFLOW_TRACKS_DIR", ""))  # per-player track store dir; empty = off
+    ap.add_argument("--biome-map", default=_env("HEATFLOW_BIOME_MAP", ""))  # TileGrid dir (map.json + tiles/); empty = off
+    ap.add_argument("--locations", default=_env("HEATFLOW_LOCATIONS", ""))  # locations.json for nearest-location labels; empty = off
+    # Per-zone growth spikes: top-K per frame (hotspots.world_zdos_spikes) + state/world_zdos_spikes.jsonl; 0 = off.
+    ap.add_argument("--spike-topk", type=int, default=_env_int("HEATFLOW_SPIKE_TOPK", 0))
+    # Player groups within this many meters (x/z) + per-zone occupancy per frame (player_groups); 0 = off.
+    ap.add_argument("--group-radius", type=float, default=_env_float("HEATFLOW_GROUP_RADIUS", 0.0))
+    ap.add_argument("--group-min", type=int, default=_env_int("HEATFLOW_GROUP_MIN", 2))  # smallest group size
+    # Several worlds in one process: JSON config of per-world roots/options (see load_worlds_config).
+    ap.add_argument("--worlds", default=_env("HEATFLOW_WORLDS", ""))
+    ap.add_argument("--world-budget-kb", type=int, default=_env_int("HEATFLOW_WORLD_BUDGET_KB", 1024))  # per stream per turn
     return ap.parse_args()
 
-def main() -> None:
-    args = parse_args()
+class WorldRuntime:
+    """One world's aggregation state (streams, cadence views, outputs) advanced by `poll()`.
 
-    root = args.root
-    input_dir = args.input or os.path.join(root, "input")
-    out_dir = args.out or os.path.join(root, "out")
-    state_dir = args.state or os.path.join(root, "state")
+    A single-world run drives one runtime; `--worlds` drives several from one process, sharing
+    the precompress pool. `poll(budget_bytes)` caps bytes read per stream in one turn so a busy
+    world yields to the others between turns; frame emission runs every turn regardless.
+    """
 
-    poll_s = float(args.poll)
-    cadence_s = int(args.cadence)
-    if cadence_s <= 0:
-        cadence_s = 30
-    frame_every_s = int(args.frame_every)  # deprecated
-    heartbeat_every_s = float(args.heartbeat)
-
-    ensure_dir(input_dir)
-    ensure_dir(out_dir)
-    ensure_dir(os.path.join(out_dir, "frames"))
-    ensure_dir(state_dir)
-
-    offsets_path = os.path.join(state_dir, "offsets.json")
-    offsets_exist = os.path.exists(offsets_path)
-    states = load_offsets(state_dir)
-    states = {k: v for k, v in states.items() if k in STREAM_FILES}
-    world_state_missing = "hotspots_world_zdos" not in states
-
-    # Ensure each stream exists in state with correct path
-    for k, fn in STREAM_FILES.items():
-        p = os.path.join(input_dir, fn)
-        if k not in states:
-            states[k] = StreamState(
-                path=p,
-                sig=FileSig(0, 0, 0),
-                offset=0,
-                total_lines=0,
-                total_events=0,
-                parse_errors=0,
-                schema_errors=0,
-                dropped_events=0,
-                legacy_world_zdos=0,
-                last_event_ts=None,
-                last_ingest_ts=None,
-            )
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        name: str = "",
+        precomp: Optional[Precompressor] = None,
+        ingest_pool: Optional[ProcessPoolExecutor] = None,
+        shard_pool: Optional[ShardPool] = None,
+    ) -> None:
+        self.name = name
+        self.tag = f"[aggv2 {name}]" if name else "[aggv2]"
+        tag = self.tag
+        self.root = args.root
+        self.input_dir = args.input or os.path.join(self.root, "input")
+        self.out_dir = args.out or os.path.join(self.root, "out")
+        self.state_dir = args.state or os.path.join(self.root, "state")
+        self.archive_dir = args.archive_dir or os.path.join(self.root, "archive")
+
+        self.poll_s = float(args.poll)
+        cadences = parse_cadences(args.cadence)
+        self.cadence_s = cadences[0][0]
+        self.world_bucket_s = int(args.world_bucket) if int(args.world_bucket) > 0 else WORLD_ZDOS_BUCKET_S
+        frame_every_s = int(args.frame_every)  # deprecated
+        self.heartbeat_every_s = float(args.heartbeat)
+        self.catchup_lag_s = max(0, int(args.catchup_lag))
+        self.catchup_chunk = max(65536, int(float(args.catchup_chunk_mb) * 1024 * 1024))
+        self.event_time = bool(args.event_time)
+        self.lateness_s = max(0, int(args.lateness))
+        self.dedupe_frames = bool(int(args.dedupe_frames))
+        self.segments_mode = max(0, int(args.stream_segments))
+        self.frame_check = bool(int(args.frame_encode_check))
+        self.frame_checked = 0
+        self.frame_mismatches = 0
+        self.precomp = precomp
+        self.columns = ColumnExporter(os.path.abspath(args.columns)) if args.columns else None
+        self.tracks = TrackStore(os.path.abspath(args.tracks)) if args.tracks else None
+
+        flow_cap = max(0, int(args.flow_max_edges))
+        flow_topk = max(0, int(args.flow_topk))
+        self.views = [new_view(c, ttl, i == 0, flow_cap, flow_topk) for i, (c, ttl) in enumerate(cadences)]
+        self.primary = self.views[0]
+        views = self.views
+        self.ingest: Optional[ParallelIngest] = None
+        if ingest_pool is not None:
+            grain_s = functools.reduce(math.gcd, [v.cadence_s for v in views])
+            self.ingest = ParallelIngest(ingest_pool, args.ingest_workers, grain_s, self.tracks is None, flow_cap <= 0)
+
+        ensure_dir(self.input_dir)
+        ensure_dir(self.out_dir)
+        for view in views:
+            ensure_dir(os.path.join(self.out_dir, view.frames_dir))
+            view.delta_keep = max(0, int(args.live_deltas))
+            if view.delta_keep > 0:
+                load_live_seq(self.out_dir, view)
+        ensure_dir(self.state_dir)
+
+        offsets_path = os.path.join(self.state_dir, "offsets.json")
+        offsets_exist = os.path.exists(offsets_path)
+        self.store: Optional[StateStore] = None
+        states: Dict[str, StreamState] = {}
+        if args.state_store == "sqlite":
+            self.store = StateStore(os.path.join(self.state_dir, STATE_DB_FILENAME))
+            self.primary.live.world_touched = {}
+            # The store's offsets were committed with their frames; offsets.json may be ahead.
+            states = self.store.load_states()
+            if states:
+                offsets_exist = True
+        if not states:
+            states = load_offsets(self.state_dir)
+        states = {k: v for k, v in states.items() if k in STREAM_FILES}
+        saved = set(states)
+        world_state_missing = "hotspots_world_zdos" not in states
+
+        # Ensure each stream exists in state with correct path
+        for k, fn in STREAM_FILES.items():
+            p = os.path.join(self.input_dir, fn)
+            if k not in states:
+                states[k] = StreamState(
+                    path=p,
+                    sig=FileSig(0, 0, 0),
+                    offset=0,
+                    total_lines=0,
+                    total_events=0,
+                    parse_errors=0,
+                    schema_errors=0,
+                    dropped_events=0,
+                    legacy_world_zdos=0,
+                    last_event_ts=None,
+                    last_ingest_ts=None,
+                )
+            else:
+                states[k].path = p
+            if self.segments_mode > 0:
+                states[k].archive_dir = self.archive_dir
+                segs = rotated_segments(p, self.archive_dir)
+                if self.segments_mode > 1 and k not in saved and segs:
+                    # Replay: a stream without a saved position starts at its oldest rotated segment.
+                    states[k].segment = segs[0].path
+                    states[k].head = segs[0].head
+                if segs:
+                    print(f"{tag} {k}: rotated segments={len(segs)} oldest={os.path.basename(segs[0].path)}")
+        self.states = states
+
+        print(f"{tag} root={os.path.abspath(self.root)}")
+        print(f"{tag} input={os.path.abspath(self.input_dir)}")
+        print(f"{tag} out={os.path.abspath(self.out_dir)}")
+        print(f"{tag} state={os.path.abspath(self.state_dir)}")
+        print(f"{tag} presence=ignored (MVP)")
+        for k in STREAM_FILES.keys():
+            st = states[k]
+            print(f"{tag} saved {k}: events={st.total_events} offset={st.offset} last_ts={st.last_event_ts}")
+        print(f"{tag} heartbeat_every_s={self.heartbeat_every_s} poll_s={self.poll_s} cadence_s={self.cadence_s} (frame_every_s deprecated={frame_every_s})")
+        print(f"{tag} cadences=" + ",".join(f"{v.cadence_s}s(ttl={v.ttl_frames},dir={v.frames_dir})" for v in views) + f" world_bucket_s={self.world_bucket_s}")
+        print(f"{tag} catchup_lag_s={self.catchup_lag_s} catchup_chunk_bytes={self.catchup_chunk} "
+              f"ingest_workers={self.ingest.workers if self.ingest is not None else 0}")
+        print(f"{tag} event_time={self.event_time} lateness_s={self.lateness_s} dedupe_frames={self.dedupe_frames}")
+        if self.store is not None:
+            seeded = 0
+            for view in views:
+                seeded += self.store.sync_frames(view.frames_dir, os.path.join(self.out_dir, view.frames_dir))
+                # A bucket committed before a restart is not emitted (and overwritten) a second time.
+                view.last_bucket_written = self.store.time_range(view.frames_dir)[1]
+            print(f"{tag} state store={self.store.path} (sqlite, WAL) frames_indexed_from_disk={seeded}")
+        if flow_cap or flow_topk:
+            print(f"{tag} flow heavy hitters: max_edges={flow_cap or 'unbounded'} topk={flow_topk or 'all'}")
+
+        live = self.primary.live
+        self.live = live
+
+        self.world_cache_path = os.path.join(self.state_dir, WORLD_ZDOS_CACHE_FILENAME)
+        world_cache_path = self.world_cache_path
+        cache_loaded = self.store is not None and self.store.load_world(live, self.world_bucket_s)
+        if not cache_loaded:
+            cache_loaded = load_world_zdos_cache(world_cache_path, live, self.world_bucket_s)
+        if cache_loaded:
+            print(f"{tag} world_zdos cache restored: zones={len(live.hotspots_world_counts)} epoch={live.hotspots_world_epoch}", flush=True)
+        elif states["hotspots_world_zdos"].segment:
+            print(f"{tag} world_zdos replayed from rotated segments (no tail rehydrate)", flush=True)
         else:
-            states[k].path = p
-
-    print(f"[aggv2] root={os.path.abspath(root)}")
-    print(f"[aggv2] input={os.path.abspath(input_dir)}")
-    print(f"[aggv2] out={os.path.abspath(out_dir)}")
-    print(f"[aggv2] state={os.path.abspath(state_dir)}")
-    print("[aggv2] presence=ignored (MVP)")
-    for k in STREAM_FILES.keys():
-        st = states[k]
-        print(f"[aggv2] saved {k}: events={st.total_events} offset={st.offset} last_ts={st.last_event_ts}")
-    print(f"[aggv2] heartbeat_every_s={heartbeat_every_s} poll_s={poll_s} cadence_s={cadence_s} (frame_every_s deprecated={frame_every_s})")
-
-    live = new_live()
-
-    world_cache_path = os.path.join(state_dir, WORLD_ZDOS_CACHE_FILENAME)
-    cache_loaded = load_world_zdos_cache(world_cache_path, live)
-    if cache_loaded:
-        print(f"[aggv2] world_zdos cache restored: zones={len(live.hotspots_world_counts)} epoch={live.hotspots_world_epoch}", flush=True)
-    else:
-        tail_ok, events_n, buckets_n, latest_ts = rehydrate_world_zdos_from_tail(live, states["hotspots_world_zdos"].path)
-        if tail_ok:
-            print(f"[aggv2] world_zdos rehydrated from tail: events={events_n} buckets={buckets_n} zones={len(live.hotspots_world_counts)} epoch={live.hotspots_world_epoch}", flush=True)
-            try:
-                save_world_zdos_cache(world_cache_path, live)
-            except Exception:
-                pass
             st = states["hotspots_world_zdos"]
-            st.total_events = max(st.total_events, buckets_n)
-            if isinstance(latest_ts, str):
-                st.last_event_ts = latest_ts
-            states["hotspots_world_zdos"] = st
+            tail_ok, events_n, buckets_n, latest_ts = rehydrate_world_zdos_from_tail(live, st.path, self.world_bucket_s, st.archive_dir)
+            if tail_ok:
+                print(f"{tag} world_zdos rehydrated from tail: events={events_n} buckets={buckets_n} zones={len(live.hotspots_world_counts)} epoch={live.hotspots_world_epoch}", flush=True)
+                try:
+                    save_world_zdos_cache(world_cache_path, live, bucket_s=self.world_bucket_s)
+                except Exception:
+                    pass
+                st = states["hotspots_world_zdos"]
+                st.total_events = max(st.total_events, buckets_n)
+                if isinstance(latest_ts, str):
+                    st.last_event_ts = latest_ts
+                states["hotspots_world_zdos"] = st
+                try:
+                    save_offsets(self.state_dir, states)
+                except Exception:
+                    pass
+        for view in views[1:]:
+            copy_world_state(live, view.live)
+        if shard_pool is not None:
+            if flow_cap:
+                # Space-Saving evicts the global minimum edge, which a shard cannot see.
+                print(f"{tag} zone shards disabled: --flow-max-edges needs the single-process flow map", flush=True)
+            else:
+                for view in views:
+                    view.live.shards = ZoneShards(shard_pool, f"{name}:{view.cadence_s}")
+                    view.live.shards.adopt(view.live)
+                print(f"{tag} zone shards={shard_pool.n} zones={world_zone_count(live)}", flush=True)
+        self.biomes: Optional[ZoneBiomes] = None
+        if args.biome_map:
             try:
-                save_offsets(state_dir, states)
-            except Exception:
-                pass
-
-    if (not offsets_exist) or world_state_missing:
-        st = states["hotspots_world_zdos"]
-        sig = _file_sig(st.path)
-        if sig is not None:
+                self.biomes = ZoneBiomes(os.path.abspath(args.biome_map), self.state_dir)
+                for view in views:
+                    view.live.biomes = self.biomes
+                rep = self.biomes.report()
+                print(
+                    f"{tag} biome map={rep['map_dir']} table={os.path.basename(rep['table'])} "
+                    f"built={rep['built_this_run']} build_s={rep['build_s']}",
+                    flush=True,
+                )
+            except Exception as e:
+                print(f"{tag} biome map disabled: {e}", flush=True)
+        self.locations: Optional[LocationIndex] = None
+        if args.locations:
             try:
-                size = os.path.getsize(st.path)
-                st.offset = size
-                st.sig = sig
-                states["hotspots_world_zdos"] = st
-                save_offsets(state_dir, states)
-                print("[aggv2] world_zdos offset set to EOF to avoid replay", flush=True)
-            except Exception:
-                pass
-
-    # Live state starts empty on each startup. Offsets handle catch-up of new lines.
-
-    start_s = int(time.time())
-    last_save = 0.0
-    last_manifest = 0.0
-    last_health = 0.0
-    last_bucket_written: Optional[int] = None
-    last_frame_written_s = 0
-    last_heartbeat = 0.0
-    last_world_log = 0.0
-    last_write_manifest: Optional[str] = None
-    last_write_frame_live: Optional[str] = None
-    last_write_frame_archive: Optional[str] = None
-    frames_written = 0
+                self.locations = LocationIndex(os.path.abspath(args.locations))
+                for view in views:
+                    view.live.locations = self.locations
+                print(
+                    f"{tag} locations={self.locations.path} named={self.locations.count} "
+                    f"cells={len(self.locations.cells)} cell_m={LOCATION_CELL_M}",
+                    flush=True,
+                )
+            except Exception as e:
+                print(f"{tag} locations disabled: {e}", flush=True)
+        self.spikes: Optional[ZoneSpikes] = None
+        if int(args.spike_topk) > 0:
+            alerts = os.path.join(self.state_dir, SPIKE_ALERTS_FILENAME)
+            self.spikes = ZoneSpikes(live, int(args.spike_topk), alerts, self.world_bucket_s)
+            for view in views:
+                view.live.spikes = self.spikes
+        if float(args.group_radius) > 0:
+            # One per view: each cadence clusters its own player list and keeps its own stats.
+            for view in views:
+                view.live.groups = groups = PlayerGroups(float(args.group_radius), int(args.group_min))
+            print(f"{tag} player groups radius_m={groups.radius:g} min={groups.min_size}", flush=True)
+
+        if ((not offsets_exist) or world_state_missing) and not states["hotspots_world_zdos"].segment:
+            st = states["hotspots_world_zdos"]
+            sig = file_sig(st.path)
+            if sig is not None:
+                try:
+                    size = os.path.getsize(st.path)
+                    st.offset = size
+                    st.sig = sig
+                    states["hotspots_world_zdos"] = st
+                    save_offsets(self.state_dir, states)
+                    print(f"{tag} world_zdos offset set to EOF to avoid replay", flush=True)
+                except Exception:
+                    pass
+
+        # Live state starts empty on each startup. Offsets handle catch-up of new lines.
+
+        self.start_s = int(time.time())
+        self.last_save = 0.0
+        self.last_manifest = 0.0
+        self.last_health = 0.0
+        self.last_heartbeat = 0.0
+        self.last_world_log = 0.0
+        self.last_write_manifest: Optional[str] = None
+        self.catchup: Optional[CatchupState] = None
+        self.rotation: Optional[OnlineRotation] = None
+        self.last_rotation: Optional[Dict[str, Any]] = None
+        self.last_rotate_check = 0.0
+        self.retention: Optional[RetentionEngine] = None
+        tiers = parse_retention(args.retention)
+        if tiers or float(args.retention_budget_mb) > 0:
+            self.retention = RetentionEngine(tiers, int(float(args.retention_budget_mb) * 1024 * 1024), self.out_dir, precomp)
+            print(f"{tag} retention tiers={args.retention or '-'} budget_mb={args.retention_budget_mb}", flush=True)
+        self.polls = 0
+        self.budget_hits = 0
+        self.bytes_read = 0
+        self.scheduler: Dict[str, Any] = {}
+        # Event-time windows: always used by catch-up; also by the live path with --event-time.
+        if self.event_time:
+            for view in views:
+                view.windows = self.open_windows(view)
+        self.sealed_frames: Dict[int, Dict[str, Any]] = {}
+
+    def open_windows(self, view: CadenceView) -> EventWindows:
+        w = new_windows(view.cadence_s, self.lateness_s)
+        if self.store is not None and view.last_bucket_written is not None:
+            # Resuming from store offsets: buckets already committed are treated as sealed.
+            w.sealed_upto = view.last_bucket_written
+        return w
+
+    def ingest_all(self, stream_key: str, evt: Dict[str, Any], legacy_world: bool, now_s: int) -> None:
+        # One parse feeds every cadence view; stream counters follow the primary view.
+        ok = False
+        for view in self.views:
+            res = ingest_event(view.live, evt)
+            if view.primary:
+                ok = res
+        record_ingest(self.states[stream_key], evt, ok, legacy_world, now_s)
+        if self.tracks is not None and ok and stream_key == "player_positions":
+            self.tracks.add_event(evt)
+
+    def make_apply(self, view: CadenceView) -> Any:
+        def apply(stream_key: str, evt: Dict[str, Any], legacy_world: bool) -> None:
+            ok = ingest_event(view.live, evt)
+            if view.primary:
+                record_ingest(self.states[stream_key], evt, ok, legacy_world, int(time.time()))
+                if self.tracks is not None and ok and stream_key == "player_positions":
+                    self.tracks.add_event(evt)
+        return apply
+
+    def encode_frame(self, view: CadenceView, frame: Dict[str, Any]) -> Tuple[bytes, str]:
+        """encode_frame for every output of this bucket; --frame-encode-check compares it to a full dump."""
+        data, h = encode_frame(view.live, frame)
+        view.last_frame_data = data
+        if self.frame_check:
+            ref = json.dumps(frame, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self.frame_checked += 1
+            if ref != data or frame_content_hash(frame) != h:
+                self.frame_mismatches += 1
+                if self.frame_mismatches == 1:
+                    i = next((i for i, (a, b) in enumerate(zip(ref, data)) if a != b), min(len(ref), len(data)))
+                    print(f"{self.tag} frame encode mismatch t={frame['meta']['t']} at byte {i}: {data[max(0, i - 40):i + 40]!r}", flush=True)
+        return data, h
+
+    def frame_encode_report(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for v in self.views:
+            out[str(v.cadence_s)] = dict(v.live.frame_stats)
+        rep: Dict[str, Any] = {"cadences": out, "check": self.frame_check}
+        if self.frame_check:
+            rep["checked"] = self.frame_checked
+            rep["mismatches"] = self.frame_mismatches
+        return rep
+
+    def emit_frame(self, view: CadenceView, label: int, write_live: bool) -> Dict[str, Any]:
+        frame = seal_bucket(
+            view.live, label, self.states, view.frames_written,
+            self.world_cache_path if view.primary else None, view.ttl_frames, self.world_bucket_s,
+        )
+        stamp = iso_utc(int(time.time()))
+        encoded = self.encode_frame(view, frame)
+        wrote = write_archive_frame(self.out_dir, view, label, frame, self.dedupe_frames, self.precomp, encoded)
+        if wrote:
+            view.last_write_frame_archive = stamp
+        if write_live:
+            write_live_frame(self.out_dir, view, frame, encoded[0], self.precomp)
+            view.last_write_frame_live = stamp
+            view.last_frame_written_s = label
+            view.last_bucket_written = label
+        if self.columns is not None and view.primary:
+            self.columns.append_frame(label, frame)
+        if self.tracks is not None and view.primary:
+            self.tracks.flush()
+        self.commit_bucket(view, label, wrote)
+        view.frames_written += 1
+        return frame
+
+    def commit_bucket(self, view: CadenceView, label: int, wrote: bool) -> None:
+        """Record an emitted bucket in the state store (primary: with the offsets it covers)."""
+        offsets: Dict[str, Dict[str, Any]] = {}
+        if view.primary:
+            if view.windows is not None:
+                # Windowed: only offsets whose events are all in buckets emitted so far.
+                for k, (off, seg) in windows_safe_offsets(view.windows, label).items():
+                    offsets[k] = {**stream_state_dict(self.states[k]), "offset": off, "segment": seg}
+            elif self.store is not None:
+                offsets = {k: stream_state_dict(st) for k, st in self.states.items()}
+        if self.store is None:
+            return
+        name = f"frame_{hms_compact(label)}.json" if wrote else (view.last_file or "")
+        live = view.live if view.primary else None
+        self.store.commit_bucket(view.frames_dir, label, name, not wrote, offsets, live, self.world_bucket_s)
+
+    def make_emit(self, view: CadenceView, archive_only: bool) -> Any:
+        # Catch-up frames go straight to the archive; frame_live/manifest are written once caught up.
+        # Live event-time frames are archived as sealed; the newest becomes frame_live afterwards.
+        def emit(label: int) -> None:
+            self.sealed_frames[view.cadence_s] = self.emit_frame(view, label, write_live=False)
+            if archive_only:
+                self.sealed_frames.pop(view.cadence_s, None)
+        return emit
+
+    def health_sections(self, now_s: int) -> Dict[str, Any]:
+        sections: Dict[str, Any] = {
+            "catchup": catchup_report(self.catchup, self.states, now_s) if self.catchup is not None else {"active": False},
+            "cadences": {str(v.cadence_s): view_report(v) for v in self.views},
+            "rotation": self.rotation.report() if self.rotation is not None else (self.last_rotation or {"active": False}),
+            "frame_encode": self.frame_encode_report(),
+        }
+        if self.retention is not None:
+            sections["retention"] = self.retention.report()
+        if self.primary.windows is not None:
+            sections["windows"] = windows_report(self.primary.windows)
+        if self.precomp is not None:
+            sections["precompress"] = self.precomp.report()
+        if self.ingest is not None:
+            sections["ingest"] = self.ingest.report()
+        if self.store is not None:
+            sections["state_store"] = self.store.report()
+        if self.biomes is not None:
+            sections["biomes"] = self.biomes.report()
+        if self.locations is not None:
+            sections["locations"] = self.locations.report()
+        if self.spikes is not None:
+            sections["spikes"] = self.spikes.report()
+        if self.primary.live.groups is not None:
+            sections["player_groups"] = {str(v.cadence_s): v.live.groups.report() for v in self.views if v.live.groups is not None}
+        if self.primary.live.shards is not None:
+            sections["shards"] = {str(v.cadence_s): v.live.shards.report() for v in self.views if v.live.shards is not None}
+        if self.columns is not None:
+            sections["columns"] = self.columns.report()
+        if self.tracks is not None:
+            sections["tracks"] = self.tracks.report()
+        if self.scheduler:
+            sections["scheduler"] = {
+                **self.scheduler,
+                "world": self.name,
+                "polls": self.polls,
+                "bytes_read": self.bytes_read,
+                "budget_hits": self.budget_hits,
+            }
+        return sections
+
+    def write_manifest(self, now_s: int) -> None:
+        write_json_output(
+            os.path.join(self.out_dir, "manifest.json"),
+            build_manifest(
+                self.root, self.input_dir, self.out_dir, self.state_dir, self.states,
+                self.cadence_s, now_s, self.views, self.archive_dir, self.store,
+            ),
+            self.precomp,
+        )
 
-    try:
-        while True:
-            now = time.time()
-            now_s = int(now)
+    def write_health(self, now_s: int) -> None:
+        write_health(
+            self.out_dir, now_s, self.start_s, self.input_dir, self.states, self.live,
+            self.last_write_manifest, self.primary.last_write_frame_live, self.primary.last_write_frame_archive,
+            self.health_sections(now_s),
+        )
 
-            # Process all streams each poll
-            for stream_key in STREAM_FILES.keys():
-                st = states[stream_key]
+    def poll(self, budget_bytes: Optional[int] = None) -> bool:
+        """One scheduler turn. Returns True when input is still pending (caller should not sleep).
+
+        With `budget_bytes` set, each stream reads at most that many bytes (whole lines) this turn.
+        """
+        tag = self.tag
+        states = self.states
+        views = self.views
+        now = time.time()
+        now_s = int(now)
+        self.polls += 1
+
+        if self.catchup is None:
+            self.catchup = start_catchup(states, now_s, self.catchup_lag_s)
+            if self.catchup is not None:
+                print(f"{tag} catchup start: lag_s={self.catchup.lag_s} backlog_bytes={self.catchup.bytes_total}", flush=True)
+                for view in views:
+                    if view.windows is None:
+                        view.windows = self.open_windows(view)
+
+        if self.catchup is not None:
+            catchup = self.catchup
+            chunk = self.catchup_chunk if budget_bytes is None else max(65536, min(self.catchup_chunk, budget_bytes))
+            sinks = [(v.windows, self.make_apply(v), self.make_emit(v, archive_only=True)) for v in views if v.windows is not None]
+            before = catchup.bytes_done
+            more = run_catchup_round(catchup, sinks, states, chunk, now_s, self.world_bucket_s, self.ingest)
+            self.bytes_read += catchup.bytes_done - before
+            if not more:
+                if not self.event_time:
+                    # Wall-clock mode: flush the windows; buckets before the current wall
+                    # bucket become archive frames, the rest lands in the next live frame.
+                    for view in views:
+                        w = view.windows
+                        if w is None:
+                            continue
+                        apply = self.make_apply(view)
+                        wall_bucket = (now_s // view.cadence_s) * view.cadence_s
+                        for label in sorted(w.open.keys()):
+                            for _, _, stream_key, evt, legacy_world in sorted(w.open.pop(label), key=lambda x: (x[0], x[1])):
+                                apply(stream_key, evt, legacy_world)
+                            if label < wall_bucket:
+                                self.emit_frame(view, label, write_live=False)
+                                catchup.frames_emitted += 1
+                        view.windows = None
+                print(
+                    f"{tag} catchup done: frames={catchup.frames_emitted} bytes={catchup.bytes_done} "
+                    f"elapsed_s={max(0, now_s - catchup.started_s)}",
+                    flush=True,
+                )
+                self.catchup = None
+                if self.ingest is not None:
+                    self.ingest.drop()  # the live path reads the remainder itself
+                # Hand over to the live path: emit the current bucket right away.
+                for view in views:
+                    view.last_bucket_written = None
+                self.last_manifest = 0.0
+            else:
+                if now - self.last_heartbeat >= self.heartbeat_every_s:
+                    rep = catchup_report(catchup, states, now_s)
+                    print(
+                        f"{tag} catchup progress={rep['progress']:.1%} event_t={rep['event_time']} "
+                        f"frames={rep['frames_emitted']} rate_bytes_s={rep['rate_bytes_s']} eta_s={rep['eta_s']}",
+                        flush=True,
+                    )
+                    self.last_heartbeat = now
+                if now - self.last_save >= 2.0:
+                    save_offsets(self.state_dir, states)
+                    self.last_save = now
+                if now - self.last_health >= HEALTH_WRITE_EVERY_S:
+                    self.write_health(now_s)
+                    self.last_health = now
+                # Full speed: no poll sleep while backlog remains.
+                return True
+
+        # Process all streams each poll
+        pending = False
+        for stream_key in STREAM_FILES.keys():
+            st = states[stream_key]
+            before = st.offset
+            if budget_bytes is None:
                 st2, lines, reset_reason = read_new_lines_with_reset(st)
-                if reset_reason:
-                    print(f"[aggv2] stream_reset {stream_key}: {reset_reason}", flush=True)
-                states[stream_key] = st2
+            else:
+                st2, lines, reset_reason = read_new_lines_chunk(st, budget_bytes)
+            if reset_reason:
+                print(f"{tag} stream_reset {stream_key}: {reset_reason}", flush=True)
+                if self.primary.windows is not None:
+                    self.primary.windows.marks[stream_key] = []
+            states[stream_key] = st2
+            self.bytes_read += max(0, st2.offset - (0 if reset_reason else before))
+            if budget_bytes is not None and pending_bytes(st2) > 0:
+                pending = True
+                self.budget_hits += 1
+            elif st2.segment:
+                pending = True  # still draining rotated segments, one chunk per poll
+
+            if lines:
+                st2.total_lines += len(lines)
 
-                if lines:
-                    st2.total_lines += len(lines)
-
-                for ln in lines:
-                    ln = ln.strip()
-                    if not ln:
-                        continue
+            for ln in lines:
+                parsed = parse_event_line(st2, ln, now_s, self.world_bucket_s)
+                if parsed is None:
+                    continue
+                evt, legacy_world = parsed
+                if self.event_time:
+                    for view in views:
+                        if view.windows is not None:
+                            windows_add(view.windows, stream_key, evt, legacy_world, now_s)
+                else:
+                    self.ingest_all(stream_key, evt, legacy_world, now_s)
+            if self.event_time and self.primary.windows is not None:
+                windows_mark(self.primary.windows, stream_key, st2.offset, st2.segment)
+
+            states[stream_key] = st2
+
+        # Online rotation: requests are picked up once every stream was read to EOF.
+        if self.rotation is None and not pending and now - self.last_rotate_check >= 2.0:
+            self.last_rotate_check = now
+            req = load_rotate_request(self.state_dir)
+            if req is not None:
+                self.rotation = OnlineRotation(req, self.state_dir, states, now_s)
+                print(f"{tag} online rotation {self.rotation.req_id}: month={self.rotation.month} -> {self.rotation.out_dir}", flush=True)
+        if self.rotation is not None:
+            rotation = self.rotation
+            rotation.step(states, now_s)
+            rotation.write_status()
+            if rotation.finished():
+                rotation.close()
+                self.last_rotation = rotation.report()
+                summary = ",".join(f"{k}={v['state']}" for k, v in self.last_rotation["streams"].items())
+                print(f"{tag} online rotation {rotation.req_id} finished: {summary}", flush=True)
+                self.rotation = None
+
+        if self.retention is not None:
+            done = self.retention.collect()
+            if done is not None:
+                dropped = sum(d["dropped"] for d in done["dirs"].values())
+                print(
+                    f"{tag} retention pass: dropped={dropped} files={done['files_removed']} scale={done['scale']} "
+                    f"reclaimed_bytes={done['bytes_reclaimed']} bytes={done['bytes_after']}",
+                    flush=True,
+                )
+                self.last_manifest = 0.0
+            elif not pending and self.rotation is None and self.retention.due(now):
+                self.retention.run_pass(views, self.store, now_s)
+
+        frame: Optional[Dict[str, Any]] = None
+        for view in views:
+            view_frame: Optional[Dict[str, Any]] = None
+            if view.windows is not None:
+                # Event-time: streams read to EOF are idle this poll (watermark is wall-clock minus
+                # lateness); a stream cut short by the turn budget holds it at its newest event.
+                self.sealed_frames.pop(view.cadence_s, None)
+                idle = {k: pending_bytes(states[k]) <= 0 for k in STREAM_FILES.keys()} if pending else {k: True for k in STREAM_FILES.keys()}
+                windows_seal(view.windows, windows_watermark(view.windows, idle, now_s), self.make_apply(view), self.make_emit(view, archive_only=False))
+                view_frame = self.sealed_frames.pop(view.cadence_s, None)
+                if view_frame is not None and view.last_frame_data is not None:
+                    write_live_frame(self.out_dir, view, view_frame, view.last_frame_data, self.precomp)
+                    view.last_write_frame_live = iso_utc(now_s)
+                    view.last_frame_written_s = int(view.windows.sealed_upto or 0)
+                    view.last_bucket_written = view.windows.sealed_upto
+            else:
+                # Write one frame per cadence bucket (enables deterministic scrubbing).
+                bucket_s = (now_s // view.cadence_s) * view.cadence_s
+                if view.last_bucket_written is None or bucket_s != view.last_bucket_written:
+                    view_frame = self.emit_frame(view, bucket_s, write_live=True)
+            if view.primary:
+                frame = view_frame
+        if frame is not None:
+            if now - self.last_world_log >= 60.0:
+                live = self.live
+                zones_out = frame.get("hotspots", {}).get("world_zdos", [])
+                min_zx = min_zy = max_zx = max_zy = None
+                for z in zones_out:
                     try:
-                        evt = json.loads(ln)
+                        zx = int(z.get("zx"))
+                        zy = int(z.get("zy"))
                     except Exception:
-                        st2.parse_errors += 1
-                        continue
-                    if not isinstance(evt, dict):
-                        st2.parse_errors += 1
                         continue
+                    if min_zx is None or zx < min_zx:
+                        min_zx = zx
+                    if max_zx is None or zx > max_zx:
+                        max_zx = zx
+                    if min_zy is None or zy < min_zy:
+                        min_zy = zy
+                    if max_zy is None or zy > max_zy:
+                        max_zy = zy
+                print(
+                    f"{tag} world_zdos frame epoch={live.hotspots_world_epoch} "
+                    f"zones_cache={world_zone_count(live)} zones_emitted={len(zones_out)} "
+                    f"min_zx={min_zx} max_zx={max_zx} min_zy={min_zy} max_zy={max_zy}",
+                    flush=True,
+                )
+                self.last_world_log = now
 
-                    ts = evt.get("t")
-                    typ = evt.get("type")
-                    if not (isinstance(ts, str) and isinstance(typ, str)):
-                        st2.schema_errors += 1
-                        st2.dropped_events += 1
-                        continue
-                    if not ts.endswith("Z"):
-                        st2.schema_errors += 1
-                        st2.dropped_events += 1
-                        continue
 
-                    valid = False
-                    legacy_world = False
-                    if typ == "player_positions":
-                        valid = validate_player_positions(evt, now_s)
-                    elif typ == "player_flow":
-                        valid = validate_player_flow(evt, now_s)
-                    elif typ == WORLD_ZDOS_TYPE:
-                        valid, legacy_world = validate_world_zdos(evt, now_s)
-                    else:
-                        st2.dropped_events += 1
-                        continue
+        # Heartbeat (after processing + potential frame write)
+        if now - self.last_heartbeat >= self.heartbeat_every_s:
+            heartbeat_print(states, now_s, self.primary.last_frame_written_s, tag)
+            self.last_heartbeat = now
 
-                    if not valid:
-                        st2.schema_errors += 1
-                        st2.dropped_events += 1
-                        continue
+        # Save state periodically
+        if now - self.last_save >= 2.0:
+            save_offsets(self.state_dir, states)
+            self.last_save = now
 
-                    if ingest_event(live, evt):
-                        st2.total_events += 1
-                        st2.last_event_ts = ts
-                        st2.last_ingest_ts = iso_utc(now_s)
-                        if legacy_world:
-                            st2.legacy_world_zdos += 1
-                    else:
-                        st2.dropped_events += 1
-
-                states[stream_key] = st2
-            # Write one frame per cadence bucket (enables deterministic scrubbing).
-            bucket_s = (now_s // cadence_s) * cadence_s
-            if last_bucket_written is None or bucket_s != last_bucket_written:
-                apply_player_ttl(live, ttl_frames=10)
-                apply_flow_ttl(live, ttl_frames=10)
-                if frames_written % WORLD_ZDOS_QUANTILE_EVERY == 0 or not live.hotspots_world_meta:
-                    live.hotspots_world_meta = compute_world_quantiles(list(live.hotspots_world_counts.values()))
-                    try:
-                        save_world_zdos_cache(world_cache_path, live, last_event_t=states["hotspots_world_zdos"].last_event_ts)
-                    except Exception:
-                        pass
-                counts = {k: states[k].total_events for k in STREAM_FILES.keys()}
-                frame = build_frame_live(live, bucket_s, counts)
-
-                atomic_write_json(os.path.join(out_dir, "frame_live.json"), frame)
-                atomic_write_json(os.path.join(out_dir, "frames", f"frame_{hms_compact(bucket_s)}.json"), frame)
-                last_write_frame_live = iso_utc(now_s)
-                last_write_frame_archive = iso_utc(now_s)
-                last_frame_written_s = bucket_s
-                last_bucket_written = bucket_s
-                frames_written += 1
-                if now - last_world_log >= 60.0:
-                    zones_out = frame.get("hotspots", {}).get("world_zdos", [])
-                    min_zx = min_zy = max_zx = max_zy = None
-                    for z in zones_out:
-                        try:
-                            zx = int(z.get("zx"))
-                            zy = int(z.get("zy"))
-                        except Exception:
-                            continue
-                        if min_zx is None or zx < min_zx:
-                            min_zx = zx
-                        if max_zx is None or zx > max_zx:
-                            max_zx = zx
-                        if min_zy is None or zy < min_zy:
-                            min_zy = zy
-                        if max_zy is None or zy > max_zy:
-                            max_zy = zy
-                    print(
-                        f"[aggv2] world_zdos frame epoch={live.hotspots_world_epoch} "
-                        f"zones_cache={len(live.hotspots_world_counts)} zones_emitted={len(zones_out)} "
-                        f"min_zx={min_zx} max_zx={max_zx} min_zy={min_zy} max_zy={max_zy}",
-                        flush=True,
-                    )
-                    last_world_log = now
-                # Reset per-bucket aggregates so flow represents "current" risk, not lifetime accumulation.
-                live.flow_sum.clear()
-                live.dirty_flow = False
+        # Update manifest periodically
+        if now - self.last_manifest >= 2.0:
+            self.write_manifest(now_s)
+            self.last_manifest = now
+            self.last_write_manifest = iso_utc(now_s)
 
+        # Health output
+        if now - self.last_health >= HEALTH_WRITE_EVERY_S:
+            self.write_health(now_s)
+            self.last_health = now
 
-            # Heartbeat (after processing + potential frame write)
-            if now - last_heartbeat >= heartbeat_every_s:
-                heartbeat_print(states, now_s, last_frame_written_s)
-                last_heartbeat = now
+        return pending
 
-            # Save state periodically
-            if now - last_save >= 2.0:
-                save_offsets(state_dir, states)
-                last_save = now
+    def close(self) -> None:
+        try:
+            save_offsets(self.state_dir, self.states)
+        except Exception:
+            pass
+        try:
+            self.write_manifest(int(time.time()))
+        except Exception:
+            pass
+        if self.rotation is not None:
+            self.rotation.close()
+        if self.retention is not None:
+            self.retention.close()
+        if self.ingest is not None:
+            self.ingest.drop()
+        if self.store is not None:
+            self.store.close()
+        if self.biomes is not None:
+            self.biomes.close()
+        if self.columns is not None:
+            self.columns.close()
+        if self.tracks is not None:
+            self.tracks.flush()
 
-            # Update manifest periodically
-            if now - last_manifest >= 2.0:
-                atomic_write_json(os.path.join(out_dir, "manifest.json"), build_manifest(root, input_dir, out_dir, state_dir, states, cadence_s, now_s))
-                last_manifest = now
-                last_write_manifest = iso_utc(now_s)
+def main() -> None:
+    args = parse_args()
 
-            # Health output
-            if now - last_health >= HEALTH_WRITE_EVERY_S:
-                write_health(out_dir, now_s, start_s, input_dir, states, live, last_write_manifest, last_write_frame_live, last_write_frame_archive)
-                last_health = now
+    precompress_codecs = [c.strip() for c in str(args.precompress or "").split(",") if c.strip()]
+    precomp = Precompressor(precompress_codecs, args.compress_workers) if precompress_codecs else None
+    if precomp is not None:
+        print(f"[aggv2] precompress codecs={','.join(precomp.codecs) or '-'} workers={precomp.workers}"
+              + (f" unavailable={','.join(precomp.skipped_codecs)}" if precomp.skipped_codecs else ""))
+
+    ingest_pool = ProcessPoolExecutor(max_workers=int(args.ingest_workers), initializer=ignore_sigint) if int(args.ingest_workers) > 1 else None
+    if ingest_pool is not None:
+        print(f"[aggv2] ingest workers={int(args.ingest_workers)} (catch-up)")
+    shard_pool = ShardPool(int(args.zone_shards)) if int(args.zone_shards) > 0 else None
+
+    if args.worlds:
+        worlds = [WorldRuntime(ns, name, precomp, ingest_pool, shard_pool) for name, ns in load_worlds_config(args.worlds, args)]
+        budget: Optional[int] = max(4096, int(args.world_budget_kb) * 1024)
+        for w in worlds:
+            w.scheduler = {"worlds": len(worlds), "budget_bytes": budget}
+        print(f"[aggv2] worlds={','.join(w.name for w in worlds)} budget_bytes={budget}", flush=True)
+    else:
+        worlds = [WorldRuntime(args, "", precomp, ingest_pool, shard_pool)]
+        budget = None
+    poll_s = float(args.poll)
 
-            time.sleep(poll_s)
+    turn = 0
+    try:
+        while True:
+            # Round-robin: the world that goes first rotates every pass, and each world reads at
+            # most `budget` bytes per stream per turn, so frame emission in every world keeps pace.
+            busy = False
+            for i in range(len(worlds)):
+                w = worlds[(turn + i) % len(worlds)]
+                if w.poll(budget):
+                    busy = True
+            turn += 1
+            if not busy:
+                time.sleep(poll_s)
 
     except KeyboardInterrupt:
         print("\n[aggv2] stopped", flush=True)
     finally:
-        try:
-            save_offsets(state_dir, states)
-        except Exception:
-            pass
-        try:
-            atomic_write_json(os.path.join(out_dir, "manifest.json"), build_manifest(root, input_dir, out_dir, state_dir, states, cadence_s, int(time.time())))
-        except Exception:
-            pass
+        for w in worlds:
+            w.close()
+        if precomp is not None:
+            precomp.close()
+        if ingest_pool is not None:
+            ingest_pool.shutdown(cancel_futures=True)
+        if shard_pool is not None:
+            shard_pool.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,6 @@
+"""Subsystems of the heatflow aggregator; aggregator.py holds the ingest pipeline and the CLI.
+
+Each module covers one subsystem (stream segments, state store, frame archives, retention, ...)
+and imports only the modules below it; live.py refers to the optional per-view subsystems for
+annotations only.
+"""
@@ -0,0 +1,228 @@
+"""Seekable monthly frame archives (<frames dir>_YYYY-MM.vfa + .vfa.idx.json index) and their reader."""
+
+from __future__ import annotations
+
+import bisect
+import gzip
+import json
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .common import atomic_write_json, iso_utc
+from .streams import file_sig
+
+# Seekable monthly frame archives (written by tools/rotate_monthly.py):
+#   frames_YYYY-MM.vfa           independently gzip-compressed blocks of concatenated frame JSON
+#   frames_YYYY-MM.vfa.idx.json  index: blocks [{off,len,raw_len}], frames [{sec,block,off,len}]
+# Other cadence dirs are archived as frames_<N>s_YYYY-MM.vfa; the name prefix is the frames dir.
+FRAME_ARCHIVE_SCHEMA = "frame_archive.v1"
+FRAME_ARCHIVE_SUFFIX = ".vfa"
+FRAME_ARCHIVE_INDEX_SUFFIX = ".vfa.idx.json"
+FRAME_ARCHIVE_NAME_RE = re.compile(r"^(frames(?:_\d+s)?)_\d{4}-\d{2}")
+FRAME_ARCHIVE_BLOCK_FRAMES = 256
+
+def write_frame_archive(
+    data_path: str,
+    frames: List[Tuple[int, str]],
+    refs: Optional[List[Tuple[int, str]]] = None,
+    block_frames: int = FRAME_ARCHIVE_BLOCK_FRAMES,
+    workers: int = 1,
+) -> Dict[str, Any]:
+    """Pack frame files into a seekable archive and return its index.
+
+    `frames` is [(bucket_s, path)], `refs` is [(bucket_s, referenced_filename)] from
+    frame_refs.jsonl; references resolve to the referenced frame's byte range. Each block is a
+    standalone gzip member, so a reader (or a browser via HTTP Range + DecompressionStream)
+    only decompresses the block it needs.
+
+    Blocks are streamed: at most `workers` blocks are read and compressed at a time and written
+    in order, so memory stays at a few blocks for any month. Data is written before the index,
+    both atomically.
+    """
+    frames = sorted(frames)
+    block_frames = max(1, int(block_frames))
+    workers = max(1, int(workers))
+    entries: List[Dict[str, Any]] = []
+    by_name: Dict[str, Dict[str, Any]] = {}
+    blocks: List[Dict[str, Any]] = []
+
+    def read_block(b: int) -> bytes:
+        buf = bytearray()
+        for sec, path in frames[b * block_frames:(b + 1) * block_frames]:
+            with open(path, "rb") as f:
+                raw = f.read()
+            ent = {"sec": int(sec), "block": b, "off": len(buf), "len": len(raw)}
+            buf += raw
+            entries.append(ent)
+            by_name[os.path.basename(path)] = ent
+        return bytes(buf)
+
+    n_blocks = (len(frames) + block_frames - 1) // block_frames
+    tmp = data_path + ".tmp"
+    with open(tmp, "wb") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+        off = 0
+        pending: deque = deque()
+        for b in range(n_blocks):
+            raw = read_block(b)
+            pending.append((len(raw), pool.submit(gzip.compress, raw, 6, mtime=0)))
+            while pending and (len(pending) >= workers or b == n_blocks - 1):
+                raw_len, fut = pending.popleft()
+                comp = fut.result()
+                f.write(comp)
+                blocks.append({"off": off, "len": len(comp), "raw_len": raw_len})
+                off += len(comp)
+    os.replace(tmp, data_path)
+
+    for sec, ref in refs or []:
+        target = by_name.get(ref)
+        if target is not None:
+            entries.append({**target, "sec": int(sec), "ref": True})
+    entries.sort(key=lambda e: e["sec"])
+    index = {
+        "schema": FRAME_ARCHIVE_SCHEMA,
+        "data": os.path.basename(data_path),
+        "codec": "gzip",
+        "block_frames": block_frames,
+        "earliest": iso_utc(entries[0]["sec"]) if entries else None,
+        "latest": iso_utc(entries[-1]["sec"]) if entries else None,
+        "n_frames": len(entries),
+        "blocks": blocks,
+        "frames": entries,
+    }
+    atomic_write_json(data_path[: -len(FRAME_ARCHIVE_SUFFIX)] + FRAME_ARCHIVE_INDEX_SUFFIX, index)
+    return index
+
+class FrameArchive:
+    """Random-access reader for a seekable frame archive (see write_frame_archive)."""
+
+    def __init__(self, index_path: str, cache_blocks: int = 8) -> None:
+        with open(index_path, "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        if not isinstance(self.index, dict) or self.index.get("schema") != FRAME_ARCHIVE_SCHEMA:
+            raise ValueError(f"not a frame archive index: {index_path}")
+        self.data_path = os.path.join(os.path.dirname(index_path), str(self.index.get("data")))
+        self.frames: List[Dict[str, Any]] = list(self.index.get("frames") or [])
+        self.secs = [int(e["sec"]) for e in self.frames]
+        self.blocks: List[Dict[str, Any]] = list(self.index.get("blocks") or [])
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self._cache_blocks = max(1, int(cache_blocks))
+        # Readers may share one instance across threads (tools/serve_atlas.py handler threads).
+        self._lock = threading.Lock()
+
+    def _block(self, i: int) -> bytes:
+        with self._lock:
+            raw = self._cache.get(i)
+            if raw is not None:
+                self._cache.move_to_end(i)
+                return raw
+        blk = self.blocks[i]
+        with open(self.data_path, "rb") as f:
+            f.seek(int(blk["off"]))
+            raw = gzip.decompress(f.read(int(blk["len"])))
+        with self._lock:
+            self._cache[i] = raw
+            self._cache.move_to_end(i)
+            while len(self._cache) > self._cache_blocks:
+                self._cache.popitem(last=False)
+        return raw
+
+    def _entry(self, bucket_s: int) -> Optional[Dict[str, Any]]:
+        i = bisect.bisect_left(self.secs, bucket_s)
+        if i < len(self.secs) and self.secs[i] == bucket_s:
+            return self.frames[i]
+        return None
+
+    def get_bytes(self, bucket_s: int) -> Optional[bytes]:
+        e = self._entry(bucket_s)
+        if e is None:
+            return None
+        raw = self._block(int(e["block"]))
+        return raw[int(e["off"]): int(e["off"]) + int(e["len"])]
+
+    def get(self, bucket_s: int) -> Optional[Dict[str, Any]]:
+        data = self.get_bytes(bucket_s)
+        if data is None:
+            return None
+        frame = json.loads(data.decode("utf-8"))
+        if isinstance(frame, dict) and isinstance(frame.get("meta"), dict):
+            frame["meta"]["t"] = iso_utc(bucket_s)
+        return frame
+
+    def nearest_sec(self, bucket_s: int) -> Optional[int]:
+        """Latest archived bucket at or before bucket_s."""
+        i = bisect.bisect_right(self.secs, bucket_s) - 1
+        return self.secs[i] if i >= 0 else None
+
+    def iter_range(self, start_s: int, end_s: int) -> Any:
+        """Yield (bucket_s, frame) for start_s <= bucket_s <= end_s, block by block."""
+        i = bisect.bisect_left(self.secs, start_s)
+        while i < len(self.secs) and self.secs[i] <= end_s:
+            sec = self.secs[i]
+            frame = self.get(sec)
+            if frame is not None:
+                yield sec, frame
+            i += 1
+
+_archive_info_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
+def list_frame_archives(archive_dir: str, frames_name: str = "frames") -> List[Dict[str, Any]]:
+    """Summaries of seekable archives under archive_dir/<YYYY-MM>/frames/ (index paths relative to archive_dir).
+
+    Only archives of the frames dir `frames_name` are listed ("frames" = the primary cadence).
+    """
+    out: List[Dict[str, Any]] = []
+    try:
+        months = sorted(os.listdir(archive_dir))
+    except Exception:
+        return out
+    for month in months:
+        fdir = os.path.join(archive_dir, month, "frames")
+        try:
+            names = sorted(os.listdir(fdir))
+        except Exception:
+            continue
+        for fn in names:
+            if not fn.endswith(FRAME_ARCHIVE_INDEX_SUFFIX):
+                continue
+            m = FRAME_ARCHIVE_NAME_RE.match(fn)
+            if (m.group(1) if m else "frames") != frames_name:
+                continue
+            path = os.path.join(fdir, fn)
+            sig = file_sig(path)
+            if sig is None:
+                continue
+            cached = _archive_info_cache.get(path)
+            if cached is None or cached[0] != sig.mtime_ns:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        idx = json.load(f)
+                except Exception:
+                    continue
+                if not isinstance(idx, dict) or idx.get("schema") != FRAME_ARCHIVE_SCHEMA:
+                    continue
+                info = {
+                    "month": month,
+                    "index": f"{month}/frames/{fn}",
+                    "data": f"{month}/frames/{idx.get('data')}",
+                    "earliest": idx.get("earliest"),
+                    "latest": idx.get("latest"),
+                    "n_frames": idx.get("n_frames"),
+                    "codec": idx.get("codec"),
+                }
+                cached = (sig.mtime_ns, info)
+                _archive_info_cache[path] = cached
+            out.append(dict(cached[1]))
+    return out
+
+def open_frame_archives(archive_dir: str, frames_name: str = "frames") -> List[FrameArchive]:
+    archives: List[FrameArchive] = []
+    for info in list_frame_archives(archive_dir, frames_name):
+        try:
+            archives.append(FrameArchive(os.path.join(archive_dir, info["index"])))
+        except Exception:
+            continue
+    return archives
@@ -0,0 +1,287 @@
+"""Columnar day chunks of frames for analytics (--columns, tools/export_columns.py)."""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+try:  # optional: only needed to load columnar exports (load_columns)
+    import numpy as _np  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    _np = None
+
+from .common import atomic_write_json, iso_utc, parse_ts_to_epoch_s
+
+# Columnar export (--columns): per-UTC-day chunks of .npy columns under <columns>/chunk_YYYY-MM-DD/.
+# Rows are long-format (one per zone / edge / player per bucket) so months load with np.load(mmap_mode="r")
+# and aggregate with vectorized ops; zone and player ids index the dictionaries in zones.json/players.json.
+COLUMNS_SCHEMA = "columns.v1"
+NPY_HEADER_LEN = 128  # fixed, so the shape can be rewritten in place as rows are appended
+COLUMN_TABLES: Dict[str, List[Tuple[str, str, str]]] = {
+    # table: [(column, npy descr, array typecode)]
+    "hot": [("t", "<i8", "q"), ("zone", "<i4", "i"), ("count", "<i4", "i")],
+    "flow": [("t", "<i8", "q"), ("a", "<i4", "i"), ("b", "<i4", "i"), ("c", "<i4", "i")],
+    "players": [("t", "<i8", "q"), ("player", "<i4", "i"), ("zone", "<i4", "i"), ("x", "<f4", "f"), ("z", "<f4", "f")],
+}
+
+def _npy_header(descr: str, n: int) -> bytes:
+    body = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, n)
+    hlen = NPY_HEADER_LEN - 10
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", hlen) + (body.ljust(hlen - 1) + "\n").encode("latin1")
+
+def _npy_rows(path: str) -> int:
+    try:
+        with open(path, "rb") as f:
+            head = f.read(NPY_HEADER_LEN)
+        m = re.search(rb"'shape': \((\d+),\)", head)
+        return int(m.group(1)) if m else 0
+    except Exception:
+        return 0
+
+class ColumnChunk:
+    """Open .npy columns of one day; rows are committed by rewriting each header's shape.
+
+    Data is appended before headers are updated, so a crash leaves at most an uncommitted
+    tail; on reopen every column of a table is truncated back to the table's committed rows,
+    or to `recorded` rows (the exporter's state) when fewer.
+    """
+
+    def __init__(self, chunk_dir: str, recorded: Optional[Dict[str, int]] = None) -> None:
+        os.makedirs(chunk_dir, exist_ok=True)
+        self.dir = chunk_dir
+        self.rows: Dict[str, int] = {}
+        self.files: Dict[str, Any] = {}
+        for table, cols in COLUMN_TABLES.items():
+            paths = [os.path.join(chunk_dir, f"{table}_{c}.npy") for c, _, _ in cols]
+            n = min(_npy_rows(p) for p in paths)
+            if recorded is not None:
+                n = min(n, int(recorded.get(table, 0)))
+            self.rows[table] = n
+            for (col, descr, code), path in zip(cols, paths):
+                f = open(path, "r+b" if os.path.exists(path) else "w+b")
+                f.truncate(NPY_HEADER_LEN + n * array(code).itemsize)
+                f.seek(0)
+                f.write(_npy_header(descr, n))
+                f.seek(0, os.SEEK_END)
+                self.files[f"{table}_{col}"] = f
+
+    def append(self, table: str, columns: Dict[str, Any]) -> None:
+        n = 0
+        for col, _, code in COLUMN_TABLES[table]:
+            arr = array(code, columns[col])
+            if sys.byteorder != "little":
+                arr.byteswap()
+            self.files[f"{table}_{col}"].write(arr.tobytes())
+            n = len(arr)
+        self.rows[table] += n
+
+    def commit(self) -> None:
+        for table, cols in COLUMN_TABLES.items():
+            for col, descr, _ in cols:
+                f = self.files[f"{table}_{col}"]
+                f.flush()
+                f.seek(0)
+                f.write(_npy_header(descr, self.rows[table]))
+                f.seek(0, os.SEEK_END)
+                f.flush()
+
+    def close(self) -> None:
+        for f in self.files.values():
+            try:
+                f.close()
+            except Exception:
+                pass
+        self.files.clear()
+
+class ColumnExporter:
+    """Appends each bucket's hotspots, flow edges and player positions to columnar chunks.
+
+    state.json records the last exported bucket with the row counts of its chunk. Headers are
+    committed before it is written, so after a crash in between, reopening that chunk drops
+    the rows state.json does not know about and the bucket is exported again exactly once.
+    """
+
+    def __init__(self, columns_dir: str) -> None:
+        self.dir = columns_dir
+        os.makedirs(columns_dir, exist_ok=True)
+        self.zones: List[List[int]] = self._load_dict("zones.json")
+        self.players: List[str] = self._load_dict("players.json")
+        self.zone_ids: Dict[Tuple[int, int], int] = {(z[0], z[1]): i for i, z in enumerate(self.zones)}
+        self.player_ids: Dict[str, int] = {p: i for i, p in enumerate(self.players)}
+        self.last_bucket_s: Optional[int] = None
+        self.state_day: Optional[str] = None
+        self.state_rows: Optional[Dict[str, int]] = None
+        try:
+            with open(os.path.join(columns_dir, "state.json"), "r", encoding="utf-8") as f:
+                st = json.load(f)
+            self.last_bucket_s = st.get("last_bucket_s")
+            if isinstance(st.get("rows"), dict):
+                self.state_day = str(st.get("chunk"))
+                self.state_rows = {t: int(st["rows"].get(t, 0)) for t in COLUMN_TABLES}
+        except Exception:
+            pass
+        self.chunk: Optional[ColumnChunk] = None
+        self.chunk_day: Optional[str] = None
+        self.buckets = 0
+        self.rows = {t: 0 for t in COLUMN_TABLES}
+        self.errors = 0
+
+    def _load_dict(self, name: str) -> List[Any]:
+        try:
+            with open(os.path.join(self.dir, name), "r", encoding="utf-8") as f:
+                return list(json.load(f).get("items") or [])
+        except Exception:
+            return []
+
+    def _zone(self, zx: Any, zy: Any, new: List[int]) -> int:
+        key = (int(zx), int(zy))
+        zid = self.zone_ids.get(key)
+        if zid is None:
+            zid = len(self.zones)
+            self.zones.append([key[0], key[1]])
+            self.zone_ids[key] = zid
+            new[0] += 1
+        return zid
+
+    def append_frame(self, bucket_s: int, frame: Dict[str, Any]) -> bool:
+        """Export one sealed bucket; buckets at or before the last exported one are skipped.
+
+        Flow edges and players a frame only carries over for their TTL (`last_seen` older than
+        `meta.t`) are left out, so summing a column counts each refresh once.
+        """
+        if self.last_bucket_s is not None and bucket_s <= self.last_bucket_s:
+            return False
+        try:
+            day = time.strftime("%Y-%m-%d", time.gmtime(bucket_s))
+            if day != self.chunk_day:
+                if self.chunk is not None:
+                    self.chunk.close()
+                recorded: Optional[Dict[str, int]] = None
+                if self.state_rows is not None and self.state_day is not None and day >= self.state_day:
+                    # Rows past state.json's counts (a later day: all rows) were never recorded.
+                    recorded = self.state_rows if day == self.state_day else {}
+                self.chunk = ColumnChunk(os.path.join(self.dir, f"chunk_{day}"), recorded)
+                self.chunk_day = day
+            new_zones = [0]
+            new_players = 0
+            t = (frame.get("meta") or {}).get("t")
+            hot: Dict[str, List[Any]] = {"t": [], "zone": [], "count": []}
+            for z in (frame.get("hotspots") or {}).get("world_zdos") or []:
+                hot["zone"].append(self._zone(z["zx"], z["zy"], new_zones))
+                hot["count"].append(int(z.get("count", 0)))
+            hot["t"] = [bucket_s] * len(hot["zone"])
+            flow: Dict[str, List[Any]] = {"t": [], "a": [], "b": [], "c": []}
+            for e in frame.get("flow") or []:
+                if e.get("last_seen", t) != t:
+                    continue
+                flow["a"].append(self._zone(e["a"]["zx"], e["a"]["zy"], new_zones))
+                flow["b"].append(self._zone(e["b"]["zx"], e["b"]["zy"], new_zones))
+                flow["c"].append(int(e.get("c", 0)))
+            flow["t"] = [bucket_s] * len(flow["a"])
+            pl: Dict[str, List[Any]] = {"t": [], "player": [], "zone": [], "x": [], "z": []}
+            for p in frame.get("players") or []:
+                if p.get("last_seen", t) != t:
+                    continue
+                pid = str(p.get("id") or "")
+                if not pid or p.get("zx") is None or p.get("zy") is None:
+                    continue
+                num = self.player_ids.get(pid)
+                if num is None:
+                    num = len(self.players)
+                    self.players.append(pid)
+                    self.player_ids[pid] = num
+                    new_players += 1
+                pl["player"].append(num)
+                pl["zone"].append(self._zone(p["zx"], p["zy"], new_zones))
+                pl["x"].append(float(p.get("x") or 0.0))
+                pl["z"].append(float(p.get("z") or 0.0))
+            pl["t"] = [bucket_s] * len(pl["player"])
+
+            # Dictionaries first: committed rows never reference an id that is not on disk.
+            if new_zones[0]:
+                atomic_write_json(os.path.join(self.dir, "zones.json"), {"schema": COLUMNS_SCHEMA, "items": self.zones})
+            if new_players:
+                atomic_write_json(os.path.join(self.dir, "players.json"), {"schema": COLUMNS_SCHEMA, "items": self.players})
+            assert self.chunk is not None
+            for table, cols in (("hot", hot), ("flow", flow), ("players", pl)):
+                self.chunk.append(table, cols)
+                self.rows[table] += len(cols["t"])
+            self.chunk.commit()
+            self.last_bucket_s = bucket_s
+            self.state_day = day
+            self.state_rows = dict(self.chunk.rows)
+            atomic_write_json(
+                os.path.join(self.dir, "state.json"),
+                {"schema": COLUMNS_SCHEMA, "last_bucket_s": bucket_s, "chunk": day, "rows": self.state_rows},
+            )
+            self.buckets += 1
+            return True
+        except Exception:
+            self.errors += 1
+            return False
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "dir": self.dir,
+            "last_bucket": iso_utc(self.last_bucket_s) if self.last_bucket_s is not None else None,
+            "buckets_exported": self.buckets,
+            "rows_exported": dict(self.rows),
+            "zones": len(self.zones),
+            "players": len(self.players),
+            "errors": self.errors,
+        }
+
+    def close(self) -> None:
+        if self.chunk is not None:
+            self.chunk.close()
+            self.chunk = None
+
+def load_columns(
+    columns_dir: str,
+    table: str,
+    start_s: Optional[int] = None,
+    end_s: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Load one table across day chunks as NumPy arrays (memory-mapped per chunk, then concatenated).
+
+    Also returns `zones` (N x 2 int32 array: zone id -> zx, zy) and `players` (list of ids).
+    Requires numpy.
+    """
+    if _np is None:
+        raise RuntimeError("load_columns requires numpy")
+    parts: Dict[str, List[Any]] = {c: [] for c, _, _ in COLUMN_TABLES[table]}
+    for name in sorted(os.listdir(columns_dir)):
+        if not name.startswith("chunk_"):
+            continue
+        day_s = parse_ts_to_epoch_s(name[len("chunk_"):] + "T00:00:00Z")
+        if day_s is None:
+            continue
+        if (start_s is not None and day_s + 86400 <= start_s) or (end_s is not None and day_s > end_s):
+            continue
+        cols = {c: _np.load(os.path.join(columns_dir, name, f"{table}_{c}.npy"), mmap_mode="r") for c in parts}
+        n = min(len(a) for a in cols.values())
+        t = cols["t"][:n]
+        lo = int(_np.searchsorted(t, start_s, "left")) if start_s is not None else 0
+        hi = int(_np.searchsorted(t, end_s, "right")) if end_s is not None else n
+        for c, a in cols.items():
+            parts[c].append(a[lo:hi])
+    out: Dict[str, Any] = {
+        c: (_np.concatenate(v) if v else _np.zeros(0, dtype=_np.dtype(d)))
+        for (c, d, _), v in zip(COLUMN_TABLES[table], parts.values())
+    }
+    dicts: Dict[str, List[Any]] = {}
+    for name in ("zones", "players"):
+        try:
+            with open(os.path.join(columns_dir, f"{name}.json"), "r", encoding="utf-8") as f:
+                dicts[name] = list(json.load(f).get("items") or [])
+        except Exception:
+            dicts[name] = []
+    out["zones"] = _np.asarray(dicts["zones"], dtype=_np.int32).reshape(-1, 2)
+    out["players"] = dicts["players"]
+    return out
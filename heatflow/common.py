@@ -0,0 +1,130 @@
+"""Constants, atomic writes, time formatting and zone keys shared by the aggregator and its subsystems."""
+
+from __future__ import annotations
+
+import calendar
+import json
+import os
+import signal
+import time
+from typing import Any, List, Optional, Tuple
+
+SCHEMA_VERSION = "2.1-hb-cadence-rehydrate"
+MAX_FUTURE_EVENT_S = 86400  # 24h guardrail for timestamps
+
+# Stream filenames (fixed names; dirs are configurable)
+STREAM_FILES = {
+    "player_positions": "player_positions.jsonl",
+    "player_flow": "player_flow.jsonl",
+    "hotspots_world_zdos": "hotspots_world_zdos.jsonl",
+}
+
+WORLD_ZDOS_TYPE = "hotspots_world_zdos"
+WORLD_ZDOS_SCHEMA = "zdo_schema"
+WORLD_ZDOS_BUCKET_S = 30  # plugin scan bucket (BucketSeconds); independent of output cadences
+
+def ensure_dir(p: str) -> None:
+    os.makedirs(p, exist_ok=True)
+
+def atomic_write_text(path: str, text: str) -> None:
+    ensure_dir(os.path.dirname(path) or ".")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        f.write(text)
+    # Windows can be picky if file is open elsewhere; retry a bit.
+    retries = 25 if os.name == "nt" else 3
+    for i in range(retries):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            if i == retries - 1:
+                raise
+            time.sleep(0.04)
+
+def atomic_write_json(path: str, obj: Any) -> None:
+    atomic_write_text(path, json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    ensure_dir(os.path.dirname(path) or ".")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    retries = 25 if os.name == "nt" else 3
+    for i in range(retries):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            if i == retries - 1:
+                raise
+            time.sleep(0.04)
+
+def parse_ts_to_epoch_s(ts: Any) -> Optional[int]:
+    if not isinstance(ts, str) or not ts.endswith("Z"):
+        return None
+    core = ts[:-1]
+    if "." in core:
+        core = core.split(".", 1)[0]
+    try:
+        st = time.strptime(core, "%Y-%m-%dT%H:%M:%S")
+        return int(calendar.timegm(st))
+    except Exception:
+        return None
+
+def iso_utc(epoch_s: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch_s))
+
+def hms_compact(epoch_s: int) -> str:
+    return time.strftime("%Y%m%dT%H%M%S", time.gmtime(epoch_s))
+
+def parse_compact_to_epoch_s(compact: str) -> Optional[int]:
+    """Parse YYYYMMDDTHHMMSS (UTC) to epoch seconds."""
+    try:
+        st = time.strptime(compact, "%Y%m%dT%H%M%S")
+        return int(calendar.timegm(st))
+    except Exception:
+        return None
+
+def read_tail_lines(path: str, want_lines: int, max_bytes: int = 10_000_000) -> List[str]:
+    try:
+        size = os.path.getsize(path)
+    except Exception:
+        return []
+    if size <= 0:
+        return []
+    chunk = 2_000_000
+    data = ""
+    while chunk <= max_bytes:
+        start = max(0, size - chunk)
+        try:
+            with open(path, "rb") as f:
+                f.seek(start)
+                data = f.read().decode("utf-8", errors="replace")
+        except Exception:
+            return []
+        lines = data.splitlines()
+        if len(lines) >= want_lines or start == 0:
+            return lines
+        chunk *= 2
+    return data.splitlines()
+
+def zk(zx: int, zy: int) -> str:
+    return f"{zx},{zy}"
+
+def fk(a: str, b: str) -> str:
+    return f"{a}->{b}"
+
+def parse_zk(k: str) -> Tuple[int, int]:
+    a, b = k.split(",", 1)
+    return int(a), int(b)
+
+def parse_fk(k: str) -> Tuple[int, int, int, int]:
+    left, right = k.split("->", 1)
+    ax, ay = parse_zk(left)
+    bx, by = parse_zk(right)
+    return ax, ay, bx, by
+
+def ignore_sigint() -> None:
+    """Worker processes leave Ctrl+C to the main process, which shuts them down in order."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
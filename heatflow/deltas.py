@@ -0,0 +1,144 @@
+"""Live frame deltas against the previous live frame (--live-deltas)."""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from .frames import encode_frame
+from .live import CadenceView
+from .precompress import PRECOMPRESS_CODECS, Precompressor, write_bytes_output
+
+# Live delta patches (--live-deltas N): next to frame_live.json, each live write also publishes
+# live_delta_<seq>.json with the zones, players and flow edges added, changed or removed since the
+# previous live frame. frame_live.json carries the same seq in `meta.seq`; a client at seq n that
+# finds live_delta_<n+1>.json with `base` == n applies it, anything else resyncs from the full frame.
+# The newest N patches are kept.
+
+def live_delta_name(view: CadenceView, seq: Any) -> str:
+    return f"live_delta_{seq}.json" if view.primary else f"live_delta_{view.cadence_s}s_{seq}.json"
+
+def _live_delta_key(section: str, item: Dict[str, Any]) -> Any:
+    if section == "zones":
+        return (item.get("zx"), item.get("zy"))
+    if section == "players":
+        return item.get("id")
+    a, b = item.get("a") or {}, item.get("b") or {}
+    return (a.get("zx"), a.get("zy"), b.get("zx"), b.get("zy"))
+
+def _live_delta_lists(frame: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    return {
+        "zones": (frame.get("hotspots") or {}).get("world_zdos") or [],
+        "players": frame.get("players") or [],
+        "edges": frame.get("flow") or [],
+    }
+
+def diff_live_section(section: str, old: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Entries of `new` that are not in `old` or differ from it, and keys of `old` entries gone from `new`."""
+    out: Dict[str, List[Any]] = {"add": [], "change": [], "remove": []}
+    if old is new:
+        # Cached frame sections are shared between frames until rebuilt.
+        return out
+    prev = {_live_delta_key(section, it): it for it in old}
+    for it in new:
+        was = prev.pop(_live_delta_key(section, it), None)
+        if was is None:
+            out["add"].append(it)
+        elif was != it:
+            out["change"].append(it)
+    out["remove"] = [list(k) if isinstance(k, tuple) else k for k in prev]
+    return out
+
+def build_live_delta(prev: Optional[Dict[str, Any]], frame: Dict[str, Any], seq: int) -> Dict[str, Any]:
+    """Patch from `prev` (the live frame at seq - 1, None if unknown) to `frame`.
+
+    Zones are keyed by (zx, zy), players by id, edges by (a.zx, a.zy, b.zx, b.zy); `meta`,
+    `hotspots_meta` and the spike list are small and sent whole. List order is not patched
+    (zones/edges are ordered by count in full frames); `sizes` are the list lengths after applying.
+    `player_groups`, when the frame has it, is sent whole as well.
+    """
+    lists = _live_delta_lists(frame)
+    old = _live_delta_lists(prev) if prev is not None else None
+    delta: Dict[str, Any] = {
+        "seq": seq,
+        "base": seq - 1 if prev is not None else None,
+        "t": frame["meta"]["t"],
+        "meta": {**frame["meta"], "seq": seq},
+        "hotspots_meta": frame.get("hotspots_meta"),
+    }
+    for section, items in lists.items():
+        delta[section] = diff_live_section(section, old[section] if old is not None else [], items)
+    spikes = (frame.get("hotspots") or {}).get("world_zdos_spikes")
+    if spikes is not None:
+        delta["spikes"] = spikes
+    if "player_groups" in frame:
+        delta["player_groups"] = frame["player_groups"]
+    delta["sizes"] = {k: len(v) for k, v in lists.items()}
+    return delta
+
+def load_live_seq(out_dir: str, view: CadenceView) -> None:
+    """Continue the seq of an existing frame_live.json and drop patches that no longer follow it."""
+    try:
+        with open(os.path.join(out_dir, view.live_name), "rb") as f:
+            prev = json.loads(f.read().decode("utf-8"))
+        seq = prev["meta"]["seq"]
+        if isinstance(seq, int) and seq > 0:
+            view.live_seq = seq
+            view.live_prev = prev
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    head, _, tail = live_delta_name(view, "*").partition("*")
+    try:
+        names = os.listdir(out_dir)
+    except OSError:
+        return
+    for fn in names:
+        base = fn
+        for suffix, _ in PRECOMPRESS_CODECS.values():
+            if base.endswith(suffix):
+                base = base[: -len(suffix)]
+        num = base[len(head):-len(tail)] if base.startswith(head) and base.endswith(tail) else ""
+        if num.isdigit() and (int(num) > view.live_seq or int(num) <= view.live_seq - view.delta_keep):
+            try:
+                os.remove(os.path.join(out_dir, fn))
+            except OSError:
+                pass
+
+def write_live_frame(
+    out_dir: str,
+    view: CadenceView,
+    frame: Dict[str, Any],
+    data: bytes,
+    precomp: Optional[Precompressor] = None,
+) -> None:
+    """Write `data` (encode_frame bytes of `frame`) as the view's live frame, with its delta patch.
+
+    With patches the live frame carries `meta.seq`, so it is encoded again from a copy of `frame`
+    with that meta; its sections are the same objects, so their cached bytes are reused.
+    """
+    if view.delta_keep <= 0:
+        write_bytes_output(os.path.join(out_dir, view.live_name), data, precomp)
+        return
+    view.live_seq += 1
+    seq = view.live_seq
+    # The patch goes first, so that a frame_live.json at seq n always has live_delta_<n> beside it.
+    delta = build_live_delta(view.live_prev, frame, seq)
+    blob = json.dumps(delta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    write_bytes_output(os.path.join(out_dir, live_delta_name(view, seq)), blob, precomp)
+    data = encode_frame(view.live, {**frame, "meta": delta["meta"]}, digest=False)[0]
+    write_bytes_output(os.path.join(out_dir, view.live_name), data, precomp)
+    st = view.delta_stats
+    st["written"] += 1
+    st["resyncs"] += view.live_prev is None
+    st["bytes_last"] = len(blob)
+    st["frame_bytes_last"] = len(data)
+    view.live_prev = frame
+    old = seq - view.delta_keep
+    if old > 0:
+        path = os.path.join(out_dir, live_delta_name(view, old))
+        for suffix in [""] + [v[0] for v in PRECOMPRESS_CODECS.values()]:
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
@@ -0,0 +1,153 @@
+"""JSONL event parsing, schema validation and ingest counters."""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from .common import (
+    MAX_FUTURE_EVENT_S, WORLD_ZDOS_BUCKET_S, WORLD_ZDOS_SCHEMA, WORLD_ZDOS_TYPE, iso_utc, parse_ts_to_epoch_s,
+)
+from .streams import StreamState
+
+def is_ts_sane(ts: Any, now_s: int) -> bool:
+    es = parse_ts_to_epoch_s(ts)
+    if es is None:
+        return False
+    if es < 0:
+        return False
+    if es > now_s + MAX_FUTURE_EVENT_S:
+        return False
+    return True
+
+def validate_player_positions(evt: Dict[str, Any], now_s: int) -> bool:
+    if evt.get("type") != "player_positions":
+        return False
+    if not is_ts_sane(evt.get("t"), now_s):
+        return False
+    players = evt.get("players")
+    if not isinstance(players, list):
+        return False
+    for p in players:
+        if not isinstance(p, dict):
+            continue
+        pid = p.get("id")
+        if isinstance(pid, str) and pid:
+            return True
+    return False
+
+def validate_player_flow(evt: Dict[str, Any], now_s: int) -> bool:
+    if evt.get("type") != "player_flow":
+        return False
+    if not is_ts_sane(evt.get("t"), now_s):
+        return False
+    trans = evt.get("transitions")
+    if not isinstance(trans, list):
+        return False
+    for tr in trans:
+        if not isinstance(tr, dict):
+            continue
+        fx, fy = tr.get("fx"), tr.get("fy")
+        tx, ty = tr.get("tx"), tr.get("ty")
+        n = tr.get("n")
+        if all(isinstance(v, (int, float)) for v in (fx, fy, tx, ty, n)):
+            return True
+    return False
+
+def validate_world_zdos(evt: Dict[str, Any], now_s: int, expected_bucket_s: int = WORLD_ZDOS_BUCKET_S) -> Tuple[bool, bool]:
+    if evt.get("type") != WORLD_ZDOS_TYPE:
+        return False, False
+    schema = evt.get("schema")
+    if not isinstance(schema, str) or schema != WORLD_ZDOS_SCHEMA:
+        return False, False
+    if not is_ts_sane(evt.get("t"), now_s):
+        return False, False
+    try:
+        bucket_s = int(evt.get("bucket_s", 0) or 0)
+    except Exception:
+        return False, False
+    if bucket_s != expected_bucket_s:
+        return False, False
+    epoch = evt.get("epoch")
+    if not isinstance(epoch, int):
+        return False, False
+    zones = evt.get("zones")
+    if not isinstance(zones, list):
+        return False, False
+    for z in zones:
+        if not isinstance(z, dict):
+            continue
+        zx_, zy_ = z.get("zx"), z.get("zy")
+        cnt = z.get("count")
+        if all(isinstance(v, (int, float)) for v in (zx_, zy_, cnt)):
+            return True, False
+    return (len(zones) == 0), False
+
+def parse_event_line(
+    st: StreamState, ln: str, now_s: int, world_bucket_s: int = WORLD_ZDOS_BUCKET_S
+) -> Optional[Tuple[Dict[str, Any], bool]]:
+    """Parse + validate one JSONL line, updating the stream's error counters.
+
+    Returns (event, legacy_world) for events that should be ingested, else None.
+    """
+    ln = ln.strip()
+    if not ln:
+        return None
+    try:
+        evt = json.loads(ln)
+    except Exception:
+        st.parse_errors += 1
+        return None
+    if not isinstance(evt, dict):
+        st.parse_errors += 1
+        return None
+
+    ts = evt.get("t")
+    typ = evt.get("type")
+    if not (isinstance(ts, str) and isinstance(typ, str)):
+        st.schema_errors += 1
+        st.dropped_events += 1
+        return None
+    if not ts.endswith("Z"):
+        st.schema_errors += 1
+        st.dropped_events += 1
+        return None
+
+    valid = False
+    legacy_world = False
+    if typ == "player_positions":
+        valid = validate_player_positions(evt, now_s)
+    elif typ == "player_flow":
+        valid = validate_player_flow(evt, now_s)
+    elif typ == WORLD_ZDOS_TYPE:
+        valid, legacy_world = validate_world_zdos(evt, now_s, world_bucket_s)
+    else:
+        st.dropped_events += 1
+        return None
+
+    if not valid:
+        st.schema_errors += 1
+        st.dropped_events += 1
+        return None
+    return evt, legacy_world
+
+def record_ingest(st: StreamState, evt: Dict[str, Any], ok: bool, legacy_world: bool, now_s: int) -> None:
+    agg = evt.get("_agg")
+    if agg is not None:
+        # A partial from reduce_events stands for several events.
+        n_ok, n_dropped, n_legacy, last_t = agg
+        if n_ok:
+            st.total_events += n_ok
+            st.last_event_ts = last_t
+            st.last_ingest_ts = iso_utc(now_s)
+            st.legacy_world_zdos += n_legacy
+        st.dropped_events += n_dropped
+        return
+    if ok:
+        st.total_events += 1
+        st.last_event_ts = evt.get("t")
+        st.last_ingest_ts = iso_utc(now_s)
+        if legacy_world:
+            st.legacy_world_zdos += 1
+    else:
+        st.dropped_events += 1
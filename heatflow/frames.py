@@ -0,0 +1,229 @@
+"""Frame files: content hashes, incremental encoding, frame_refs.jsonl and frame listing."""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:  # POSIX; frame_refs_lock falls back to msvcrt on Windows
+    import fcntl as _fcntl
+except Exception:  # pragma: no cover - platform dependent
+    _fcntl = None
+try:
+    import msvcrt as _msvcrt  # type: ignore
+except Exception:  # pragma: no cover - platform dependent
+    _msvcrt = None
+
+from .common import ensure_dir, hms_compact, iso_utc, parse_compact_to_epoch_s
+from .live import LiveAgg
+from .streams import file_sig
+
+# Buckets whose frame body matches the previous bucket are recorded here instead of as files.
+FRAME_REFS_FILENAME = "frame_refs.jsonl"
+
+_frame_refs_cache: Dict[str, Tuple[int, int, List[Tuple[int, str]]]] = {}
+
+def load_frame_refs(frames_dir: str) -> List[Tuple[int, str]]:
+    """Return [(bucket_s, referenced_filename), ...] from frames_dir/frame_refs.jsonl.
+
+    Cached by file size/mtime, since the manifest rebuilds the frame list every few seconds.
+    """
+    path = os.path.join(frames_dir, FRAME_REFS_FILENAME)
+    sig = file_sig(path)
+    if sig is None:
+        return []
+    cached = _frame_refs_cache.get(path)
+    if cached is not None and cached[0] == sig.size and cached[1] == sig.mtime_ns:
+        return cached[2]
+    refs: List[Tuple[int, str]] = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for ln in f:
+                ln = ln.strip()
+                if not ln:
+                    continue
+                try:
+                    rec = json.loads(ln)
+                except Exception:
+                    continue
+                if not isinstance(rec, dict):
+                    continue
+                sec, ref = rec.get("sec"), rec.get("ref")
+                if isinstance(sec, int) and isinstance(ref, str) and ref.startswith("frame_"):
+                    refs.append((sec, ref))
+    except Exception:
+        return []
+    _frame_refs_cache[path] = (sig.size, sig.mtime_ns, refs)
+    return refs
+
+@contextlib.contextmanager
+def frame_refs_lock(frames_dir: str) -> Any:
+    """Exclusive advisory lock on frames_dir/frame_refs.jsonl.
+
+    Appends and rewrites take it, so a rewrite by another process (tools/rotate_monthly.py) cannot
+    drop a reference appended between its read and its replace.
+    """
+    ensure_dir(frames_dir)
+    with open(os.path.join(frames_dir, FRAME_REFS_FILENAME + ".lock"), "a+b") as f:
+        if _fcntl is not None:
+            _fcntl.flock(f.fileno(), _fcntl.LOCK_EX)
+        elif _msvcrt is not None:
+            f.seek(0)
+            _msvcrt.locking(f.fileno(), _msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if _fcntl is not None:
+                _fcntl.flock(f.fileno(), _fcntl.LOCK_UN)
+            elif _msvcrt is not None:
+                f.seek(0)
+                _msvcrt.locking(f.fileno(), _msvcrt.LK_UNLCK, 1)
+
+def append_frame_ref(frames_dir: str, bucket_s: int, ref_name: str) -> None:
+    path = os.path.join(frames_dir, FRAME_REFS_FILENAME)
+    with frame_refs_lock(frames_dir), open(path, "a", encoding="utf-8", newline="\n") as f:
+        f.write(json.dumps({"sec": int(bucket_s), "t": iso_utc(bucket_s), "ref": ref_name}, separators=(",", ":")) + "\n")
+
+# Frame fields left out of the dedupe hash: they change every bucket without the map changing
+# (meta.t, per-bucket meta.counts, the world scan epoch, heavy-hitter counters). Of hotspots_meta
+# only these stable keys are hashed.
+FRAME_HASH_META_SKIP = ("t", "counts")
+FRAME_HASH_STABLE_META = {"world_zdos": ("p90", "p99", "n_zones", "max"), "flow": ("mode", "capacity", "top_k")}
+
+def _frame_hash_head(frame: Dict[str, Any]) -> bytes:
+    """The stable parts of `meta` and `hotspots_meta`, serialized for the content hash."""
+    meta = frame.get("meta")
+    head: Dict[str, Any] = {"meta": {k: v for k, v in meta.items() if k not in FRAME_HASH_META_SKIP} if isinstance(meta, dict) else meta}
+    hm = frame.get("hotspots_meta")
+    if isinstance(hm, dict):
+        head["hotspots_meta"] = {
+            sec: {k: hm[sec].get(k) for k in keys}
+            for sec, keys in FRAME_HASH_STABLE_META.items()
+            if isinstance(hm.get(sec), dict)
+        }
+    return json.dumps(head, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def frame_content_hash(frame: Dict[str, Any]) -> str:
+    """Hash of the frame's content sections (players, flow, hotspots, ...) and the stable parts of
+    meta/hotspots_meta; two buckets with the same hash show the same map."""
+    h = hashlib.blake2b(_frame_hash_head(frame), digest_size=16)
+    for k, v in frame.items():
+        if k in ("meta", "hotspots_meta"):
+            continue
+        h.update(b"," + json.dumps(k).encode("utf-8") + b":" + json.dumps(v, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return h.hexdigest()
+
+def resolve_frame_path(frames_dir: str, bucket_s: int) -> Optional[str]:
+    """Path of the file holding bucket `bucket_s`: its own frame file, or the one it references."""
+    own = os.path.join(frames_dir, f"frame_{hms_compact(bucket_s)}.json")
+    if os.path.exists(own):
+        return own
+    for sec, ref in load_frame_refs(frames_dir):
+        if sec == bucket_s:
+            target = os.path.join(frames_dir, ref)
+            return target if os.path.exists(target) else None
+    return None
+
+def load_frame(frames_dir: str, bucket_s: int) -> Optional[Dict[str, Any]]:
+    """Load the frame for a bucket, resolving dedupe references (meta.t is set to the bucket)."""
+    path = resolve_frame_path(frames_dir, bucket_s)
+    if path is None:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            frame = json.load(f)
+    except Exception:
+        return None
+    if isinstance(frame, dict) and isinstance(frame.get("meta"), dict):
+        frame["meta"]["t"] = iso_utc(bucket_s)
+    return frame
+
+def scan_frame_time_range(frames_dir: str) -> Tuple[Optional[int], Optional[int]]:
+    """Return (earliest_bucket_s, latest_bucket_s) based on existing archive frames (and references)."""
+    try:
+        names = os.listdir(frames_dir)
+    except Exception:
+        return None, None
+
+    earliest = None
+    latest = None
+    for fn in names:
+        # Expected: frame_YYYYMMDDTHHMMSS.json
+        if not (fn.startswith("frame_") and fn.endswith(".json")):
+            continue
+        core = fn[len("frame_"):-len(".json")]
+        es = parse_compact_to_epoch_s(core)
+        if es is None:
+            continue
+        if earliest is None or es < earliest:
+            earliest = es
+        if latest is None or es > latest:
+            latest = es
+    for es, _ in load_frame_refs(frames_dir):
+        if earliest is None or es < earliest:
+            earliest = es
+        if latest is None or es > latest:
+            latest = es
+    return earliest, latest
+
+def list_frames(frames_dir: str) -> List[Dict[str, Any]]:
+    """Return sorted list of existing frames as [{sec, url}, ...].
+
+    Deduplicated buckets point at the earlier identical frame and carry `"ref": true`.
+    """
+    try:
+        names = os.listdir(frames_dir)
+    except Exception:
+        return []
+
+    out: List[Dict[str, Any]] = []
+    present: Set[str] = set()
+    for fn in names:
+        if not (fn.startswith("frame_") and fn.endswith(".json")):
+            continue
+        core = fn[len("frame_"):-len(".json")]
+        es = parse_compact_to_epoch_s(core)
+        if es is None:
+            continue
+        present.add(fn)
+        out.append({"sec": es, "url": f"frames/{fn}"})
+    for es, ref in load_frame_refs(frames_dir):
+        if ref in present:
+            out.append({"sec": es, "url": f"frames/{ref}", "ref": True})
+
+    out.sort(key=lambda x: x["sec"])
+    return out
+
+def encode_frame(live: LiveAgg, frame: Dict[str, Any], digest: bool = True) -> Tuple[bytes, str]:
+    """Serialize a frame from build_frame_live once for every output.
+
+    Returns (bytes, hash): the bytes equal the compact json.dumps of the frame and the hash equals
+    frame_content_hash(frame) ("" without `digest`). Sections reused from the previous frame reuse
+    their bytes too; `meta` and `hotspots_meta` are small and change every frame, so they are
+    always encoded.
+    """
+    tail: List[bytes] = []
+    h = hashlib.blake2b(_frame_hash_head(frame), digest_size=16) if digest else None
+    for k, v in frame.items():
+        if k == "meta":
+            continue
+        ent = live.frame_parts.get(k)
+        if ent is not None and ent[1] is v:
+            if ent[2] is None:
+                ent[2] = json.dumps(v, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                live.frame_stats["encoded"] += 1
+            else:
+                live.frame_stats["bytes_reused"] += len(ent[2])
+            frag = ent[2]
+        else:
+            frag = json.dumps(v, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        part = b"," + json.dumps(k).encode("utf-8") + b":" + frag
+        if h is not None and k != "hotspots_meta":
+            h.update(part)
+        tail.append(part)
+    rest = b"".join(tail) + b"}"
+    data = b'{"meta":' + json.dumps(frame["meta"], ensure_ascii=False, separators=(",", ":")).encode("utf-8") + rest
+    return data, h.hexdigest() if h is not None else ""
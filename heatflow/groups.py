@@ -0,0 +1,122 @@
+"""Player groups by spatial hash (--group-radius)."""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Dict, List, Tuple
+
+from .live import LiveAgg
+from .tiles import ZONE_SIZE_M
+
+# Player groups (--group-radius M): a per-bucket spatial hash over player world positions (x, z).
+# Players are hashed into square cells one radius wide, so every neighbour within the radius is in
+# the same or one of the 8 adjacent cells; each cell pair is compared once and neighbours are joined
+# with union-find. Groups are the connected components (chains of players each within the radius
+# of the next) with at least --group-min members. Per-zone occupancy counts every player by zx/zy.
+# Frames carry both as `player_groups`; work is O(players) unless many players share one cell.
+GROUP_NEIGHBOURS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))  # half of the 3x3 block; the rest is symmetric
+
+class PlayerGroups:
+    """Builds the `player_groups` frame section from the frame's player list."""
+
+    def __init__(self, radius_m: float, min_size: int = 2) -> None:
+        self.radius = float(radius_m)
+        self.min_size = max(2, int(min_size))
+        self.frames = 0
+        self.frame_s_total = 0.0
+        self.frame_s_max = 0.0
+        self.last_frame_ms = 0.0
+        self.pairs = 0
+        self.players = 0
+        self.groups = 0
+
+    def cluster(self, pts: List[Tuple[float, float]]) -> List[List[int]]:
+        """Indices of `pts` grouped into components with at least min_size members."""
+        r = self.radius
+        r2 = r * r
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        for i, (x, z) in enumerate(pts):
+            cells.setdefault((int(math.floor(x / r)), int(math.floor(z / r))), []).append(i)
+        parent = list(range(len(pts)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        pairs = 0
+        for (cx, cz), members in cells.items():
+            for dx, dz in GROUP_NEIGHBOURS:
+                other = members if dx == dz == 0 else cells.get((cx + dx, cz + dz))
+                if other is None:
+                    continue
+                for k, a in enumerate(members):
+                    ax, az = pts[a]
+                    for b in (other[k + 1:] if other is members else other):
+                        pairs += 1
+                        bx, bz = pts[b]
+                        if (ax - bx) * (ax - bx) + (az - bz) * (az - bz) <= r2:
+                            ra, rb = find(a), find(b)
+                            if ra != rb:
+                                parent[max(ra, rb)] = min(ra, rb)
+        self.pairs += pairs
+        comps: Dict[int, List[int]] = {}
+        for i in range(len(pts)):
+            comps.setdefault(find(i), []).append(i)
+        return [c for c in comps.values() if len(c) >= self.min_size]
+
+    def build(self, live: LiveAgg, players: List[Dict[str, Any]]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        ids: List[str] = []
+        pts: List[Tuple[float, float]] = []
+        occ: Dict[Tuple[int, int], int] = {}
+        for p in players:
+            zx, zy = p.get("zx"), p.get("zy")
+            if isinstance(zx, int) and isinstance(zy, int):
+                occ[(zx, zy)] = occ.get((zx, zy), 0) + 1
+            x, z = p.get("x"), p.get("z")
+            if isinstance(x, (int, float)) and isinstance(z, (int, float)) and math.isfinite(x) and math.isfinite(z):
+                ids.append(p["id"])
+                pts.append((float(x), float(z)))
+        groups: List[Dict[str, Any]] = []
+        for comp in self.cluster(pts):
+            cx = sum(pts[i][0] for i in comp) / len(comp)
+            cz = sum(pts[i][1] for i in comp) / len(comp)
+            groups.append({
+                "n": len(comp),
+                "x": round(cx, 1),
+                "z": round(cz, 1),
+                "zx": int(math.floor(cx / ZONE_SIZE_M)),
+                "zy": int(math.floor(cz / ZONE_SIZE_M)),
+                "players": sorted(ids[i] for i in comp),
+            })
+        groups.sort(key=lambda g: (-g["n"], g["players"][0]))
+        if live.biomes is not None:
+            for g in groups:
+                g["biome"] = live.biomes.biome(g["zx"], g["zy"])
+        if live.locations is not None:
+            live.locations.label(groups)
+        zones = [{"zx": zx, "zy": zy, "n": n} for (zx, zy), n in sorted(occ.items(), key=lambda kv: (-kv[1], kv[0]))]
+        seconds = time.perf_counter() - t0
+        self.frames += 1
+        self.frame_s_total += seconds
+        self.frame_s_max = max(self.frame_s_max, seconds)
+        self.last_frame_ms = seconds * 1000.0
+        self.players = len(players)
+        self.groups = len(groups)
+        return {"radius_m": self.radius, "groups": groups, "zones": zones}
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "radius_m": self.radius,
+            "min_size": self.min_size,
+            "frames": self.frames,
+            "players_last": self.players,
+            "groups_last": self.groups,
+            "pairs_per_frame": round(self.pairs / max(1, self.frames), 1),
+            "build_ms_per_frame": round(self.frame_s_total * 1000.0 / max(1, self.frames), 3),
+            "build_ms_max": round(self.frame_s_max * 1000.0, 3),
+            "build_ms_last": round(self.last_frame_ms, 3),
+        }
@@ -0,0 +1,323 @@
+"""Parallel catch-up ingest of large backlogs over a process pool (--ingest-workers)."""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .common import MAX_FUTURE_EVENT_S, WORLD_ZDOS_SCHEMA, WORLD_ZDOS_TYPE, parse_ts_to_epoch_s
+from .events import parse_event_line
+from .segments import follow_rotation, head_fingerprint, read_head, read_new_lines_chunk
+from .streams import FileSig, StreamState, detect_reset_reason, file_sig
+
+# Parallel catch-up: worker processes parse the same line-aligned chunks the serial path would
+# read, ahead of time, and reduce them to per-bucket partials (see reduce_events); the main
+# process consumes them in file order, so windows, counters and frames come out exactly as with
+# --ingest-workers 0.
+PARSE_NO_FUTURE_LIMIT_S = 1 << 40  # workers skip the now-relative check; it is applied on merge
+INGEST_TAIL_PROBE = 65536
+
+def _chunk_bounds(path: str, offset: int, max_bytes: int) -> Tuple[int, bool]:
+    """End offset of the chunk read_new_lines_chunk would take at `offset`, and whether it is
+    final (its last read was full, so bytes appended later cannot move the boundary)."""
+    step = max(1, int(max_bytes))
+    with open(path, "rb") as f:
+        if step > INGEST_TAIL_PROBE:
+            # Only the tail of the read window decides the cut.
+            f.seek(offset + step - INGEST_TAIL_PROBE)
+            tail = f.read(INGEST_TAIL_PROBE)
+            cut = tail.rfind(b"\n")
+            if len(tail) == INGEST_TAIL_PROBE and cut >= 0:
+                return offset + step - INGEST_TAIL_PROBE + cut + 1, True
+        f.seek(offset)
+        data = f.read(step)
+        full = len(data) == step
+        while data and b"\n" not in data:
+            more = f.read(step)
+            if not more:
+                full = False
+                break
+            full = len(more) == step
+            data += more
+    cut = data.rfind(b"\n")
+    return (offset + cut + 1 if cut >= 0 else offset), full
+
+def _slim_world_zdos(evt: Dict[str, Any]) -> Dict[str, Any]:
+    """Pre-reduce a world_zdos event to what apply_world_zdos_event reads (cuts pickling cost)."""
+    zones = []
+    for z in evt.get("zones") or []:
+        if not isinstance(z, dict):
+            continue
+        zx_, zy_, cnt = z.get("zx"), z.get("zy"), z.get("count")
+        if isinstance(zx_, (int, float)) and isinstance(zy_, (int, float)) and isinstance(cnt, (int, float)) and int(cnt) > 0:
+            zones.append({"zx": zx_, "zy": zy_, "count": cnt})
+    slim = {k: evt.get(k) for k in ("t", "type", "schema", "epoch", "bucket_s")}
+    slim["zones"] = zones
+    return slim
+
+def _valid_players(evt: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    players = evt.get("players")
+    if not isinstance(players, list):
+        return None
+    return [p for p in players if isinstance(p, dict) and isinstance(p.get("id"), str) and p.get("id")]
+
+def _valid_transitions(evt: Dict[str, Any]) -> Optional[List[Tuple[int, int, int, int, int]]]:
+    trans = evt.get("transitions")
+    if not isinstance(trans, list):
+        return None
+    out = []
+    for tr in trans:
+        if not isinstance(tr, dict):
+            continue
+        vals = (tr.get("fx"), tr.get("fy"), tr.get("tx"), tr.get("ty"), tr.get("n"))
+        if all(isinstance(v, (int, float)) for v in vals):
+            out.append(tuple(int(v) for v in vals))  # type: ignore[arg-type]
+    return out
+
+def _valid_zones(evt: Dict[str, Any]) -> Optional[List[Tuple[int, int, int]]]:
+    if evt.get("schema") != WORLD_ZDOS_SCHEMA or not isinstance(evt.get("epoch"), int) or not isinstance(evt.get("zones"), list):
+        return None
+    out = []
+    for z in evt["zones"]:
+        if not isinstance(z, dict):
+            continue
+        zx_, zy_, cnt = z.get("zx"), z.get("zy"), z.get("count")
+        if isinstance(zx_, (int, float)) and isinstance(zy_, (int, float)) and isinstance(cnt, (int, float)) and int(cnt) > 0:
+            out.append((int(zx_), int(zy_), int(cnt)))
+    return out
+
+def reduce_events(
+    items: List[Tuple[Dict[str, Any], bool, int]], grain_s: int, players: bool, flow: bool, limit_s: int
+) -> List[Tuple[Dict[str, Any], bool, int]]:
+    """Fold runs of parsed events into one partial event per run (worker side).
+
+    A run is consecutive events of one type in one `grain_s` bucket (the gcd of all cadences,
+    so it never spans a frame) with non-decreasing times, and for world ZDOs one epoch. The
+    partial holds what ingest_event would leave behind: the latest record per player id, the
+    summed count per flow edge, the summed count per zone of the epoch, each in first-seen
+    order. It is dated at its last event and carries `_agg` = [events ok, events dropped,
+    legacy events, last ok event time] for record_ingest.
+
+    Events past `limit_s` (may still be too far in the future on merge) and events the
+    ingest would reject outright are passed through unchanged; so are players when `players`
+    is off (the track store needs every sample) and flow when `flow` is off (the heavy-hitter
+    sketch depends on every single update).
+    """
+    out: List[Tuple[Dict[str, Any], bool, int]] = []
+    run: Optional[Dict[str, Any]] = None
+    key: Any = None
+    rows: Dict[Any, Any] = {}
+    agg: List[Any] = []
+    last_es = 0
+
+    def close() -> None:
+        if run is None:
+            return
+        if run["type"] == "player_positions":
+            run["players"] = list(rows.values())
+        elif run["type"] == "player_flow":
+            run["transitions"] = [{"fx": k[0], "fy": k[1], "tx": k[2], "ty": k[3], "n": n} for k, n in rows.items()]
+        else:
+            run["zones"] = [{"zx": k[0], "zy": k[1], "count": n} for k, n in rows.items()]
+        run["_agg"] = agg
+        out.append((run, False, last_es))
+
+    for evt, legacy_world, es in items:
+        typ = evt.get("type")
+        valid: Any = None
+        if es <= limit_s:
+            if typ == "player_positions" and players:
+                valid = _valid_players(evt)
+            elif typ == "player_flow" and flow:
+                valid = _valid_transitions(evt)
+            elif typ == WORLD_ZDOS_TYPE:
+                valid = _valid_zones(evt)
+        if valid is None:
+            close()
+            run = None
+            out.append((evt, legacy_world, es))
+            continue
+        k = (typ, es // grain_s, evt.get("epoch") if typ == WORLD_ZDOS_TYPE else None)
+        if run is None or k != key or es < last_es:
+            close()
+            run = {"t": evt.get("t"), "type": typ}
+            if typ == WORLD_ZDOS_TYPE:
+                run["schema"] = WORLD_ZDOS_SCHEMA
+                run["epoch"] = evt["epoch"]
+            key = k
+            rows = {}
+            agg = [0, 0, 0, None]
+        run["t"] = evt.get("t")
+        last_es = es
+        if not valid:
+            agg[1] += 1
+            continue
+        agg[0] += 1
+        agg[2] += 1 if legacy_world else 0
+        agg[3] = evt.get("t")
+        if typ == "player_positions":
+            for p in valid:
+                rows[p["id"]] = p
+        elif typ == "player_flow":
+            for fx, fy, tx, ty, n in valid:
+                rows[(fx, fy, tx, ty)] = rows.get((fx, fy, tx, ty), 0) + n
+        else:
+            for zx_, zy_, cnt in valid:
+                rows[(zx_, zy_)] = rows.get((zx_, zy_), 0) + cnt
+    close()
+    return out
+
+def parse_event_range(
+    path: str, start: int, end: int, world_bucket_s: int, reduce: Optional[Tuple[int, bool, bool, int]] = None
+) -> Tuple[int, List[Tuple[Dict[str, Any], bool, int]], Tuple[int, int, int]]:
+    """Worker side: read [start, end) and parse it like run_catchup_round does, then reduce it
+    with reduce_events(items, *reduce) if given.
+
+    Returns (lines, [(event, legacy_world, event_s)], (parse_errors, schema_errors, dropped_events)).
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = data.decode("utf-8", errors="replace").splitlines() if data else []
+    st = StreamState(path, FileSig(0, 0, 0), 0, 0, 0, 0, 0, 0, 0, None, None)
+    out: List[Tuple[Dict[str, Any], bool, int]] = []
+    for ln in lines:
+        parsed = parse_event_line(st, ln, PARSE_NO_FUTURE_LIMIT_S, world_bucket_s)
+        if parsed is None:
+            continue
+        evt, legacy_world = parsed
+        if evt.get("type") == WORLD_ZDOS_TYPE:
+            evt = _slim_world_zdos(evt)
+        out.append((evt, legacy_world, parse_ts_to_epoch_s(evt.get("t")) or 0))
+    if reduce is not None:
+        out = reduce_events(out, *reduce)
+    return len(lines), out, (st.parse_errors, st.schema_errors, st.dropped_events)
+
+class ParallelIngest:
+    """Prefetching chunk parser for catch-up, backed by a shared process pool.
+
+    Per stream, up to `workers` consecutive chunks are in flight. Only chunks whose boundary is
+    final are queued ahead; a queue that no longer starts at the stream's offset (reset, online
+    rotation, different chunk size) is dropped and re-planned. A failed worker falls back to the
+    serial read for that chunk.
+
+    Workers hand back per-bucket partials (reduce_events over `grain_s` buckets), so the main
+    process buffers and applies one event per run instead of every line's event.
+    """
+
+    def __init__(
+        self, pool: ProcessPoolExecutor, workers: int, grain_s: int = 1, players: bool = True, flow: bool = True
+    ) -> None:
+        self.pool = pool
+        self.workers = max(1, int(workers))
+        self.grain_s = max(1, int(grain_s))
+        self.reduce_players = bool(players)
+        self.reduce_flow = bool(flow)
+        self.events_in = 0
+        self.events_out = 0
+        self.queues: Dict[str, List[Tuple[int, int, int, Any]]] = {}
+        self.chunks = 0
+        self.dropped = 0
+        self.fallbacks = 0
+
+    def drop(self, stream_key: Optional[str] = None) -> None:
+        for key in ([stream_key] if stream_key is not None else list(self.queues)):
+            for _, _, _, fut in self.queues.pop(key, []):
+                fut.cancel()
+                self.dropped += 1
+
+    def read_chunk(
+        self, stream_key: str, state: StreamState, max_bytes: int, now_s: int, world_bucket_s: int
+    ) -> Tuple[StreamState, List[Tuple[Dict[str, Any], bool]], Optional[str]]:
+        """Same contract as read_new_lines_chunk + parse_event_line over its lines: returns the
+        advanced state (line/error counters applied) and the events to ingest, in file order."""
+        state = follow_rotation(state)
+        if state.segment:
+            # Rotated segments (possibly gzipped) are streamed in order by this process.
+            self.drop(stream_key)
+            return self._serial(state, max_bytes, now_s, world_bucket_s)
+        sig = file_sig(state.path)
+        if sig is None:
+            return state, [], None
+        reason = detect_reset_reason(state, sig)
+        if reason is not None:
+            self.drop(stream_key)
+            state = StreamState(state.path, FileSig(0, 0, 0), 0, 0, 0, 0, 0, 0, 0, None, None, archive_dir=state.archive_dir)
+        offset = max(0, state.offset)
+        q = self.queues.setdefault(stream_key, [])
+        if q and (q[0][0] != offset or q[0][2] != max_bytes):
+            self.drop(stream_key)
+            q = self.queues.setdefault(stream_key, [])
+        try:
+            pos = q[-1][1] if q else offset
+            while len(q) < self.workers and pos < sig.size:
+                end, final = _chunk_bounds(state.path, pos, max_bytes)
+                if end <= pos or (q and not final):
+                    break
+                reduce = (self.grain_s, self.reduce_players, self.reduce_flow, now_s + MAX_FUTURE_EVENT_S)
+                q.append((pos, end, max_bytes, self.pool.submit(parse_event_range, state.path, pos, end, world_bucket_s, reduce)))
+                pos = end
+                if not final:
+                    break
+            if not q:
+                return state, [], reason
+            start, end, _, fut = q.pop(0)
+            n_lines, results, (parse_errors, schema_errors, dropped) = fut.result()
+        except Exception:
+            self.drop(stream_key)
+            self.fallbacks += 1
+            st2, events, _ = self._serial(state, max_bytes, now_s, world_bucket_s)
+            return st2, events, reason
+
+        st2 = StreamState(
+            path=state.path,
+            sig=sig,
+            offset=end,
+            total_lines=state.total_lines + n_lines,
+            total_events=state.total_events,
+            parse_errors=state.parse_errors + parse_errors,
+            schema_errors=state.schema_errors + schema_errors,
+            dropped_events=state.dropped_events + dropped,
+            legacy_world_zdos=state.legacy_world_zdos,
+            last_event_ts=state.last_event_ts,
+            last_ingest_ts=state.last_ingest_ts,
+            head=state.head or head_fingerprint(read_head(state.path)) if state.archive_dir is not None else 0,
+            archive_dir=state.archive_dir,
+        )
+        self.chunks += 1
+        events = []
+        limit_s = now_s + MAX_FUTURE_EVENT_S
+        for evt, legacy_world, es in results:
+            agg = evt.get("_agg")
+            self.events_in += agg[0] + agg[1] if agg is not None else 1
+            self.events_out += 1
+            if es > limit_s:
+                st2.schema_errors += 1
+                st2.dropped_events += 1
+                continue
+            events.append((evt, legacy_world))
+        return st2, events, reason
+
+    def _serial(
+        self, state: StreamState, max_bytes: int, now_s: int, world_bucket_s: int
+    ) -> Tuple[StreamState, List[Tuple[Dict[str, Any], bool]], Optional[str]]:
+        st2, lines, reason = read_new_lines_chunk(state, max_bytes)
+        st2.total_lines += len(lines)
+        events: List[Tuple[Dict[str, Any], bool]] = []
+        for ln in lines:
+            parsed = parse_event_line(st2, ln, now_s, world_bucket_s)
+            if parsed is not None:
+                events.append(parsed)
+        return st2, events, reason
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "chunks": self.chunks,
+            "in_flight": sum(len(q) for q in self.queues.values()),
+            "prefetch_dropped": self.dropped,
+            "fallbacks": self.fallbacks,
+            "grain_s": self.grain_s,
+            "events_in": self.events_in,
+            "events_out": self.events_out,
+        }
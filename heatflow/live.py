@@ -0,0 +1,183 @@
+"""In-memory aggregation state (LiveAgg) and per-cadence views."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from .groups import PlayerGroups
+    from .locations import LocationIndex
+    from .shards import ZoneShards
+    from .spikes import ZoneSpikes
+    from .tiles import ZoneBiomes
+    from .windows import EventWindows
+
+FRAME_CACHED_SECTIONS = ("players", "flow", "hotspots")
+
+@dataclass
+class LiveAgg:
+    hotspots_world_counts: Dict[str, int]
+    hotspots_world_epoch: int
+    hotspots_world_meta: Dict[str, Any]
+    hotspots_world_seen: Set[str]
+    flow_sum: Dict[str, int]
+    flow_state: Dict[str, Dict[str, Any]]
+    flow_updated: Set[str]
+    players_latest: Dict[str, Dict[str, Any]]
+    players_exp: Dict[str, int]
+    players_updated: Set[str]
+    dirty_flow: bool
+    # TTL timing wheel: expiry buckets keyed by absolute frame number (see advance_frame).
+    frame_no: int
+    players_wheel: Dict[int, List[str]]
+    flow_wheel: Dict[int, List[str]]
+    # Optional heavy-hitter mode for flow edges (Space-Saving); flow_cap == 0 means unbounded.
+    flow_cap: int
+    flow_topk: int
+    flow_err: Dict[str, int]
+    flow_heap: List[Tuple[int, str]]
+    flow_bucket_total: int
+    # Space-Saving evictions within a bucket (transition weight) vs live edges trimmed at
+    # seal beyond capacity (their TTL-persisted count); kept apart, the units differ.
+    flow_evicted_mass: int
+    flow_evicted_edges: int
+    flow_trimmed_count: int
+    flow_trimmed_edges: int
+    flow_meta: Dict[str, Any]
+    # --zone-shards: world zone map and flow edge state live in shard processes (see ZoneShards).
+    shards: Optional["ZoneShards"] = None
+    # --state-store: zones touched since the last commit -> epoch of the touch (see StateStore).
+    world_touched: Optional[Dict[str, int]] = None
+    # --biome-map: frames annotate zones with their dominant biome id (see ZoneBiomes).
+    biomes: Optional["ZoneBiomes"] = None
+    # --locations: frames label zones with the nearest named location (see LocationIndex).
+    locations: Optional["LocationIndex"] = None
+    # Growth spikes per world zone (see ZoneSpikes); shared by the cadence views of a world.
+    spikes: Optional[ZoneSpikes] = None
+    # --group-radius: frames carry player groups and per-zone occupancy (see PlayerGroups).
+    groups: Optional["PlayerGroups"] = None
+    # Frame sections reused while unchanged (see frame_section/encode_frame):
+    # name -> [stamp, section object, serialized bytes or None]; dirty names are rebuilt.
+    frame_parts: Dict[str, List[Any]] = field(default_factory=dict)
+    frame_dirty: Set[str] = field(default_factory=lambda: set(FRAME_CACHED_SECTIONS))
+    frame_stats: Dict[str, int] = field(default_factory=lambda: {"built": 0, "reused": 0, "encoded": 0, "bytes_reused": 0})
+
+def new_live(flow_cap: int = 0, flow_topk: int = 0) -> LiveAgg:
+    return LiveAgg(
+        hotspots_world_counts={},
+        hotspots_world_epoch=0,
+        hotspots_world_meta={},
+        hotspots_world_seen=set(),
+        flow_sum={},
+        flow_state={},
+        flow_updated=set(),
+        players_latest={},
+        players_exp={},
+        players_updated=set(),
+        dirty_flow=False,
+        frame_no=0,
+        players_wheel={},
+        flow_wheel={},
+        flow_cap=max(0, int(flow_cap)),
+        flow_topk=max(0, int(flow_topk)),
+        flow_err={},
+        flow_heap=[],
+        flow_bucket_total=0,
+        flow_evicted_mass=0,
+        flow_evicted_edges=0,
+        flow_trimmed_count=0,
+        flow_trimmed_edges=0,
+        flow_meta={},
+    )
+
+def world_count_items(live: LiveAgg) -> List[Tuple[str, int]]:
+    """World zone counts in insertion order, from the shards when sharded."""
+    return live.shards.world_items() if live.shards is not None else list(live.hotspots_world_counts.items())
+
+def world_zone_counts(live: LiveAgg, keys: List[str]) -> Dict[str, int]:
+    """Current counts of the given zones (missing zones are left out)."""
+    if live.shards is not None:
+        return live.shards.world_get(keys)
+    counts = live.hotspots_world_counts
+    return {k: counts[k] for k in keys if k in counts}
+
+def world_seen_keys(live: LiveAgg) -> Set[str]:
+    """Zones already reported in the current world epoch."""
+    return live.shards.world_seen() if live.shards is not None else set(live.hotspots_world_seen)
+
+def world_zone_count(live: LiveAgg) -> int:
+    return live.shards.zones if live.shards is not None else len(live.hotspots_world_counts)
+
+def flow_edge_count(live: LiveAgg) -> int:
+    return live.shards.edges if live.shards is not None else len(live.flow_state)
+
+@dataclass
+class CadenceView:
+    """One output cadence with its own LiveAgg, TTL and frame outputs, fed from the shared ingest pass."""
+    cadence_s: int
+    ttl_frames: int
+    primary: bool
+    live: LiveAgg
+    frames_dir: str  # relative to out_dir
+    live_name: str
+    windows: Optional[EventWindows]
+    last_bucket_written: Optional[int]
+    last_frame_written_s: int
+    frames_written: int
+    last_write_frame_live: Optional[str]
+    last_write_frame_archive: Optional[str]
+    # Skip-unchanged archive writes: hash + filename of the last archived frame body.
+    last_hash: Optional[str]
+    last_file: Optional[str]
+    frames_deduped: int
+    # Bytes of the last emitted frame (encode_frame), rewritten as the live frame by event-time polls.
+    last_frame_data: Optional[bytes] = None
+    # Live delta patches (--live-deltas): files kept, seq of the last live frame, that frame.
+    delta_keep: int = 0
+    live_seq: int = 0
+    live_prev: Optional[Dict[str, Any]] = None
+    delta_stats: Dict[str, int] = field(default_factory=lambda: {"written": 0, "resyncs": 0, "bytes_last": 0, "frame_bytes_last": 0})
+
+def parse_cadences(spec: Any, default_ttl: int = 10) -> List[Tuple[int, int]]:
+    """Parse a cadence list like "30" or "10,300:4" into [(cadence_s, ttl_frames), ...].
+
+    The first entry is the primary cadence (frame_live.json + frames/); duplicates and
+    non-positive values are dropped.
+    """
+    out: List[Tuple[int, int]] = []
+    seen: Set[int] = set()
+    for tok in str(spec).split(","):
+        tok = tok.strip()
+        if not tok:
+            continue
+        c_str, _, ttl_str = tok.partition(":")
+        try:
+            c = int(c_str)
+            ttl = int(ttl_str) if ttl_str else default_ttl
+        except ValueError:
+            continue
+        if c <= 0 or c in seen:
+            continue
+        seen.add(c)
+        out.append((c, max(1, ttl)))
+    return out or [(30, default_ttl)]
+
+def new_view(cadence_s: int, ttl_frames: int, primary: bool, flow_cap: int = 0, flow_topk: int = 0) -> CadenceView:
+    return CadenceView(
+        cadence_s=cadence_s,
+        ttl_frames=ttl_frames,
+        primary=primary,
+        live=new_live(flow_cap, flow_topk),
+        frames_dir="frames" if primary else f"frames_{cadence_s}s",
+        live_name="frame_live.json" if primary else f"frame_live_{cadence_s}s.json",
+        windows=None,
+        last_bucket_written=None,
+        last_frame_written_s=0,
+        frames_written=0,
+        last_write_frame_live=None,
+        last_write_frame_archive=None,
+        last_hash=None,
+        last_file=None,
+        frames_deduped=0,
+    )
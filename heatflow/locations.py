@@ -0,0 +1,191 @@
+"""Named world locations and their spatial index (--locations)."""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .streams import FileSig, file_sig, is_sig_equal
+from .tiles import ZONE_SIZE_M
+
+# Nearest named location (--locations FILE): a grid-bucket index over out/map/data/locations.json.
+# Frames label hotspot zones and flow endpoints with the row id of the nearest named location.
+LOCATION_CELL_M = 512
+LOCATION_CHECK_S = 30.0  # how often the file is checked for changes
+LOCATION_POS_RE = re.compile(r"\(\s*([-\d.]+)\s*,\s*([-\d.]+)\s*,\s*([-\d.]+)\s*\)")
+# Same classes as LOCATION_WHITELIST in out/viewer.data.js; other prefabs are not labels.
+LOCATION_NAMED = {
+    "START": {"StartTemple"},
+    "BOSS": {"Eikthyrnir", "GDKing", "Bonemass", "GoblinKing", "Dragonqueen", "FaderLocation", "Mistlands_DvergrBossEntrance1"},
+    "SPECIAL": {"Vendor_BlackForest", "BogWitch_Camp", "Mistlands_DvergrTownEntrance1", "Mistlands_DvergrTownEntrance2"},
+    "DUNGEON": {
+        "Crypt2", "Crypt3", "Crypt4", "SunkenCrypt4", "MountainCave02", "TrollCave02",
+        "MorgenHole1", "MorgenHole2", "MorgenHole3",
+    },
+    "TARPIT": {"TarPit1", "TarPit2", "TarPit3"},
+}
+
+def location_category(prefab: str) -> Optional[str]:
+    for cat, names in LOCATION_NAMED.items():
+        if prefab in names:
+            return cat
+    if prefab.startswith("Runestone_"):
+        return "RUNESTONE"
+    return None
+
+def load_named_locations(path: str) -> List[Tuple[int, str, float, float]]:
+    """[(row id, prefab, x, z)] of the named locations in a locations.json export."""
+    with open(path, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    out: List[Tuple[int, str, float, float]] = []
+    if not isinstance(rows, list):
+        return out
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            continue
+        prefab = row.get("PrefabName") or row.get("prefab") or row.get("name")
+        pos = row.get("Position") or row.get("position")
+        if not isinstance(prefab, str) or not isinstance(pos, str) or location_category(prefab) is None:
+            continue
+        m = LOCATION_POS_RE.search(pos)
+        if not m:
+            continue
+        try:
+            x, z = float(m.group(1)), float(m.group(3))
+        except ValueError:
+            continue
+        if math.isfinite(x) and math.isfinite(z):
+            out.append((i, prefab, x, z))
+    return out
+
+class LocationIndex:
+    """Grid buckets of named locations; `zone()` answers per zone center and is memoized.
+
+    Rebuilt when the file's size/mtime changes (checked every LOCATION_CHECK_S at frame time).
+    """
+
+    def __init__(self, path: str, cell_m: int = LOCATION_CELL_M) -> None:
+        self.path = path
+        self.cell = float(cell_m)
+        self.sig: Optional[FileSig] = None
+        self.cells: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = {}
+        self.bounds = (0, 0, 0, 0)  # min/max cell x, min/max cell z
+        self.count = 0
+        self.memo: Dict[Tuple[int, int], Optional[Tuple[int, int]]] = {}
+        self.last_check = 0.0
+        self.rebuilds = 0
+        self.errors = 0
+        self.queries = 0
+        self.cells_visited = 0
+        self.frames = 0
+        self.frame_s_total = 0.0
+        self.frame_s_max = 0.0
+        self.last_frame_ms = 0.0
+        self.frame_s = 0.0  # labelling time of the frame being built
+        self._load()
+
+    def _load(self) -> None:
+        sig = file_sig(self.path)
+        if sig is None:
+            raise FileNotFoundError(self.path)
+        locs = load_named_locations(self.path)
+        cells: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = {}
+        for i, _, x, z in locs:
+            cells.setdefault((int(math.floor(x / self.cell)), int(math.floor(z / self.cell))), []).append((i, x, z))
+        if cells:
+            cx = [c[0] for c in cells]
+            cy = [c[1] for c in cells]
+            self.bounds = (min(cx), max(cx), min(cy), max(cy))
+        self.cells = cells
+        self.count = len(locs)
+        self.sig = sig
+        self.memo = {}
+        self.rebuilds += 1
+
+    def begin_frame(self) -> None:
+        now = time.monotonic()
+        if now - self.last_check < LOCATION_CHECK_S:
+            return
+        self.last_check = now
+        sig = file_sig(self.path)
+        if sig is None or (self.sig is not None and is_sig_equal(sig, self.sig)):
+            return
+        try:
+            self._load()
+        except Exception:
+            self.errors += 1  # keep the previous index until the file parses again
+
+    def nearest(self, x: float, z: float) -> Optional[Tuple[int, float]]:
+        """(row id, distance m) of the nearest named location, or None if there are none.
+
+        Searches square rings of cells outward; ring r+1 is at least r cells away, so the search
+        stops once the best distance is within that bound.
+        """
+        self.queries += 1
+        if not self.cells:
+            return None
+        c = self.cell
+        gx, gy = int(math.floor(x / c)), int(math.floor(z / c))
+        best: Optional[int] = None
+        best_d2 = math.inf
+        x0, x1, y0, y1 = self.bounds
+        for r in range(0, max(abs(gx - x0), abs(gx - x1), abs(gy - y0), abs(gy - y1)) + 2):
+            if best is not None and best_d2 <= (r - 1) * c * (r - 1) * c:
+                break
+            for i in range(gx - r, gx + r + 1):
+                for j in (range(gy - r, gy + r + 1) if i in (gx - r, gx + r) else (gy - r, gy + r)):
+                    bucket = self.cells.get((i, j))
+                    if bucket is None:
+                        continue
+                    self.cells_visited += 1
+                    for rid, lx, lz in bucket:
+                        d2 = (lx - x) * (lx - x) + (lz - z) * (lz - z)
+                        if d2 < best_d2 or (d2 == best_d2 and best is not None and rid < best):
+                            best, best_d2 = rid, d2
+        return (best, math.sqrt(best_d2)) if best is not None else None
+
+    def zone(self, zx: int, zy: int) -> Optional[Tuple[int, int]]:
+        """(row id, whole meters) of the location nearest to the zone center."""
+        key = (zx, zy)
+        if key in self.memo:
+            return self.memo[key]
+        hit = self.nearest((zx + 0.5) * ZONE_SIZE_M, (zy + 0.5) * ZONE_SIZE_M)
+        ref = (hit[0], int(round(hit[1]))) if hit is not None else None
+        self.memo[key] = ref
+        return ref
+
+    def label(self, items: List[Dict[str, Any]]) -> None:
+        """Set loc/loc_d on zone dicts ({"zx", "zy", ...}) in place."""
+        t0 = time.perf_counter()
+        for it in items:
+            ref = self.zone(it["zx"], it["zy"])
+            if ref is not None:
+                it["loc"], it["loc_d"] = ref
+        self.frame_s += time.perf_counter() - t0
+
+    def frame_done(self) -> None:
+        seconds, self.frame_s = self.frame_s, 0.0
+        self.frames += 1
+        self.frame_s_total += seconds
+        self.frame_s_max = max(self.frame_s_max, seconds)
+        self.last_frame_ms = seconds * 1000.0
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "named": self.count,
+            "cells": len(self.cells),
+            "cell_m": int(self.cell),
+            "rebuilds": self.rebuilds,
+            "errors": self.errors,
+            "zones_memoized": len(self.memo),
+            "queries": self.queries,
+            "cells_per_query": round(self.cells_visited / max(1, self.queries), 2),
+            "frames": self.frames,
+            "lookup_ms_per_frame": round(self.frame_s_total * 1000.0 / max(1, self.frames), 3),
+            "lookup_ms_max": round(self.frame_s_max * 1000.0, 3),
+            "lookup_ms_last": round(self.last_frame_ms, 3),
+        }
@@ -0,0 +1,165 @@
+"""Precompressed `.gz`/`.zst`/`.br` siblings of output files (--precompress)."""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+try:  # optional codecs for precompressed siblings
+    import zstandard as _zstd  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    _zstd = None
+try:
+    import brotli as _brotli  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    _brotli = None
+
+from .common import atomic_write_bytes
+
+# Precompressed sibling codecs: name -> (file suffix, availability)
+PRECOMPRESS_CODECS = {
+    "gz": (".gz", True),
+    "zst": (".zst", _zstd is not None),
+    "br": (".br", _brotli is not None),
+}
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "gz":
+        # mtime=0 keeps output deterministic (stable ETags on static servers).
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if codec == "zst" and _zstd is not None:
+        return _zstd.ZstdCompressor(level=10).compress(data)
+    if codec == "br" and _brotli is not None:
+        return _brotli.compress(data, quality=9)
+    raise ValueError(f"codec unavailable: {codec}")
+
+class Precompressor:
+    """Writes `.gz` (and optionally `.zst`/`.br`) siblings of output files on a worker pool.
+
+    `begin(path)` runs before the caller replaces the plain file: it supersedes queued jobs for
+    the path and removes the old siblings, so a static server falls back to the plain file until
+    `submit` publishes fresh ones. Each job writes its own tmp files and renames them only while
+    it is still the newest job for the path, so siblings never hold content older than the plain file.
+    """
+
+    def __init__(self, codecs: List[str], workers: int) -> None:
+        self.codecs = [c for c in codecs if PRECOMPRESS_CODECS.get(c, ("", False))[1]]
+        self.skipped_codecs = [c for c in codecs if c not in self.codecs]
+        self.workers = max(1, int(workers))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="precompress") if self.codecs else None
+        self._lock = threading.Lock()
+        # path -> generation of its newest job; generations come from one counter, never reused.
+        self._gen: Dict[str, int] = {}
+        self._seq = 0
+        self.jobs = 0
+        self.pending = 0
+        self.stale_skipped = 0
+        self.errors = 0
+        self.stats = {c: {"files": 0, "bytes_in": 0, "bytes_out": 0, "cpu_s": 0.0} for c in self.codecs}
+
+    def begin(self, path: str) -> int:
+        """Supersede earlier jobs for `path` and drop its siblings; returns the new generation."""
+        if self._pool is None:
+            return 0
+        with self._lock:
+            self._seq += 1
+            gen = self._seq
+            self._gen[path] = gen
+            for codec in self.codecs:
+                try:
+                    os.remove(path + PRECOMPRESS_CODECS[codec][0])
+                except FileNotFoundError:
+                    pass
+        return gen
+
+    def submit(self, path: str, data: bytes, gen: int) -> None:
+        if self._pool is None:
+            return
+        with self._lock:
+            self.jobs += 1
+            self.pending += 1
+        self._pool.submit(self._run, path, data, gen)
+
+    def _run(self, path: str, data: bytes, gen: int) -> None:
+        tmp = None
+        try:
+            for codec in self.codecs:
+                with self._lock:
+                    if self._gen.get(path) != gen:
+                        self.stale_skipped += 1
+                        return
+                t0 = time.thread_time()
+                out = _compress(codec, data)
+                cpu = time.thread_time() - t0
+                target = path + PRECOMPRESS_CODECS[codec][0]
+                tmp = f"{target}.{gen}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(out)
+                with self._lock:
+                    if self._gen.get(path) != gen:
+                        self.stale_skipped += 1
+                        return
+                    os.replace(tmp, target)
+                tmp = None
+                with self._lock:
+                    st = self.stats[codec]
+                    st["files"] += 1
+                    st["bytes_in"] += len(data)
+                    st["bytes_out"] += len(out)
+                    st["cpu_s"] += cpu
+        except Exception:
+            with self._lock:
+                self.errors += 1
+        finally:
+            if tmp is not None:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            with self._lock:
+                self.pending -= 1
+                if self._gen.get(path) == gen:
+                    self._gen.pop(path, None)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            codecs = {}
+            for c, st in self.stats.items():
+                mb = st["bytes_in"] / 1_000_000
+                codecs[c] = {
+                    "files": st["files"],
+                    "bytes_in": st["bytes_in"],
+                    "bytes_out": st["bytes_out"],
+                    "ratio": round(st["bytes_out"] / st["bytes_in"], 4) if st["bytes_in"] else None,
+                    "cpu_s": round(st["cpu_s"], 3),
+                    "cpu_ms_per_mb": round(st["cpu_s"] * 1000 / mb, 2) if mb > 0 else None,
+                }
+            return {
+                "codecs": codecs,
+                "unavailable": list(self.skipped_codecs),
+                "workers": self.workers,
+                "jobs": self.jobs,
+                "pending": self.pending,
+                "stale_skipped": self.stale_skipped,
+                "errors": self.errors,
+            }
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+def write_bytes_output(path: str, data: bytes, precomp: Optional[Precompressor] = None) -> None:
+    """Write already serialized JSON atomically and queue precompressed siblings."""
+    gen = precomp.begin(path) if precomp is not None else 0
+    atomic_write_bytes(path, data)
+    if precomp is not None:
+        precomp.submit(path, data, gen)
+
+def write_json_output(path: str, obj: Any, precomp: Optional[Precompressor] = None) -> None:
+    """Serialize once, write atomically, and queue precompressed siblings."""
+    write_bytes_output(path, json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), precomp)
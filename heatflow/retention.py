@@ -0,0 +1,281 @@
+"""Tiered frame retention: downsampling, pruning and disk budget (--retention, --retention-budget-mb)."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .common import atomic_write_text, hms_compact, iso_utc
+from .frames import FRAME_REFS_FILENAME, frame_refs_lock, list_frames, load_frame_refs
+from .live import CadenceView
+from .precompress import PRECOMPRESS_CODECS, Precompressor, write_json_output
+from .state_store import StateStore
+
+# Retention (--retention, --retention-budget-mb): old buckets of every frames dir are thinned to one
+# representative per coarser interval, e.g. "30s:7d,5m:90d,1h" keeps every bucket for 7 days, the
+# newest bucket of each 5 minutes up to 90 days and of each hour beyond. Ages count back from the
+# dir's newest bucket. Over the disk budget, the tier ages are halved step by step before the oldest
+# representatives are dropped. A pass runs on the poll loop once input is idle: kept dedupe
+# references whose target goes are materialized as their own frame, frame_refs.jsonl and the
+# SQLite frame index are rewritten, then the unused files (with precompressed siblings) are
+# deleted on a worker thread. Dropped buckets disappear from the next manifest.
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+RETENTION_PASS_S = 300.0
+RETENTION_SCALES = (1.0, 0.5, 0.25, 0.125, 0.0625, 0.03125, 0.015625)
+
+def parse_duration_s(tok: str) -> Optional[int]:
+    """Seconds from "90", "30s", "5m", "7d" (s/m/h/d/w units)."""
+    tok = tok.strip().lower()
+    mult = DURATION_UNITS.get(tok[-1:], 0)
+    try:
+        return int(float(tok[:-1] if mult else tok) * (mult or 1))
+    except ValueError:
+        return None
+
+def parse_retention(spec: Any) -> List[Tuple[int, Optional[int]]]:
+    """Parse "30s:7d,5m:90d,1h" into [(resolution_s, max_age_s), ...] ordered by age.
+
+    A bucket takes the resolution of the first tier it is younger than; max_age None (only valid
+    last) keeps that resolution forever, otherwise older buckets are dropped. Bad tokens are skipped.
+    """
+    out: List[Tuple[int, Optional[int]]] = []
+    for tok in str(spec or "").split(","):
+        tok = tok.strip()
+        if not tok:
+            continue
+        res_str, _, age_str = tok.partition(":")
+        res = parse_duration_s(res_str)
+        age = parse_duration_s(age_str) if age_str else None
+        if res is None or res < 0 or (age_str and (age is None or age <= 0)):
+            continue
+        out.append((res, age))
+    out.sort(key=lambda t: (t[1] is None, t[1] or 0))
+    forever = [i for i, t in enumerate(out) if t[1] is None]
+    return out[: forever[0] + 1] if forever else out
+
+def plan_retention(secs: List[int], tiers: List[Tuple[int, Optional[int]]], ref_s: int, scale: float = 1.0) -> Set[int]:
+    """Buckets to keep: the newest bucket of each (resolution, sec // resolution) interval."""
+    newest: Dict[Tuple[int, int], int] = {}
+    for sec in secs:
+        age = ref_s - sec
+        res = None
+        for r, max_age in tiers:
+            if max_age is None or age < max_age * scale:
+                res = r
+                break
+        if res is None:
+            continue
+        g = (res, sec // res) if res > 0 else (0, sec)
+        if sec > newest.get(g, sec - 1):
+            newest[g] = sec
+    return set(newest.values())
+
+def _frames_dir_sizes(frames_dir: str) -> Dict[str, int]:
+    """File name -> bytes on disk, precompressed siblings counted with their plain file."""
+    sizes: Dict[str, int] = {}
+    suffixes = tuple(v[0] for v in PRECOMPRESS_CODECS.values())
+    try:
+        with os.scandir(frames_dir) as it:
+            for ent in it:
+                try:
+                    n = ent.stat().st_size
+                except OSError:
+                    continue
+                name = ent.name
+                for suffix in suffixes:
+                    if name.endswith(suffix):
+                        name = name[: -len(suffix)]
+                        break
+                sizes[name] = sizes.get(name, 0) + n
+    except OSError:
+        pass
+    return sizes
+
+def _ref_line_bytes(entries: List[Tuple[int, str, bool]], sizes: Dict[str, int]) -> int:
+    n = sum(1 for _, _, is_ref in entries if is_ref)
+    return sizes.get(FRAME_REFS_FILENAME, 0) // n if n else 0
+
+def retained_bytes(entries: List[Tuple[int, str, bool]], keep: Set[int], sizes: Dict[str, int]) -> int:
+    """Frame and reference bytes left in a dir after thinning `entries` [(sec, file, is_ref)] to `keep`."""
+    own = {f for sec, f, is_ref in entries if not is_ref and sec in keep}
+    refs = 0
+    for sec, f, is_ref in entries:
+        if is_ref and sec in keep:
+            own.add(f)  # kept, or materialized once under a kept reference's name
+            refs += 1
+    return sum(sizes.get(f, 0) for f in own) + refs * _ref_line_bytes(entries, sizes)
+
+@dataclass
+class RetentionDir:
+    view: CadenceView
+    path: str
+    entries: List[Tuple[int, str, bool]]
+    sizes: Dict[str, int]
+    keep: Set[int] = field(default_factory=set)
+
+class RetentionEngine:
+    """Thins the frames dirs of one world per RETENTION_PASS_S (see the comment above)."""
+
+    def __init__(self, tiers: List[Tuple[int, Optional[int]]], budget_bytes: int, out_dir: str, precomp: Optional[Precompressor] = None) -> None:
+        self.tiers = tiers or [(0, None)]
+        self.budget_bytes = max(0, int(budget_bytes))
+        self.out_dir = out_dir
+        self.precomp = precomp
+        self.last_pass = 0.0
+        self.passes = 0
+        self.bytes_reclaimed = 0
+        self.buckets_dropped = 0
+        self.errors = 0
+        self.last: Optional[Dict[str, Any]] = None
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retention")
+        self._future: Any = None
+
+    def due(self, now: float) -> bool:
+        return self._future is None and now - self.last_pass >= RETENTION_PASS_S
+
+    def run_pass(self, views: List[CadenceView], store: Optional[StateStore], now_s: int) -> None:
+        t0 = time.monotonic()
+        self.last_pass = time.time()
+        dirs: List[RetentionDir] = []
+        for view in views:
+            path = os.path.join(self.out_dir, view.frames_dir)
+            listing = store.list_frames(view.frames_dir) if store is not None else list_frames(path)
+            entries = [(f["sec"], f["url"].split("/", 1)[1], bool(f.get("ref"))) for f in listing]
+            if entries:
+                dirs.append(RetentionDir(view, path, entries, _frames_dir_sizes(path)))
+        before = sum(sum(d.sizes.values()) for d in dirs)
+        other = before - sum(retained_bytes(d.entries, {s for s, _, _ in d.entries}, d.sizes) for d in dirs)
+        scale = 1.0
+        for scale in RETENTION_SCALES:
+            for d in dirs:
+                d.keep = plan_retention([s for s, _, _ in d.entries], self.tiers, d.entries[-1][0], scale)
+            if not self.budget_bytes or other + sum(retained_bytes(d.entries, d.keep, d.sizes) for d in dirs) <= self.budget_bytes:
+                break
+        over = other + sum(retained_bytes(d.entries, d.keep, d.sizes) for d in dirs) - self.budget_bytes if self.budget_bytes else 0
+        if over > 0:
+            # Still over at the smallest scale: drop the oldest representatives. A file is freed
+            # once no kept bucket (its own or a reference to it) uses it.
+            oldest = sorted((sec, i, f, is_ref) for i, d in enumerate(dirs) for sec, f, is_ref in d.entries if sec in d.keep)
+            users: Dict[Tuple[int, str], int] = {}
+            for _, i, f, _ in oldest:
+                users[(i, f)] = users.get((i, f), 0) + 1
+            line = [_ref_line_bytes(d.entries, d.sizes) for d in dirs]
+            for sec, i, f, is_ref in oldest:
+                if over <= 0:
+                    break
+                dirs[i].keep.discard(sec)
+                users[(i, f)] -= 1
+                if users[(i, f)] == 0:
+                    over -= dirs[i].sizes.get(f, 0)
+                if is_ref:
+                    over -= line[i]
+        rep: Dict[str, Any] = {"at": iso_utc(now_s), "scale": scale, "bytes_before": before, "dirs": {}}
+        doomed: List[str] = []
+        for d in dirs:
+            files, stats = self.thin_dir(d, store)
+            rep["dirs"][d.view.frames_dir] = stats
+            self.buckets_dropped += stats["dropped"]
+            doomed.extend(os.path.join(d.path, f) for f in files)
+        rep["files_removed"] = len(doomed)
+        rep["plan_s"] = round(time.monotonic() - t0, 3)
+        self.last = rep
+        self._future = self._pool.submit(self._delete, doomed, [d.path for d in dirs])
+
+    def thin_dir(self, d: RetentionDir, store: Optional[StateStore]) -> Tuple[List[str], Dict[str, Any]]:
+        """Rewrite references and the index for `d.keep`; returns the files that can go."""
+        kept_files = {f for sec, f, is_ref in d.entries if not is_ref and sec in d.keep}
+        planned = {sec for sec, _, _ in d.entries}
+        moved: Dict[str, str] = {}
+        rows: List[Tuple[int, str, int]] = []
+        for sec, f, is_ref in d.entries:
+            if not is_ref or sec not in d.keep or f in kept_files:
+                continue
+            if f in moved:
+                rows.append((sec, moved[f], 1))
+                continue
+            # The referenced frame goes: the first kept reference becomes its own frame.
+            name = f"frame_{hms_compact(sec)}.json"
+            try:
+                with open(os.path.join(d.path, f), "r", encoding="utf-8") as fh:
+                    frame = json.load(fh)
+                frame["meta"]["t"] = iso_utc(sec)
+                write_json_output(os.path.join(d.path, name), frame, self.precomp)
+            except Exception:
+                self.errors += 1
+                kept_files.add(f)
+                continue
+            moved[f] = name
+            kept_files.add(name)
+            rows.append((sec, name, 0))
+        with frame_refs_lock(d.path):
+            refs = load_frame_refs(d.path)
+            new_refs = [
+                (sec, moved.get(ref, ref)) for sec, ref in refs
+                if (sec not in planned or sec in d.keep) and moved.get(ref) != f"frame_{hms_compact(sec)}.json"
+            ]
+            if len(new_refs) != len(refs) or moved:
+                lines = "".join(
+                    json.dumps({"sec": sec, "t": iso_utc(sec), "ref": ref}, separators=(",", ":")) + "\n" for sec, ref in new_refs
+                )
+                atomic_write_text(os.path.join(d.path, FRAME_REFS_FILENAME), lines)
+        dropped = [sec for sec in planned if sec not in d.keep]
+        if store is not None:
+            store.thin_frames(d.view.frames_dir, dropped, rows)
+        files = sorted({f for _, f, is_ref in d.entries if not is_ref} - kept_files)
+        if d.view.last_file in files:
+            # No new dedupe reference may point at a file about to be deleted.
+            d.view.last_file = None
+            d.view.last_hash = None
+        stats = {"buckets": len(d.entries), "kept": len(d.keep), "dropped": len(dropped), "materialized": len(moved)}
+        return files, stats
+
+    def _delete(self, paths: List[str], dirs: List[str]) -> Tuple[int, int]:
+        """Remove `paths` with their siblings; returns (bytes freed, bytes left in `dirs`)."""
+        freed = 0
+        for path in paths:
+            for suffix in [""] + [v[0] for v in PRECOMPRESS_CODECS.values()]:
+                try:
+                    n = os.path.getsize(path + suffix)
+                    os.remove(path + suffix)
+                    freed += n
+                except OSError:
+                    continue
+        return freed, sum(sum(_frames_dir_sizes(p).values()) for p in dirs)
+
+    def collect(self) -> Optional[Dict[str, Any]]:
+        """The finished pass's report once its deletions are done, else None."""
+        fut = self._future
+        if fut is None or not fut.done():
+            return None
+        self._future = None
+        self.passes += 1
+        rep = self.last or {}
+        try:
+            freed, after = fut.result()
+        except Exception:
+            self.errors += 1
+            freed, after = 0, None
+        self.bytes_reclaimed += freed
+        rep["bytes_reclaimed"] = freed
+        rep["bytes_after"] = after
+        return rep
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "tiers": [{"resolution_s": r, "max_age_s": a} for r, a in self.tiers],
+            "budget_bytes": self.budget_bytes or None,
+            "passes": self.passes,
+            "running": self._future is not None,
+            "buckets_dropped": self.buckets_dropped,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "errors": self.errors,
+            "last_pass": self.last,
+        }
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+        self.collect()
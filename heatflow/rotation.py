@@ -0,0 +1,193 @@
+"""Online monthly rotation of the live stream files (tools/rotate_monthly.py --online)."""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from .common import atomic_write_json, iso_utc
+from .segments import head_fingerprint, read_head
+from .streams import StreamState
+
+# Online rotation: tools/rotate_monthly.py --online drops a request into the state dir; the
+# running aggregator renames each stream away (the reader follows it as a rotated segment until
+# the writer reopens its path) and gzips the renamed files in the background.
+ROTATE_REQUEST_FILENAME = "rotate_request.json"
+ROTATE_STATUS_FILENAME = "rotate_status.json"
+ROTATE_COPY_CHUNK = 4 * 1024 * 1024
+
+def load_rotate_request(state_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(state_dir, ROTATE_REQUEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            req = json.load(f)
+    except Exception:
+        return None
+    if not isinstance(req, dict) or not req.get("id") or not req.get("archive_dir") or not req.get("month"):
+        return None
+    try:
+        with open(os.path.join(state_dir, ROTATE_STATUS_FILENAME), "r", encoding="utf-8") as f:
+            status = json.load(f)
+        if status.get("id") == req["id"] and status.get("finished"):
+            os.remove(path)  # already handled (e.g. stopped before the request was cleared)
+            return None
+    except Exception:
+        pass
+    return req
+
+def compress_segment(part_path: str, gz_path: str) -> Dict[str, Any]:
+    """Gzip a sealed segment, verify it by decompressing (size + CRC32), then drop the plain file."""
+    t0 = time.monotonic()
+    crc = 0
+    size = 0
+    tmp = gz_path + ".tmp"
+    with open(part_path, "rb") as f_in, gzip.open(tmp, "wb", compresslevel=6) as f_out:
+        while True:
+            buf = f_in.read(ROTATE_COPY_CHUNK)
+            if not buf:
+                break
+            crc = zlib.crc32(buf, crc)
+            size += len(buf)
+            f_out.write(buf)
+    check_crc = 0
+    check_size = 0
+    with gzip.open(tmp, "rb") as f:
+        while True:
+            buf = f.read(ROTATE_COPY_CHUNK)
+            if not buf:
+                break
+            check_crc = zlib.crc32(buf, check_crc)
+            check_size += len(buf)
+    if check_crc != crc or check_size != size:
+        raise IOError(f"segment verify failed: {os.path.basename(gz_path)}")
+    os.replace(tmp, gz_path)
+    os.remove(part_path)
+    return {"bytes_in": size, "bytes_out": os.path.getsize(gz_path), "elapsed_s": round(time.monotonic() - t0, 3)}
+
+class OnlineRotation:
+    """Seals every stream of a running aggregator for one rotate request by renaming it away.
+
+    Per stream, `step()` renames the live file to `<stream file>.<stamp>` next to it. The plugin
+    keeps appending to its open handle until it reopens the path, and the stream reader follows
+    the renamed file as a rotated segment (see follow_rotation), leaving it only once the new
+    live file exists. When the reader is past the renamed file, it is gzipped into
+    archive/<month>/raw/ in the background. Offsets never jump, so nothing is re-ingested or lost.
+    Streams that cannot be renamed before the request's timeout are left untouched.
+    """
+
+    def __init__(self, req: Dict[str, Any], state_dir: str, states: Dict[str, StreamState], now_s: int) -> None:
+        self.req_id = str(req["id"])
+        self.month = str(req["month"])
+        self.out_dir = os.path.join(str(req["archive_dir"]), self.month, "raw")
+        self.state_dir = state_dir
+        self.deadline_s = now_s + int(req.get("timeout_s") or 120)
+        self.started_s = now_s
+        self.streams: Dict[str, Dict[str, Any]] = {}
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now_s))
+        for key, st in states.items():
+            base = os.path.basename(st.path)
+            if st.offset <= 0 and not st.segment:
+                self.streams[key] = {"state": "empty"}
+                continue
+            if st.archive_dir is None:
+                self.streams[key] = {"state": "skipped", "error": "needs --stream-segments 1 to follow the renamed file"}
+                continue
+            self.streams[key] = {
+                "state": "sealing",
+                "renamed": os.path.join(os.path.dirname(st.path), f"{base}.{stamp}"),
+                "segment": os.path.join(self.out_dir, f"{base}.{stamp}.jsonl.gz"),
+            }
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rotate")
+        self._futures: Dict[str, Any] = {}
+
+    def step(self, states: Dict[str, StreamState], now_s: int) -> None:
+        """Advance sealing: rename live files, then archive the renamed ones the reader has passed."""
+        for key, info in self.streams.items():
+            st = states[key]
+            try:
+                if info["state"] == "sealing":
+                    if st.segment:
+                        # Still draining a rotated segment; the live file is renamed once it is reached.
+                        if now_s >= self.deadline_s:
+                            info["state"] = "skipped"
+                            info["error"] = "stream still reading a rotated segment"
+                        continue
+                    try:
+                        os.rename(st.path, info["renamed"])
+                    except OSError as e:
+                        # e.g. Windows without FILE_SHARE_DELETE on the writer's handle: retry next poll.
+                        if now_s >= self.deadline_s:
+                            info["state"] = "skipped"
+                            info["error"] = f"rename failed: {e}"
+                        continue
+                    info["head"] = head_fingerprint(read_head(info["renamed"]))
+                    info["state"] = "handoff"
+                    info["sealed_at"] = iso_utc(now_s)
+                elif info["state"] == "handoff":
+                    # Done once the writer has reopened its path and the reader moved on to it.
+                    if st.segment or st.head == info["head"] or not os.path.exists(st.path):
+                        if now_s >= self.deadline_s:
+                            info["state"] = "skipped"
+                            info["error"] = "writer did not reopen the stream; renamed file left in place"
+                        continue
+                    info["state"] = "compressing"
+                    info["sealed_bytes"] = os.path.getsize(info["renamed"])
+                    os.makedirs(self.out_dir, exist_ok=True)
+                    self._futures[key] = self._pool.submit(compress_segment, info["renamed"], info["segment"])
+            except Exception as e:
+                info["state"] = "error"
+                info["error"] = str(e)
+        self._collect()
+
+    def _collect(self) -> None:
+        for key, fut in list(self._futures.items()):
+            if not fut.done():
+                continue
+            info = self.streams[key]
+            try:
+                info.update(fut.result())
+                info["state"] = "done"
+            except Exception as e:
+                info["state"] = "error"
+                info["error"] = str(e)
+            del self._futures[key]
+
+    def finished(self) -> bool:
+        return all(i["state"] not in ("sealing", "handoff", "compressing") for i in self.streams.values())
+
+    def report(self) -> Dict[str, Any]:
+        streams = {}
+        for key, info in self.streams.items():
+            rep = {k: v for k, v in info.items() if k not in ("renamed", "head")}
+            if "segment" in rep:
+                rep["segment"] = os.path.basename(rep["segment"])
+            streams[key] = rep
+        return {
+            "id": self.req_id,
+            "month": self.month,
+            "archive_raw_dir": self.out_dir,
+            "started_at": iso_utc(self.started_s),
+            "finished": self.finished(),
+            "streams": streams,
+        }
+
+    def write_status(self) -> None:
+        atomic_write_json(os.path.join(self.state_dir, ROTATE_STATUS_FILENAME), self.report())
+        if self.finished():
+            try:
+                os.remove(os.path.join(self.state_dir, ROTATE_REQUEST_FILENAME))
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        """Wait for background compression and record the final status."""
+        self._pool.shutdown(wait=True)
+        self._collect()
+        self.write_status()
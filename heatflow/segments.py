@@ -0,0 +1,497 @@
+"""Reading a stream across its live file and rotated segments (--stream-segments)."""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import struct
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .common import parse_ts_to_epoch_s, read_tail_lines
+from .streams import FileSig, StreamState, detect_reset_reason, file_sig
+
+# Multi-segment stream sources (--stream-segments): besides the live file, a stream's data can sit
+# in rotated segments: plugin RotateMB rollovers next to the live file, and archive/<month>/raw/
+# from tools/rotate_monthly.py or an online rotation, plain or gzipped. They are found by name
+# (`<stream file>.<anything>`) and read in order of their first event time. While one of them is
+# read, the stream position is (StreamState.segment, StreamState.offset), the offset counting
+# uncompressed bytes. A rollover that renames, copies or gzips the file being read is recognized
+# by its first-line fingerprint, so the stream resumes in it instead of resetting.
+SEGMENT_HEAD_BYTES = 4096
+SEGMENT_READ_BYTES = 8 * 1024 * 1024  # per poll while draining rotated segments on the live path
+SEGMENT_TAIL_MAX_BYTES = 256 * 1024 * 1024  # rehydrate never decompresses larger segments for their tail
+SEGMENT_SKIP_SUFFIXES = (".part", ".tmp")
+
+@dataclass
+class StreamSegment:
+    path: str
+    gz: bool
+    size: int  # uncompressed bytes; for .gz the trailer's ISIZE (last member only, so an estimate)
+    head: int  # see head_fingerprint
+    first_s: int  # event time of the first line (file mtime if it has none)
+
+_segment_cache: Dict[str, Tuple[Tuple[int, int, int], Optional[StreamSegment]]] = {}
+_segment_readers: Dict[str, Any] = {}  # gz path -> open GzipFile, so sequential chunks stream
+# (live path, archive dir) -> (top dir stamps, month names, raw dir stamps, segments); see rotated_segments.
+_segment_lists: Dict[Tuple[str, Optional[str]], Tuple[Tuple[Any, ...], List[str], Tuple[Any, ...], List[StreamSegment]]] = {}
+
+def head_fingerprint(data: bytes) -> int:
+    """Identity of a stream file: length and CRC32 of its first line (0 = empty)."""
+    line = data.split(b"\n", 1)[0]
+    if not line:
+        return 0
+    return (len(line) << 32) | zlib.crc32(line)
+
+def read_head(path: str) -> bytes:
+    try:
+        if path.endswith(".gz"):
+            with gzip.open(path, "rb") as f:
+                return f.read(SEGMENT_HEAD_BYTES)
+        with open(path, "rb") as f:
+            return f.read(SEGMENT_HEAD_BYTES)
+    except Exception:
+        return b""
+
+def _segment_info(path: str) -> Optional[StreamSegment]:
+    sig = file_sig(path)
+    if sig is None:
+        return None
+    key = (sig.inode, sig.size, sig.mtime_ns)
+    hit = _segment_cache.get(path)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    gz = path.endswith(".gz")
+    head = read_head(path)
+    info: Optional[StreamSegment] = None
+    if head:
+        size = sig.size
+        if gz:
+            try:
+                with open(path, "rb") as f:
+                    f.seek(-4, os.SEEK_END)
+                    size = struct.unpack("<I", f.read(4))[0]
+            except Exception:
+                size = sig.size
+        first_s = None
+        try:
+            evt = json.loads(head.split(b"\n", 1)[0].decode("utf-8", errors="replace"))
+            first_s = parse_ts_to_epoch_s(evt.get("t")) if isinstance(evt, dict) else None
+        except Exception:
+            pass
+        info = StreamSegment(path, gz, size, head_fingerprint(head), first_s if first_s is not None else sig.mtime_ns // 1_000_000_000)
+    _segment_cache[path] = (key, info)
+    return info
+
+def _dir_stamp(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except Exception:
+        return None
+
+def rotated_segments(live_path: str, archive_dir: Optional[str]) -> List[StreamSegment]:
+    """Rotated segments of the stream whose live file is `live_path`, oldest first (deduped by head).
+
+    The directory listings are cached until one of the directories' mtime changes; plain segments
+    are re-checked on every call since the writer may still append to a just-renamed file.
+    """
+    base = os.path.basename(live_path)
+    cache_key = (live_path, archive_dir)
+    top = (_dir_stamp(os.path.dirname(live_path) or "."), _dir_stamp(archive_dir) if archive_dir else None)
+    hit = _segment_lists.get(cache_key)
+    if hit is not None and hit[0] == top:
+        months = hit[1]
+    elif archive_dir:
+        try:
+            months = sorted(os.listdir(archive_dir))
+        except Exception:
+            months = []
+    else:
+        months = []
+    dirs = [os.path.dirname(live_path)]
+    if archive_dir:
+        dirs += [os.path.join(archive_dir, m, "raw") for m in months]
+    raw_stamps = tuple(_dir_stamp(d) for d in dirs[1:])
+    if hit is not None and hit[0] == top and hit[2] == raw_stamps:
+        cached: List[StreamSegment] = []
+        for g in hit[3]:
+            info = g if g.gz else _segment_info(g.path)
+            if info is None or info.head != g.head:
+                break
+            cached.append(info)
+        else:
+            return cached
+    segs: List[StreamSegment] = []
+    for d in dirs:
+        try:
+            names = os.listdir(d)
+        except Exception:
+            continue
+        for name in names:
+            if not name.startswith(base + ".") or name.endswith(SEGMENT_SKIP_SUFFIXES):
+                continue
+            info = _segment_info(os.path.join(d, name))
+            if info is not None:
+                segs.append(info)
+    segs.sort(key=lambda g: (g.first_s, g.path))
+    seen: Set[int] = set()
+    out: List[StreamSegment] = []
+    for g in segs:
+        if g.head not in seen:
+            seen.add(g.head)
+            out.append(g)
+    _segment_lists[cache_key] = (top, months, raw_stamps, out)
+    return list(out)
+
+def _segment_index(segs: List[StreamSegment], state: StreamState) -> Optional[int]:
+    """Index of the segment being read: same path, or same head (moved/gzipped since)."""
+    for i, g in enumerate(segs):
+        if g.path == state.segment:
+            return i
+    for i, g in enumerate(segs):
+        if state.head and g.head == state.head:
+            return i
+    return None
+
+def _rotated_resume(state: StreamState) -> Optional[StreamSegment]:
+    """The rotated segment now holding the live file `state` was reading, if any."""
+    if state.archive_dir is None or state.offset <= 0:
+        return None
+    for g in rotated_segments(state.path, state.archive_dir):
+        if state.head and g.head == state.head and (g.gz or g.size >= state.offset):
+            return g
+        if not state.head and not g.gz and state.sig.inode != 0 and (file_sig(g.path) or FileSig(0, 0, 0)).inode == state.sig.inode:
+            return g
+    return None
+
+def _at_position(state: StreamState, segment: str, offset: int, head: int, sig: FileSig) -> StreamState:
+    return StreamState(
+        path=state.path,
+        sig=sig,
+        offset=offset,
+        total_lines=state.total_lines,
+        total_events=state.total_events,
+        parse_errors=state.parse_errors,
+        schema_errors=state.schema_errors,
+        dropped_events=state.dropped_events,
+        legacy_world_zdos=state.legacy_world_zdos,
+        last_event_ts=state.last_event_ts,
+        last_ingest_ts=state.last_ingest_ts,
+        segment=segment,
+        head=head,
+        archive_dir=state.archive_dir,
+    )
+
+def follow_rotation(state: StreamState) -> StreamState:
+    """If the live file was rotated away with unread data, continue in its rotated segment
+    (also while the writer has not created the new live file yet)."""
+    if state.segment or state.archive_dir is None:
+        return state
+    sig = file_sig(state.path)
+    if sig is not None and detect_reset_reason(state, sig) is None:
+        return state
+    seg = _rotated_resume(state)
+    if seg is None:
+        return state
+    return _at_position(state, seg.path, state.offset, seg.head, state.sig)
+
+def _close_segment(path: str) -> None:
+    f = _segment_readers.pop(path, None)
+    if f is not None:
+        try:
+            f.close()
+        except Exception:
+            pass
+
+def _read_segment(path: str, offset: int, n: int) -> bytes:
+    if not path.endswith(".gz"):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(n)
+    f = _segment_readers.get(path)
+    if f is None:
+        f = gzip.open(path, "rb")
+        _segment_readers[path] = f
+    if f.tell() != offset:
+        f.seek(offset)
+    return f.read(n)
+
+def _peek_segment(path: str, offset: int, n: int) -> bytes:
+    """Like _read_segment, but leaves the cached reader where it is.
+
+    A gzip reader cannot seek backwards without decompressing from the start again, so the
+    peek is served from the reader's buffer when it holds a complete line, else from a
+    separate handle.
+    """
+    if not path.endswith(".gz"):
+        return _read_segment(path, offset, n)
+    f = _segment_readers.get(path)
+    if f is not None and f.tell() == offset:
+        data = f.peek(n)[:n]
+        if b"\n" in data:
+            return data
+    with gzip.open(path, "rb") as g:
+        g.seek(offset)
+        return g.read(n)
+
+def read_segment_chunk(state: StreamState, max_bytes: int) -> Tuple[StreamState, List[str], Optional[str]]:
+    """Read up to ~max_bytes of complete lines from the rotated segment at the stream position.
+
+    A segment is closed, so its last line counts even without a newline. At its end the position
+    moves to the next segment, or to offset 0 of the live file, and no lines are returned. The
+    last segment is not left before the live file exists: until the writer reopens its path it
+    may still append to the renamed file.
+    """
+    segs = rotated_segments(state.path, state.archive_dir)
+    i = _segment_index(segs, state)
+    if i is None:
+        _close_segment(state.segment)
+        reason = f"rotated segment missing ({os.path.basename(state.segment)})"
+        return _at_position(state, "", 0, 0, FileSig(0, 0, 0)), [], reason
+    seg = segs[i]
+    step = max(1, int(max_bytes))
+    try:
+        data = _read_segment(seg.path, state.offset, step)
+        while len(data) >= step and b"\n" not in data:
+            more = _read_segment(seg.path, state.offset + len(data), step)
+            if not more:
+                break
+            data += more
+    except Exception as e:
+        _close_segment(seg.path)
+        return state, [], f"rotated segment unreadable ({os.path.basename(seg.path)}: {e})"
+    if not data:
+        _close_segment(seg.path)
+        if i + 1 < len(segs):
+            nxt = segs[i + 1]
+            return _at_position(state, nxt.path, 0, nxt.head, state.sig), [], None
+        if not seg.gz and not os.path.exists(state.path):
+            return state, [], None
+        return _at_position(state, "", 0, 0, FileSig(0, 0, 0)), [], None
+    if len(data) >= step:
+        cut = data.rfind(b"\n")
+        if cut >= 0:
+            data = data[: cut + 1]
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    return _at_position(state, seg.path, state.offset + len(data), seg.head, state.sig), lines, None
+
+def segment_pending_bytes(state: StreamState) -> int:
+    """Unread bytes of the rotated segment being read, the segments after it and the live file."""
+    live = file_sig(state.path)
+    rest = live.size if live is not None else 0
+    segs = rotated_segments(state.path, state.archive_dir)
+    i = _segment_index(segs, state)
+    if i is None:
+        return max(1, rest)
+    # gz sizes are estimates: at least 1 until the read reaches the segment's end.
+    cur = segs[i].size - state.offset
+    return (max(1, cur) if segs[i].gz else max(0, cur)) + sum(g.size for g in segs[i + 1:]) + rest
+
+def rotated_tail_lines(live_path: str, archive_dir: Optional[str], want_lines: int) -> List[str]:
+    """Last `want_lines` lines of the rotated segments before the live file (newest segment last)."""
+    out: List[str] = []
+    for seg in reversed(rotated_segments(live_path, archive_dir)):
+        if len(out) >= want_lines:
+            break
+        if not seg.gz:
+            lines = read_tail_lines(seg.path, want_lines - len(out))
+        elif seg.size <= SEGMENT_TAIL_MAX_BYTES:
+            try:
+                with gzip.open(seg.path, "rb") as f:
+                    tail = deque((ln.decode("utf-8", errors="replace").rstrip("\r\n") for ln in f), maxlen=want_lines - len(out))
+                lines = list(tail)
+            except Exception:
+                lines = []
+        else:
+            break
+        out = lines[-(want_lines - len(out)):] + out
+    return out
+
+def read_new_lines_with_reset(state: StreamState) -> Tuple[StreamState, List[str], Optional[str]]:
+    """Read new lines; detect file replacement/truncate; if detected, reset counters & offset.
+
+    With rotated segments (StreamState.archive_dir set) a rotated-away file is drained first,
+    SEGMENT_READ_BYTES per call, then the live file is read from its start.
+    """
+    if state.archive_dir is not None:
+        state = follow_rotation(state)
+        # One bounded chunk per call: a large rotated backlog is drained over several polls.
+        while state.segment:
+            at = (state.segment, state.offset)
+            state, part, reason = read_segment_chunk(state, SEGMENT_READ_BYTES)
+            if part or reason is not None or (state.segment, state.offset) == at:
+                return state, part, reason
+    sig = file_sig(state.path)
+    if sig is None:
+        # File not present yet; keep state, don't reset
+        return state, [], None
+
+    reason = detect_reset_reason(state, sig)
+    if reason is not None:
+        # Reset counters as requested when a new/changed file goes in
+        state = StreamState(
+            path=state.path,
+            sig=FileSig(0, 0, 0),  # will be replaced below
+            offset=0,
+            total_lines=0,
+            total_events=0,
+            parse_errors=0,
+            schema_errors=0,
+            dropped_events=0,
+            legacy_world_zdos=0,
+            last_event_ts=None,
+            last_ingest_ts=None,
+            archive_dir=state.archive_dir,
+        )
+
+    # If this is a brand new signature (first time seeing file), we want to backfill from 0 anyway.
+    offset = max(0, state.offset)
+
+    try:
+        with open(state.path, "r", encoding="utf-8", errors="replace") as f:
+            f.seek(offset)
+            data = f.read()
+            new_offset = f.tell()
+        lines = data.splitlines() if data else []
+    except Exception:
+        return state, [], None
+
+    new_state = StreamState(
+        path=state.path,
+        sig=sig,
+        offset=new_offset,
+        total_lines=state.total_lines,
+        total_events=state.total_events,
+        parse_errors=state.parse_errors,
+        schema_errors=state.schema_errors,
+        dropped_events=state.dropped_events,
+        legacy_world_zdos=state.legacy_world_zdos,
+        last_event_ts=state.last_event_ts,
+        last_ingest_ts=state.last_ingest_ts,
+        head=state.head or (head_fingerprint(read_head(state.path)) if state.archive_dir is not None and new_offset > 0 else 0),
+        archive_dir=state.archive_dir,
+    )
+    return new_state, lines, reason
+
+def read_new_lines_chunk(state: StreamState, max_bytes: int) -> Tuple[StreamState, List[str], Optional[str]]:
+    """Like read_new_lines_with_reset, but reads at most ~max_bytes of complete lines.
+
+    Used by catch-up mode so a multi-GB backlog is consumed in bounded, line-aligned slices
+    instead of being loaded into memory in one read. A partial trailing line is left unread.
+    Rotated segments are read one chunk per call (see read_segment_chunk).
+    """
+    if state.archive_dir is not None:
+        state = follow_rotation(state)
+        if state.segment:
+            return read_segment_chunk(state, max_bytes)
+    sig = file_sig(state.path)
+    if sig is None:
+        return state, [], None
+
+    reason = detect_reset_reason(state, sig)
+    if reason is not None:
+        state = StreamState(
+            path=state.path,
+            sig=FileSig(0, 0, 0),
+            offset=0,
+            total_lines=0,
+            total_events=0,
+            parse_errors=0,
+            schema_errors=0,
+            dropped_events=0,
+            legacy_world_zdos=0,
+            last_event_ts=None,
+            last_ingest_ts=None,
+            archive_dir=state.archive_dir,
+        )
+
+    offset = max(0, state.offset)
+    try:
+        with open(state.path, "rb") as f:
+            f.seek(offset)
+            data = f.read(max(1, int(max_bytes)))
+            # A single line longer than the chunk: keep reading until it completes (or EOF).
+            while data and b"\n" not in data:
+                more = f.read(max(1, int(max_bytes)))
+                if not more:
+                    break
+                data += more
+    except Exception:
+        return state, [], None
+
+    cut = data.rfind(b"\n")
+    if cut < 0:
+        # Only a partial line is available; wait for the writer to finish it.
+        data = b""
+    else:
+        data = data[: cut + 1]
+    lines = data.decode("utf-8", errors="replace").splitlines() if data else []
+
+    new_state = StreamState(
+        path=state.path,
+        sig=sig,
+        offset=offset + len(data),
+        total_lines=state.total_lines,
+        total_events=state.total_events,
+        parse_errors=state.parse_errors,
+        schema_errors=state.schema_errors,
+        dropped_events=state.dropped_events,
+        legacy_world_zdos=state.legacy_world_zdos,
+        last_event_ts=state.last_event_ts,
+        last_ingest_ts=state.last_ingest_ts,
+        head=state.head or (head_fingerprint(read_head(state.path)) if state.archive_dir is not None and data else 0),
+        archive_dir=state.archive_dir,
+    )
+    return new_state, lines, reason
+
+def pending_bytes(state: StreamState) -> int:
+    """Bytes between the saved offset and EOF (0 if the file is missing or was replaced)."""
+    state = follow_rotation(state)
+    if state.segment:
+        return segment_pending_bytes(state)
+    sig = file_sig(state.path)
+    if sig is None:
+        return 0
+    if detect_reset_reason(state, sig) is not None:
+        return sig.size
+    return max(0, sig.size - state.offset)
+
+def peek_pending_event_s(state: StreamState, max_bytes: int = 65536) -> Optional[int]:
+    """Return the event time of the first unread line, without consuming anything."""
+    state = follow_rotation(state)
+    if state.segment:
+        try:
+            data = _peek_segment(state.segment, state.offset, max_bytes)
+        except Exception:
+            return None
+        if data and b"\n" not in data:
+            data += b"\n"  # a segment's last line is complete
+    else:
+        sig = file_sig(state.path)
+        if sig is None:
+            return None
+        offset = 0 if detect_reset_reason(state, sig) is not None else max(0, state.offset)
+        if offset >= sig.size:
+            return None
+        try:
+            with open(state.path, "rb") as f:
+                f.seek(offset)
+                data = f.read(max_bytes)
+        except Exception:
+            return None
+    for raw in data.split(b"\n")[:-1] if b"\n" in data else []:
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            evt = json.loads(raw.decode("utf-8", errors="replace"))
+        except Exception:
+            continue
+        if isinstance(evt, dict):
+            es = parse_ts_to_epoch_s(evt.get("t"))
+            if es is not None:
+                return es
+    return None
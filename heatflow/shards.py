@@ -0,0 +1,259 @@
+"""World zone counts and flow edges sharded over worker processes (--zone-shards)."""
+
+from __future__ import annotations
+
+import heapq
+import math
+import zlib
+from typing import Any, Dict, List, Set, Tuple
+
+from .common import ignore_sigint
+from .live import LiveAgg
+
+# Zone-sharded aggregation (--zone-shards N): worker processes own hash slices of a LiveAgg's
+# world ZDO zone map and flow edge state. The coordinator keeps parsing, players and the per-bucket
+# flow sums, streams updates to the shards in batches and merges their partial top-N lists,
+# edge lists and value histograms into the frame. Every insertion carries a global sequence
+# number, so ties are broken in the single-process insertion order and frames are identical.
+SHARD_BATCH_OPS = 65536
+
+def _shard_worker(conn: Any) -> None:
+    """Shard process loop: apply op batches per namespace (one per LiveAgg), answer queries."""
+    ignore_sigint()
+    spaces: Dict[str, Dict[str, Any]] = {}
+    while True:
+        try:
+            kind, ns, ops, query = conn.recv()
+        except (EOFError, OSError):
+            return
+        if kind == "stop":
+            return
+        sp = spaces.get(ns)
+        if sp is None:
+            sp = spaces[ns] = {"counts": {}, "seq": {}, "seen": set(), "flow": {}, "wheel": {}}
+        counts, seqs, seen, flow, wheel = sp["counts"], sp["seq"], sp["seen"], sp["flow"], sp["wheel"]
+        for op in ops:
+            if op[0] == "z":
+                _, key, val, seq = op
+                if key not in seen:
+                    if key not in counts:
+                        seqs[key] = seq
+                    counts[key] = val
+                    seen.add(key)
+                else:
+                    counts[key] = counts.get(key, 0) + val
+            elif op[0] == "e":
+                seen.clear()
+            elif op[0] == "f":
+                # Same expiry rules as apply_flow_ttl; flow[key] = [count, exp, seq, last_seen].
+                _, n, ttl_frames, seen_t, items = op
+                for key, count, updated, seq in items:
+                    exp = n + ttl_frames if updated else n + ttl_frames - 1
+                    st = flow.get(key)
+                    if st is None:
+                        flow[key] = [count, exp, seq, seen_t]
+                    else:
+                        st[0] = count
+                        st[1] = exp
+                        st[3] = seen_t
+                    if exp <= n:
+                        flow.pop(key, None)
+                        continue
+                    wheel.setdefault(exp, []).append(key)
+                for key in wheel.pop(n, ()):
+                    st = flow.get(key)
+                    if st is not None and st[1] == n:
+                        flow.pop(key, None)
+            elif op[0] == "adopt":
+                _, zones, seen_keys, edges = op
+                counts.clear()
+                seqs.clear()
+                seen.clear()
+                flow.clear()
+                wheel.clear()
+                for key, val, seq in zones:
+                    counts[key] = val
+                    seqs[key] = seq
+                seen.update(seen_keys)
+                for key, count, exp, seq, seen_t in edges:
+                    flow[key] = [count, exp, seq, seen_t]
+                    wheel.setdefault(exp, []).append(key)
+        if kind != "query":
+            continue
+        what, arg = query
+        result: Any = None
+        if what == "top":
+            result = [
+                (v, seqs[k], k)
+                for k, v in heapq.nsmallest(arg, counts.items(), key=lambda kv: (-kv[1], seqs[kv[0]]))
+            ]
+        elif what == "flows":
+            items = flow.items()
+            if arg > 0:
+                items = heapq.nsmallest(arg, items, key=lambda kv: (-kv[1][0], kv[1][2]))
+            result = [(st[2], k, st[0], st[3]) for k, st in items]
+        elif what == "hist":
+            hist: Dict[int, int] = {}
+            for v in counts.values():
+                hist[v] = hist.get(v, 0) + 1
+            result = hist
+        elif what == "dump":
+            result = [(seqs[k], k, v) for k, v in counts.items()]
+        elif what == "get":
+            result = [(k, counts[k]) for k in arg if k in counts]
+        elif what == "seen":
+            result = list(seen)
+        conn.send((result, len(counts), len(flow)))
+
+class ShardPool:
+    """The shard processes, shared by every sharded LiveAgg of the run (namespaced per view)."""
+
+    def __init__(self, n: int) -> None:
+        import multiprocessing
+        self.n = max(1, int(n))
+        self.conns: List[Any] = []
+        self.procs: List[Any] = []
+        for i in range(self.n):
+            parent, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=_shard_worker, args=(child,), name=f"zone-shard-{i}", daemon=True)
+            proc.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(proc)
+
+    def close(self) -> None:
+        for conn in self.conns:
+            try:
+                conn.send(("stop", "", [], None))
+            except Exception:
+                pass
+        for proc in self.procs:
+            proc.join(timeout=5)
+
+class ZoneShards:
+    """Coordinator side of one sharded LiveAgg (see _shard_worker).
+
+    Zones are partitioned by crc32 of the zone key, flow edges by their source zone, so one
+    zone's counts and outgoing edges live in the same shard.
+    """
+
+    def __init__(self, pool: ShardPool, ns: str) -> None:
+        self.pool = pool
+        self.ns = ns
+        self.ops: List[List[Tuple[Any, ...]]] = [[] for _ in range(pool.n)]
+        self.seq = 0
+        self.zones = 0
+        self.edges = 0
+        self.queries = 0
+
+    def _slot(self, zone_key: str) -> int:
+        return zlib.crc32(zone_key.encode("utf-8")) % self.pool.n
+
+    def _push(self, i: int, op: Tuple[Any, ...]) -> None:
+        ops = self.ops[i]
+        ops.append(op)
+        if len(ops) >= SHARD_BATCH_OPS:
+            self.pool.conns[i].send(("batch", self.ns, ops, None))
+            self.ops[i] = []
+
+    def add_zone(self, key: str, val: int) -> None:
+        self.seq += 1
+        self._push(self._slot(key), ("z", key, val, self.seq))
+
+    def new_epoch(self) -> None:
+        for i in range(self.pool.n):
+            self._push(i, ("e",))
+
+    def stage_flow(self, live: LiveAgg, ttl_frames: int, seen_t: str) -> None:
+        """Hand this bucket's edge sums to the shards; they run the TTL wheel for their edges."""
+        items: List[List[Tuple[str, int, bool, int]]] = [[] for _ in range(self.pool.n)]
+        for key, count in live.flow_sum.items():
+            self.seq += 1
+            items[self._slot(key.split("->", 1)[0])].append((key, count, key in live.flow_updated, self.seq))
+        for i in range(self.pool.n):
+            self._push(i, ("f", live.frame_no, ttl_frames, seen_t, items[i]))
+
+    def adopt(self, live: LiveAgg) -> None:
+        """Move an already restored world/flow state into the shards (insertion order kept)."""
+        zones: List[List[Tuple[str, int, int]]] = [[] for _ in range(self.pool.n)]
+        seen: List[List[str]] = [[] for _ in range(self.pool.n)]
+        edges: List[List[Tuple[str, int, int, int, Any]]] = [[] for _ in range(self.pool.n)]
+        for key, val in live.hotspots_world_counts.items():
+            self.seq += 1
+            zones[self._slot(key)].append((key, val, self.seq))
+        for key in live.hotspots_world_seen:
+            seen[self._slot(key)].append(key)
+        for key, st in live.flow_state.items():
+            self.seq += 1
+            edges[self._slot(key.split("->", 1)[0])].append((key, int(st.get("c", 0)), int(st.get("exp", 0)), self.seq, st.get("last_seen")))
+        for i in range(self.pool.n):
+            self._push(i, ("adopt", zones[i], seen[i], edges[i]))
+        live.hotspots_world_counts = {}
+        live.hotspots_world_seen = set()
+        live.flow_state = {}
+        live.flow_wheel = {}
+        self._ask("hist", None)
+
+    def _ask(self, what: str, arg: Any) -> List[Any]:
+        for i, conn in enumerate(self.pool.conns):
+            conn.send(("query", self.ns, self.ops[i], (what, arg)))
+            self.ops[i] = []
+        results = []
+        zones = edges = 0
+        for conn in self.pool.conns:
+            result, nz, ne = conn.recv()
+            results.append(result)
+            zones += nz
+            edges += ne
+        self.zones, self.edges = zones, edges
+        self.queries += 1
+        return results
+
+    def world_top(self, n: int) -> List[Tuple[str, int]]:
+        merged = sorted((item for part in self._ask("top", n) for item in part), key=lambda t: (-t[0], t[1]))
+        return [(k, v) for v, _, k in merged[:n]]
+
+    def world_items(self) -> List[Tuple[str, int]]:
+        merged = sorted(item for part in self._ask("dump", None) for item in part)
+        return [(k, v) for _, k, v in merged]
+
+    def world_get(self, keys: List[str]) -> Dict[str, int]:
+        return {k: v for part in self._ask("get", keys) for k, v in part}
+
+    def world_seen(self) -> Set[str]:
+        return {k for part in self._ask("seen", None) for k in part}
+
+    def world_quantiles(self) -> Dict[str, Any]:
+        hist: Dict[int, int] = {}
+        for part in self._ask("hist", None):
+            for v, c in part.items():
+                hist[v] = hist.get(v, 0) + c
+        return compute_world_quantiles_hist(hist)
+
+    def flow_items(self, topk: int) -> List[Tuple[str, Dict[str, Any]]]:
+        merged = [item for part in self._ask("flows", topk) for item in part]
+        if topk > 0 and self.edges > topk:
+            merged.sort(key=lambda t: (-t[2], t[0]))
+            merged = merged[:topk]
+        else:
+            merged.sort(key=lambda t: t[0])
+        return [(k, {"c": c, "last_seen": seen_t}) for _, k, c, seen_t in merged]
+
+    def report(self) -> Dict[str, Any]:
+        return {"shards": self.pool.n, "zones": self.zones, "flow_edges": self.edges, "queries": self.queries}
+
+def compute_world_quantiles_hist(hist: Dict[int, int]) -> Dict[str, Any]:
+    """compute_world_quantiles over a value -> multiplicity histogram (exact, no expansion)."""
+    n = sum(hist.values())
+    if n <= 0:
+        return {"p90": None, "p99": None, "n_zones": 0, "max": 0}
+    vals = sorted(hist)
+    def q_at(q: float) -> int:
+        idx = min(max(int(math.ceil(q * (n - 1))), 0), n - 1)
+        seen = 0
+        for v in vals:
+            seen += hist[v]
+            if idx < seen:
+                return int(v)
+        return int(vals[-1])
+    return {"p90": q_at(0.90), "p99": q_at(0.99), "n_zones": n, "max": int(vals[-1])}
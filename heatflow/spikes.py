@@ -0,0 +1,153 @@
+"""Streaming per-zone spike detection over world ZDO counts (--spike-topk)."""
+
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .common import WORLD_ZDOS_BUCKET_S, iso_utc, parse_zk
+from .live import LiveAgg
+
+# Per-zone growth spikes (see ZoneSpikes): EWMA of the per-minute growth between scan epochs.
+SPIKE_ALPHA = 0.3
+SPIKE_Z = 3.0
+SPIKE_MIN_DELTA = 50  # objects; smaller jumps are never alerts
+SPIKE_MIN_SAMPLES = 3  # completed epochs before a zone's z-score counts
+SPIKE_STD_FLOOR = 1.0  # objects/min; keeps flat zones from alerting on the first small change
+SPIKE_ALERTS_FILENAME = "world_zdos_spikes.jsonl"
+SPIKE_ALERTS_MAX_BYTES = 8 * 1024 * 1024  # then renamed to <name>.1 (one older file kept)
+
+class ZoneSpikes:
+    """Incremental growth rate and z-score per world ZDO zone.
+
+    A zone's count for an epoch is final once the zone is first seen in a later epoch (see
+    apply_world_zdos_event), so its growth sample is folded into the EWMA mean/variance only then.
+    The current epoch's value is scored against those stats when its bucket closes (`step`),
+    for the zones touched since the last step only. Zones scoring >= SPIKE_Z with a jump of at
+    least SPIKE_MIN_DELTA are active spikes; entering that set appends one alert line. A spike
+    whose zone is missing from the newest epoch and the one before it (complete by then) expires.
+    """
+
+    def __init__(self, owner: "LiveAgg", topk: int, alerts_path: Optional[str], min_dt_s: int = WORLD_ZDOS_BUCKET_S) -> None:
+        self.owner = owner  # the view whose events feed the tracker (the primary one)
+        self.topk = max(1, int(topk))
+        self.min_dt_s = max(1, int(min_dt_s))  # rates never divide by less than one scan bucket
+        self.alerts_path = alerts_path
+        # zone -> [epoch, final, final_t, mean, var, n, cur, cur_t]
+        self.zones: Dict[str, List[Any]] = {}
+        self.touched: Set[str] = set()
+        self.epochs: Tuple[Optional[int], Optional[int]] = (None, None)  # (previous, newest) epoch fed
+        self.active: Dict[str, Dict[str, Any]] = {}
+        self.version = 0  # bumped whenever the active set changes
+        self.alerts = 0
+        self.expired = 0
+        self.alert_files_rotated = 0
+        self.steps = 0
+        self.step_zones = 0
+        self.step_s = 0.0
+        self.errors = 0
+
+    def feed(self, key: str, val: int, epoch: int) -> None:
+        if epoch != self.epochs[1]:
+            self.epochs = (self.epochs[1], epoch)
+        st = self.zones.get(key)
+        if st is None:
+            self.zones[key] = [epoch, None, None, 0.0, 0.0, 0, val, None]
+        elif st[0] != epoch:
+            if st[7] is not None:
+                self._fold(st)
+            st[0], st[6], st[7] = epoch, val, None
+        else:
+            st[6] += val
+        self.touched.add(key)
+
+    def _rate(self, st: List[Any]) -> Optional[float]:
+        if st[1] is None or st[7] is None:
+            return None
+        return (st[6] - st[1]) * 60.0 / max(self.min_dt_s, st[7] - st[2])
+
+    def _fold(self, st: List[Any]) -> None:
+        r = self._rate(st)
+        if r is not None:
+            if st[5] == 0:
+                st[3], st[4] = r, 0.0
+            else:
+                diff = r - st[3]
+                incr = SPIKE_ALPHA * diff
+                st[3] += incr
+                st[4] = (1.0 - SPIKE_ALPHA) * (st[4] + diff * incr)
+            st[5] += 1
+        st[1], st[2] = st[6], st[7]
+
+    def step(self, bucket_s: int) -> None:
+        """Score the zones touched in the bucket that just closed."""
+        t0 = time.perf_counter()
+        lines: List[str] = []
+        for key in self.touched:
+            st = self.zones[key]
+            if st[7] is None:
+                st[7] = bucket_s
+            r = self._rate(st)
+            z = 0.0
+            if r is not None and st[5] >= SPIKE_MIN_SAMPLES:
+                z = (r - st[3]) / max(math.sqrt(st[4]), SPIKE_STD_FLOOR)
+            delta = st[6] - st[1] if st[1] is not None else 0
+            if z >= SPIKE_Z and delta >= SPIKE_MIN_DELTA:
+                zx, zy = parse_zk(key)
+                item = {
+                    "zx": zx, "zy": zy, "count": int(st[6]), "prev": int(st[1]), "delta": int(delta),
+                    "rate_per_min": round(r or 0.0, 1), "z": round(z, 2),
+                }
+                prev = self.active.get(key)
+                if prev is None:
+                    lines.append(json.dumps({"t": iso_utc(bucket_s), "epoch": st[0], **item}, separators=(",", ":")))
+                if prev != item:
+                    self.active[key] = item
+                    self.version += 1
+            elif self.active.pop(key, None) is not None:
+                self.version += 1
+        self.step_zones += len(self.touched)
+        self.touched.clear()
+        stale = [key for key in self.active if self.zones[key][0] not in self.epochs]
+        for key in stale:
+            del self.active[key]
+        if stale:
+            self.expired += len(stale)
+            self.version += 1
+        if lines and self.alerts_path:
+            try:
+                if os.path.exists(self.alerts_path) and os.path.getsize(self.alerts_path) >= SPIKE_ALERTS_MAX_BYTES:
+                    os.replace(self.alerts_path, self.alerts_path + ".1")
+                    self.alert_files_rotated += 1
+                with open(self.alerts_path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                self.alerts += len(lines)
+            except Exception:
+                self.errors += 1
+        self.steps += 1
+        self.step_s += time.perf_counter() - t0
+
+    def top(self) -> List[Dict[str, Any]]:
+        if len(self.active) <= self.topk:
+            items = list(self.active.values())
+        else:
+            items = heapq.nlargest(self.topk, self.active.values(), key=lambda it: it["z"])
+        items.sort(key=lambda it: (-it["z"], it["zx"], it["zy"]))
+        return items
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "zones": len(self.zones),
+            "active": len(self.active),
+            "expired": self.expired,
+            "alerts_written": self.alerts,
+            "alerts_path": self.alerts_path,
+            "alert_files_rotated": self.alert_files_rotated,
+            "zones_scored_per_bucket": round(self.step_zones / max(1, self.steps), 1),
+            "step_ms_avg": round(self.step_s * 1000.0 / max(1, self.steps), 3),
+            "errors": self.errors,
+        }
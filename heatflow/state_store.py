@@ -0,0 +1,242 @@
+"""Transactional SQLite state store (--state-store sqlite)."""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+try:  # stdlib, but absent from some minimal builds; only needed for --state-store sqlite
+    import sqlite3 as _sqlite3
+except Exception:  # pragma: no cover - optional dependency
+    _sqlite3 = None
+
+from .common import WORLD_ZDOS_BUCKET_S, iso_utc
+from .frames import list_frames
+from .live import LiveAgg, world_count_items, world_seen_keys, world_zone_counts
+from .streams import StreamState, stream_state_from_dict
+
+# Optional SQLite state store (--state-store sqlite): offsets, the world ZDO cache and the frame
+# index in one WAL-mode database, committed in one transaction per emitted bucket, so stored
+# offsets never run ahead of the frames written for them, nor of the world zones they fed.
+STATE_DB_FILENAME = "state.sqlite3"
+STATE_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS offsets (stream TEXT PRIMARY KEY, state TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS frames (
+    dir TEXT NOT NULL, sec INTEGER NOT NULL, file TEXT NOT NULL, ref INTEGER NOT NULL,
+    PRIMARY KEY (dir, sec)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS world_zones (zone TEXT PRIMARY KEY, count INTEGER NOT NULL, seq INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS world_seen (zone TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+class StateStore:
+    """state/state.sqlite3: what offsets.json, world_zdos_cache.json and the frames dir listing hold.
+
+    `commit_bucket()` writes the bucket's frame index row, the offsets whose events are all in
+    emitted frames and (primary view) the world zones changed since the last commit plus the
+    current epoch's seen set in a single transaction. A crash between writing a frame file and
+    its commit replays those events on restart, which rewrites the same frame; frames, offsets
+    and world counts are never out of step.
+
+    After a successful `load_world()` only the zones in `live.world_touched` are looked up; a
+    store that restored nothing diffs the whole zone map once, then goes incremental too.
+    """
+
+    def __init__(self, path: str) -> None:
+        if _sqlite3 is None:
+            raise RuntimeError("--state-store sqlite needs the sqlite3 module")
+        self.path = path
+        self.db = _sqlite3.connect(path, isolation_level=None, timeout=10.0, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(STATE_DB_SCHEMA)
+        self.world_saved: Dict[str, Tuple[int, int]] = {}  # zone -> (count, seq) as committed
+        self.world_seq = 0
+        self.world_synced = False  # world_saved mirrors the zone map (incremental commits)
+        self.world_epoch: Optional[int] = None  # epoch of the committed seen set
+        self.commits = 0
+        self.errors = 0
+        self.world_rows = 0
+        self.last_commit: Optional[str] = None
+
+    def load_states(self) -> Dict[str, StreamState]:
+        out: Dict[str, StreamState] = {}
+        for stream, raw in self.db.execute("SELECT stream, state FROM offsets"):
+            try:
+                out[stream] = stream_state_from_dict(json.loads(raw))
+            except Exception:
+                continue
+        return out
+
+    def load_world(self, live: LiveAgg, bucket_s: int) -> bool:
+        """Same contract as load_world_zdos_cache."""
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        try:
+            if int(meta.get("world_bucket_s", 0)) != bucket_s:
+                return False
+            epoch = int(meta["world_epoch"])
+        except Exception:
+            return False
+        live.hotspots_world_counts = {}
+        live.hotspots_world_seen = set()
+        self.world_saved = {}
+        for zone, count, seq in self.db.execute("SELECT zone, count, seq FROM world_zones ORDER BY seq"):
+            live.hotspots_world_counts[zone] = int(count)
+            live.hotspots_world_seen.add(zone)
+            self.world_saved[zone] = (int(count), int(seq))
+            self.world_seq = max(self.world_seq, int(seq))
+        live.hotspots_world_seen = {zone for (zone,) in self.db.execute("SELECT zone FROM world_seen")}
+        live.hotspots_world_epoch = epoch
+        self.world_epoch = epoch
+        self.world_synced = True
+        try:
+            live.hotspots_world_meta = json.loads(meta.get("world_meta", "{}"))
+        except Exception:
+            live.hotspots_world_meta = {}
+        return True
+
+    def sync_frames(self, dir_name: str, frames_dir: str) -> int:
+        """Seed the frame index for one frames dir from disk the first time it is used."""
+        if self.db.execute("SELECT 1 FROM frames WHERE dir = ? LIMIT 1", (dir_name,)).fetchone():
+            return 0
+        rows = [(dir_name, f["sec"], f["url"].split("/", 1)[1], 1 if f.get("ref") else 0) for f in list_frames(frames_dir)]
+        self.db.execute("BEGIN")
+        self.db.executemany("INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?)", rows)
+        self.db.execute("COMMIT")
+        return len(rows)
+
+    def list_frames(self, dir_name: str) -> List[Dict[str, Any]]:
+        """list_frames() from the index instead of a directory listing."""
+        out: List[Dict[str, Any]] = []
+        for sec, file, ref in self.db.execute("SELECT sec, file, ref FROM frames WHERE dir = ? ORDER BY sec", (dir_name,)):
+            item: Dict[str, Any] = {"sec": sec, "url": f"frames/{file}"}
+            if ref:
+                item["ref"] = True
+            out.append(item)
+        return out
+
+    def time_range(self, dir_name: str) -> Tuple[Optional[int], Optional[int]]:
+        row = self.db.execute("SELECT MIN(sec), MAX(sec) FROM frames WHERE dir = ?", (dir_name,)).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def prune_missing(self, dir_name: str, frames_dir: str) -> int:
+        """Drop index rows whose frame file is gone (e.g. after tools/rotate_monthly.py)."""
+        rows = self.db.execute("SELECT sec, file FROM frames WHERE dir = ?", (dir_name,)).fetchall()
+        present: Dict[str, bool] = {}
+        gone = []
+        for sec, fn in rows:
+            if fn not in present:
+                present[fn] = os.path.exists(os.path.join(frames_dir, fn))
+            if not present[fn]:
+                gone.append((dir_name, sec))
+        self.db.execute("BEGIN")
+        self.db.executemany("DELETE FROM frames WHERE dir = ? AND sec = ?", gone)
+        self.db.execute("COMMIT")
+        return len(gone)
+
+    def thin_frames(self, dir_name: str, dropped: List[int], rows: List[Tuple[int, str, int]]) -> None:
+        """Apply a retention pass: drop buckets and rewrite (sec, file, ref) rows in one transaction."""
+        self.db.execute("BEGIN")
+        self.db.executemany("DELETE FROM frames WHERE dir = ? AND sec = ?", [(dir_name, sec) for sec in dropped])
+        self.db.executemany("INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?)", [(dir_name, *r) for r in rows])
+        self.db.execute("COMMIT")
+
+    def commit_bucket(
+        self,
+        dir_name: str,
+        label: int,
+        file: str,
+        ref: bool,
+        offsets: Dict[str, Dict[str, Any]],
+        live: Optional[LiveAgg] = None,
+        world_bucket_s: int = WORLD_ZDOS_BUCKET_S,
+    ) -> bool:
+        """One bucket's transaction; `live` (the primary view) adds its world zone changes."""
+        saved = dict(self.world_saved)
+        seq = self.world_seq
+        touched = live.world_touched if live is not None else None
+        full = not self.world_synced or touched is None
+        try:
+            self.db.execute("BEGIN")
+            self.db.execute("INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?)", (dir_name, label, file, 1 if ref else 0))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO offsets VALUES (?, ?)",
+                [(k, json.dumps(d, separators=(",", ":"))) for k, d in offsets.items()],
+            )
+            if live is not None:
+                # Only zones whose count changed since the last commit are written.
+                epoch = int(live.hotspots_world_epoch)
+                if full:
+                    world = world_count_items(live)
+                    seen = world_seen_keys(live)
+                else:
+                    counts = world_zone_counts(live, list(touched))
+                    world = [(zone, counts.get(zone, 0)) for zone in touched]
+                    seen = {zone for zone, ep in touched.items() if ep == epoch}
+                changed = []
+                current = set()
+                for zone, count in world:
+                    if count <= 0:
+                        continue
+                    current.add(zone)
+                    prev = saved.get(zone)
+                    if prev is None:
+                        seq += 1
+                        saved[zone] = (count, seq)
+                        changed.append((zone, count, seq))
+                    elif prev[0] != count:
+                        saved[zone] = (count, prev[1])
+                        changed.append((zone, count, prev[1]))
+                gone = [z for z in saved if z not in current] if full else []
+                for zone in gone:
+                    del saved[zone]
+                self.db.executemany("INSERT OR REPLACE INTO world_zones VALUES (?, ?, ?)", changed)
+                self.db.executemany("DELETE FROM world_zones WHERE zone = ?", [(z,) for z in gone])
+                # The seen set decides whether a zone's next report replaces or adds to its count.
+                if full or epoch != self.world_epoch:
+                    self.db.execute("DELETE FROM world_seen")
+                self.db.executemany("INSERT OR IGNORE INTO world_seen VALUES (?)", [(z,) for z in seen])
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    [
+                        ("world_bucket_s", str(int(world_bucket_s))),
+                        ("world_epoch", str(int(live.hotspots_world_epoch))),
+                        ("world_meta", json.dumps(live.hotspots_world_meta, separators=(",", ":"))),
+                    ],
+                )
+                self.world_rows += len(changed) + len(gone)
+            self.db.execute("COMMIT")
+        except Exception:
+            self.errors += 1
+            try:
+                self.db.execute("ROLLBACK")
+            except Exception:
+                pass
+            return False
+        self.world_saved = saved
+        self.world_seq = seq
+        if live is not None:
+            self.world_epoch = int(live.hotspots_world_epoch)
+            self.world_synced = True
+            if touched is not None:
+                touched.clear()
+        self.commits += 1
+        self.last_commit = iso_utc(label)
+        return True
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "commits": self.commits,
+            "last_committed_bucket": self.last_commit,
+            "world_rows_written": self.world_rows,
+            "errors": self.errors,
+        }
+
+    def close(self) -> None:
+        try:
+            self.db.close()
+        except Exception:
+            pass
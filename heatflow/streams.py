@@ -0,0 +1,169 @@
+"""Per-stream file signatures, read state and the offsets.json state file."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .common import SCHEMA_VERSION, atomic_write_json, iso_utc
+
+@dataclass
+class FileSig:
+    inode: int
+    size: int
+    mtime_ns: int
+
+@dataclass
+class StreamState:
+    path: str
+    sig: FileSig
+    offset: int
+    total_lines: int
+    total_events: int
+    parse_errors: int
+    schema_errors: int
+    dropped_events: int
+    legacy_world_zdos: int
+    last_event_ts: Optional[str]
+    last_ingest_ts: Optional[str]
+    # Composite offset (see StreamSegment): rotated segment being read; "" = the live file at `path`.
+    segment: str = ""
+    head: int = 0  # first-line fingerprint of the file being read, to find it again after a rollover
+    archive_dir: Optional[str] = None  # rotated segments are searched here; None = single-file stream (not saved)
+
+def file_sig(path: str) -> Optional[FileSig]:
+    try:
+        st = os.stat(path)
+        inode = int(getattr(st, "st_ino", 0) or 0)
+        size = int(st.st_size)
+        mtime_ns = int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9)))
+        return FileSig(inode=inode, size=size, mtime_ns=mtime_ns)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        return None
+
+def _sig_dict(sig: FileSig) -> Dict[str, int]:
+    return {"inode": sig.inode, "size": sig.size, "mtime_ns": sig.mtime_ns}
+
+def _sig_from_dict(d: Any) -> FileSig:
+    if not isinstance(d, dict):
+        return FileSig(0, 0, 0)
+    return FileSig(
+        inode=int(d.get("inode", 0) or 0),
+        size=int(d.get("size", 0) or 0),
+        mtime_ns=int(d.get("mtime_ns", 0) or 0),
+    )
+
+def load_offsets(state_dir: str) -> Dict[str, StreamState]:
+    p = os.path.join(state_dir, "offsets.json")
+    if not os.path.exists(p):
+        return {}
+    try:
+        with open(p, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+
+        out: Dict[str, StreamState] = {}
+
+        # Backward compatible: older format might have been {stream:{inode,offset}}
+        if isinstance(raw, dict) and "streams" not in raw:
+            for k, v in raw.items():
+                if not isinstance(v, dict):
+                    continue
+                out[k] = StreamState(
+                    path="",
+                    sig=FileSig(inode=int(v.get("inode", 0) or 0), size=0, mtime_ns=0),
+                    offset=int(v.get("offset", 0) or 0),
+                    total_lines=int(v.get("total_lines", 0) or 0),
+                    total_events=int(v.get("total_events", 0) or 0),
+                    parse_errors=int(v.get("parse_errors", 0) or 0),
+                    schema_errors=int(v.get("schema_errors", 0) or 0),
+                    dropped_events=int(v.get("dropped_events", 0) or 0),
+                    legacy_world_zdos=int(v.get("legacy_world_zdos", 0) or 0),
+                    last_event_ts=v.get("last_event_ts"),
+                    last_ingest_ts=v.get("last_ingest_ts"),
+                )
+            return out
+
+        if not isinstance(raw, dict):
+            return {}
+
+        streams = raw.get("streams", {})
+        if not isinstance(streams, dict):
+            return {}
+
+        for k, v in streams.items():
+            if not isinstance(v, dict):
+                continue
+            out[k] = stream_state_from_dict(v)
+        return out
+    except Exception:
+        return {}
+
+def stream_state_dict(v: StreamState) -> Dict[str, Any]:
+    return {
+        "path": v.path,
+        "sig": _sig_dict(v.sig),
+        "offset": v.offset,
+        "total_lines": v.total_lines,
+        "total_events": v.total_events,
+        "parse_errors": v.parse_errors,
+        "schema_errors": v.schema_errors,
+        "dropped_events": v.dropped_events,
+        "legacy_world_zdos": v.legacy_world_zdos,
+        "last_event_ts": v.last_event_ts,
+        "last_ingest_ts": v.last_ingest_ts,
+        "segment": v.segment,
+        "head": v.head,
+    }
+
+def stream_state_from_dict(v: Dict[str, Any]) -> StreamState:
+    return StreamState(
+        path=str(v.get("path", "")),
+        sig=_sig_from_dict(v.get("sig")),
+        offset=int(v.get("offset", 0) or 0),
+        total_lines=int(v.get("total_lines", 0) or 0),
+        total_events=int(v.get("total_events", 0) or 0),
+        parse_errors=int(v.get("parse_errors", 0) or 0),
+        schema_errors=int(v.get("schema_errors", 0) or 0),
+        dropped_events=int(v.get("dropped_events", 0) or 0),
+        legacy_world_zdos=int(v.get("legacy_world_zdos", 0) or 0),
+        last_event_ts=v.get("last_event_ts"),
+        last_ingest_ts=v.get("last_ingest_ts"),
+        segment=str(v.get("segment") or ""),
+        head=int(v.get("head", 0) or 0),
+    )
+
+def save_offsets(state_dir: str, states: Dict[str, StreamState]) -> None:
+    p = os.path.join(state_dir, "offsets.json")
+    raw = {
+        "schema": SCHEMA_VERSION,
+        "saved_at": iso_utc(int(time.time())),
+        "streams": {k: stream_state_dict(v) for k, v in states.items()},
+    }
+    atomic_write_json(p, raw)
+
+def is_sig_equal(a: FileSig, b: FileSig) -> bool:
+    return a.inode == b.inode and a.size == b.size and a.mtime_ns == b.mtime_ns
+
+def detect_reset_reason(prev: StreamState, cur_sig: FileSig) -> Optional[str]:
+    """Return a non-empty string reason if this stream should reset its counters."""
+    # If file shrank below our offset -> truncated or replaced
+    if cur_sig.size < prev.offset:
+        return "truncate/replace (size < offset)"
+
+    # Linux: inode change is a strong signal of replace
+    if prev.sig.inode != 0 and cur_sig.inode != 0 and cur_sig.inode != prev.sig.inode:
+        return "replace (inode changed)"
+
+    # Windows heuristic (inode often 0):
+    # If mtime changed and size is <= previous size while we believed we were at EOF,
+    # it's likely a replace.
+    if prev.sig.inode == 0 and cur_sig.inode == 0:
+        if cur_sig.mtime_ns != prev.sig.mtime_ns and cur_sig.size <= prev.sig.size and prev.offset >= prev.sig.size:
+            return "replace (win heuristic mtime+size)"
+
+    return None
@@ -0,0 +1,214 @@
+"""Zone size, map tile sampling and the memory-mapped zone biome table (--biome-map)."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .common import ensure_dir
+
+# TileGrid biomes (--biome-map DIR): the viewer's locked tile mapping (docs/Contract/CONTRACT.md
+# §4) in Python, reduced once per map to a memory-mapped zone -> biome-mix table. Frames carry the
+# dominant biome id per hotspot zone and flow endpoint, so clients need not decode tiles for labels.
+ZONE_SIZE_M = 64
+TILE_SAMPLE_BYTES = 10  # uint16 biome, float32 height, float32 forest (little-endian)
+TILE_CACHE_TILES = 16
+ZONE_BIOME_GRID = 4  # samples per zone axis
+ZONE_BIOME_SLOTS = 3  # biome ids kept per zone, by sample share
+ZONE_BIOME_MAGIC = b"VZB1"
+ZONE_BIOME_HEADER = struct.Struct("<4siiH")  # magic, lowest zone index, zones per axis, samples per zone
+ZONE_BIOME_RECORD = struct.Struct("<3H3B")  # biome ids, sample counts (0 = unused slot)
+
+class TileGrid:
+    """Reader for out/map/data (map.json + tiles/{ty:02d}-{tx:02d}.bin.gz) with an LRU of decoded tiles."""
+
+    def __init__(self, map_dir: str, cache_tiles: int = TILE_CACHE_TILES) -> None:
+        self.map_dir = map_dir
+        with open(os.path.join(map_dir, "map.json"), "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        m = raw.get("meta", raw) if isinstance(raw, dict) else {}
+        self.world_width = float(m["WorldWidth"])
+        self.world_half = self.world_width / 2
+        self.row = int(m["TileRowCount"])
+        self.side = int(m["TileSideCount"])
+        self.samples = self.row * self.side
+        self._cache: "OrderedDict[Tuple[int, int], Optional[bytes]]" = OrderedDict()
+        self.cache_tiles = max(1, int(cache_tiles))
+        self.hits = 0
+        self.misses = 0
+
+    def tile_file(self, tx: int, ty: int) -> str:
+        return os.path.join(self.map_dir, "tiles", f"{ty:02d}-{tx:02d}.bin.gz")
+
+    def _tile(self, tx: int, ty: int) -> Optional[bytes]:
+        key = (tx, ty)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        try:
+            with open(self.tile_file(tx, ty), "rb") as f:
+                raw: Optional[bytes] = gzip.decompress(f.read())
+        except Exception:
+            raw = None  # missing/corrupt tiles read as biome 0, like the viewer's N/A
+        self._cache[key] = raw
+        if len(self._cache) > self.cache_tiles:
+            self._cache.popitem(last=False)
+        return raw
+
+    def address(self, x: float, z: float) -> Tuple[int, int, int]:
+        """World (x, z) -> (tx, ty, sample index), with the locked transforms applied."""
+        u = 1.0 - (x + self.world_half) / self.world_width  # mirror east/west in biome sampling
+        v = (-z + self.world_half) / self.world_width
+        gx = min(max(int(math.floor(u * self.samples)), 0), self.samples - 1)
+        gy = min(max(int(math.floor(v * self.samples)), 0), self.samples - 1)
+        r, last = self.row, self.side - 1
+        # tileRowOrder top-down, then swapXY, flipTileX/Y and pixelFlipX/Y; row-major index.
+        tx, ty = last - gy // r, last - gx // r
+        ix, iy = r - 1 - gy % r, r - 1 - gx % r
+        return tx, ty, iy * r + ix
+
+    def biome_at(self, x: float, z: float) -> int:
+        tx, ty, index = self.address(x, z)
+        raw = self._tile(tx, ty)
+        off = index * TILE_SAMPLE_BYTES
+        if raw is None or off + TILE_SAMPLE_BYTES > len(raw):
+            return 0
+        return raw[off] | (raw[off + 1] << 8)
+
+    def sample(self, x: float, z: float) -> Optional[Tuple[int, float, float]]:
+        """(biome, height, forest) at a world position, or None when the tile is unavailable."""
+        tx, ty, index = self.address(x, z)
+        raw = self._tile(tx, ty)
+        off = index * TILE_SAMPLE_BYTES
+        if raw is None or off + TILE_SAMPLE_BYTES > len(raw):
+            return None
+        return struct.unpack_from("<Hff", raw, off)
+
+    def signature(self) -> str:
+        """Changes when map.json or any tile file changes size (a new world / re-export)."""
+        h = hashlib.blake2b(digest_size=8)
+        with open(os.path.join(self.map_dir, "map.json"), "rb") as f:
+            h.update(f.read())
+        tiles_dir = os.path.join(self.map_dir, "tiles")
+        names = sorted(os.listdir(tiles_dir)) if os.path.isdir(tiles_dir) else []
+        for n in names:
+            h.update(f"{n}:{os.path.getsize(os.path.join(tiles_dir, n))};".encode("utf-8"))
+        h.update(f"{ZONE_SIZE_M}:{ZONE_BIOME_GRID}:{ZONE_BIOME_SLOTS}".encode("utf-8"))
+        return h.hexdigest()
+
+def build_zone_biome_table(grid: TileGrid, path: str) -> int:
+    """Sample ZONE_BIOME_GRID^2 points per zone of the world disc; write the table to `path`.
+
+    Zones are visited row by row, so a tile stays cached while its zone rows are sampled.
+    Returns the number of zones inside the disc.
+    """
+    zlo = -int(math.ceil(grid.world_half / ZONE_SIZE_M))
+    n = -2 * zlo
+    k = ZONE_BIOME_GRID
+    steps = [(i + 0.5) * ZONE_SIZE_M / k for i in range(k)]
+    reach = grid.world_half + ZONE_SIZE_M  # zone centers further out are beyond the map
+    empty = ZONE_BIOME_RECORD.pack(0, 0, 0, 0, 0, 0)
+    grid.cache_tiles = max(grid.cache_tiles, grid.side + 1)
+    inside = 0
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(ZONE_BIOME_HEADER.pack(ZONE_BIOME_MAGIC, zlo, n, k * k))
+        for zy in range(zlo, zlo + n):
+            row = bytearray()
+            cz = (zy + 0.5) * ZONE_SIZE_M
+            for zx in range(zlo, zlo + n):
+                cx = (zx + 0.5) * ZONE_SIZE_M
+                if cx * cx + cz * cz > reach * reach:
+                    row += empty
+                    continue
+                inside += 1
+                counts: Dict[int, int] = {}
+                x0, z0 = zx * ZONE_SIZE_M, zy * ZONE_SIZE_M
+                for dz in steps:
+                    for dx in steps:
+                        b = grid.biome_at(x0 + dx, z0 + dz)
+                        counts[b] = counts.get(b, 0) + 1
+                top = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:ZONE_BIOME_SLOTS]
+                top += [(0, 0)] * (ZONE_BIOME_SLOTS - len(top))
+                row += ZONE_BIOME_RECORD.pack(*(b for b, _ in top), *(c for _, c in top))
+            f.write(row)
+    os.replace(tmp, path)
+    grid.cache_tiles = TILE_CACHE_TILES
+    while len(grid._cache) > grid.cache_tiles:
+        grid._cache.popitem(last=False)
+    return inside
+
+class ZoneBiomes:
+    """Memory-mapped zone -> biome-mix table for one map, built into `cache_dir` on first use."""
+
+    def __init__(self, map_dir: str, cache_dir: str) -> None:
+        self.grid = TileGrid(map_dir)
+        sig = self.grid.signature()
+        self.path = os.path.join(cache_dir, f"zone_biomes_{sig}.bin")
+        self.built = False
+        self.build_s = 0.0
+        if not os.path.exists(self.path):
+            ensure_dir(cache_dir)
+            t0 = time.monotonic()
+            build_zone_biome_table(self.grid, self.path)
+            self.build_s = time.monotonic() - t0
+            self.built = True
+            for n in os.listdir(cache_dir):
+                if n.startswith("zone_biomes_") and n.endswith(".bin") and n != os.path.basename(self.path):
+                    try:
+                        os.remove(os.path.join(cache_dir, n))  # table of a previous map
+                    except Exception:
+                        pass
+        self._f = open(self.path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.zlo, self.n, self.per_zone = ZONE_BIOME_HEADER.unpack_from(self._mm, 0)
+        if magic != ZONE_BIOME_MAGIC:
+            raise ValueError(f"not a zone biome table: {self.path}")
+        self.lookups = 0
+
+    def _record(self, zx: int, zy: int) -> Optional[Tuple[int, ...]]:
+        i, j = zx - self.zlo, zy - self.zlo
+        if not (0 <= i < self.n and 0 <= j < self.n):
+            return None
+        self.lookups += 1
+        return ZONE_BIOME_RECORD.unpack_from(self._mm, ZONE_BIOME_HEADER.size + (j * self.n + i) * ZONE_BIOME_RECORD.size)
+
+    def biome(self, zx: int, zy: int) -> int:
+        """Dominant raw biome id (bitmask, as in the tiles) of a zone; 0 outside the map."""
+        rec = self._record(zx, zy)
+        return rec[0] if rec is not None else 0
+
+    def mix(self, zx: int, zy: int) -> List[Tuple[int, float]]:
+        """[(biome id, share of zone samples)] for up to ZONE_BIOME_SLOTS biomes, largest first."""
+        rec = self._record(zx, zy)
+        if rec is None:
+            return []
+        k = ZONE_BIOME_SLOTS
+        return [(rec[i], rec[k + i] / self.per_zone) for i in range(k) if rec[k + i] > 0]
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "map_dir": self.grid.map_dir,
+            "table": self.path,
+            "zones_per_axis": self.n,
+            "built_this_run": self.built,
+            "build_s": round(self.build_s, 2),
+            "lookups": self.lookups,
+        }
+
+    def close(self) -> None:
+        try:
+            self._mm.close()
+            self._f.close()
+        except Exception:
+            pass
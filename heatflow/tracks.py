@@ -0,0 +1,270 @@
+"""Per-player compressed position tracks and their queries (--tracks, tools/query_tracks.py)."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .common import atomic_write_json, parse_ts_to_epoch_s, zk
+
+# Per-player track store (--tracks): <dir>/YYYY-MM-DD/<player>.trk + index.json per UTC day.
+# A .trk file is a stream of varint records. Tag 0 starts an absolute record (t, x, z); any
+# other tag v is a delta record with dt = unzigzag(v - 1) followed by zigzag dx, dz.
+# Positions are quantized to TRACK_QUANT_PER_M steps per meter.
+TRACKS_SCHEMA = "tracks.v1"
+TRACK_QUANT_PER_M = 10
+
+def _zz(v: int) -> int:
+    return (v << 1) ^ (v >> 63)
+
+def _unzz(v: int) -> int:
+    return (v >> 1) ^ -(v & 1)
+
+def _put_varint(buf: bytearray, v: int) -> None:
+    while v >= 0x80:
+        buf.append((v & 0x7F) | 0x80)
+        v >>= 7
+    buf.append(v)
+
+def _get_varint(data: bytes, i: int) -> Tuple[int, int]:
+    v = 0
+    shift = 0
+    while True:
+        b = data[i]
+        i += 1
+        v |= (b & 0x7F) << shift
+        if b < 0x80:
+            return v, i
+        shift += 7
+
+def decode_track(data: bytes) -> List[Tuple[int, float, float]]:
+    """Decode a .trk byte string into [(t, x, z)]; a truncated trailing record is ignored."""
+    out: List[Tuple[int, float, float]] = []
+    i = 0
+    t = qx = qz = 0
+    n = len(data)
+    try:
+        while i < n:
+            tag, j = _get_varint(data, i)
+            if tag == 0:
+                t, j = _get_varint(data, j)
+                vx, j = _get_varint(data, j)
+                vz, j = _get_varint(data, j)
+                qx, qz = _unzz(vx), _unzz(vz)
+            else:
+                vx, j = _get_varint(data, j)
+                vz, j = _get_varint(data, j)
+                t += _unzz(tag - 1)
+                qx += _unzz(vx)
+                qz += _unzz(vz)
+            i = j
+            out.append((t, qx / TRACK_QUANT_PER_M, qz / TRACK_QUANT_PER_M))
+    except IndexError:
+        pass
+    return out
+
+def track_file_name(pid: str) -> str:
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in pid)[:40]
+    return f"{safe}_{hashlib.blake2b(pid.encode('utf-8'), digest_size=4).hexdigest()}.trk"
+
+class TrackStore:
+    """Appends player_positions samples to per-player, per-day delta/varint track files.
+
+    Samples are buffered and appended on flush() (once per primary bucket); each day's
+    index.json maps player -> file, time span and sample count, and zone -> player -> visit
+    span, so replay and zone-visit queries touch only the days and files they need.
+    A sample at or before the player's last stored time is dropped (keeps re-ingest after a
+    crash between flush and offset save from duplicating points).
+
+    The index is written atomically after the data and records each file's byte length; when
+    a day is reopened, bytes past that length (a crash between the two writes) are cut off
+    and files the index does not know are removed, so re-ingested samples are stored once.
+    """
+
+    def __init__(self, tracks_dir: str) -> None:
+        self.dir = tracks_dir
+        os.makedirs(tracks_dir, exist_ok=True)
+        self.day: Optional[str] = None
+        self.index: Dict[str, Any] = {}
+        self.last: Dict[str, Tuple[int, int, int]] = {}  # pid -> (t, qx, qz) of the last encoded sample
+        self.resume_t: Dict[str, int] = {}  # pid -> last stored t for the open day (from index.json)
+        self.pending: Dict[str, bytearray] = {}
+        self.dirty = False
+        self.samples = 0
+        self.bytes_written = 0
+        self.dropped_old = 0
+        self.errors = 0
+
+    def _open_day(self, day: str) -> None:
+        self.flush()
+        self.day = day
+        self.last.clear()
+        try:
+            with open(os.path.join(self.dir, day, "index.json"), "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        except Exception:
+            self.index = {"schema": TRACKS_SCHEMA, "day": day, "quant_per_m": TRACK_QUANT_PER_M, "players": {}, "zones": {}}
+        # New appends after a restart start with an absolute record (no in-memory delta base).
+        self.resume_t = {pid: int(p.get("t1", 0)) for pid, p in self.index["players"].items()}
+        self._trim_day(os.path.join(self.dir, day))
+
+    def _trim_day(self, day_dir: str) -> None:
+        """Cut track files back to the lengths recorded in the day's index."""
+        lengths = {p["file"]: p.get("bytes") for p in self.index["players"].values()}
+        try:
+            names = os.listdir(day_dir)
+        except Exception:
+            return
+        for name in names:
+            if not name.endswith(".trk"):
+                continue
+            path = os.path.join(day_dir, name)
+            try:
+                if name not in lengths:
+                    os.remove(path)
+                elif lengths[name] is not None and os.path.getsize(path) > int(lengths[name]):
+                    with open(path, "r+b") as f:
+                        f.truncate(int(lengths[name]))
+            except Exception:
+                self.errors += 1
+
+    def add_event(self, evt: Dict[str, Any]) -> None:
+        es = parse_ts_to_epoch_s(evt.get("t"))
+        players = evt.get("players")
+        if es is None or not isinstance(players, list):
+            return
+        day = time.strftime("%Y-%m-%d", time.gmtime(es))
+        if day != self.day:
+            if self.day is not None and day < self.day:
+                self.dropped_old += len(players)
+                return
+            self._open_day(day)
+        for p in players:
+            try:
+                pid = p.get("id")
+                if not isinstance(pid, str) or not pid:
+                    continue
+                qx = int(round(float(p.get("x")) * TRACK_QUANT_PER_M))
+                qz = int(round(float(p.get("z")) * TRACK_QUANT_PER_M))
+            except Exception:
+                continue
+            prev = self.last.get(pid)
+            last_t = prev[0] if prev is not None else self.resume_t.get(pid)
+            if last_t is not None and es <= last_t:
+                self.dropped_old += 1
+                continue
+            buf = self.pending.setdefault(pid, bytearray())
+            if prev is None:
+                buf.append(0)
+                _put_varint(buf, es)
+                _put_varint(buf, _zz(qx))
+                _put_varint(buf, _zz(qz))
+            else:
+                _put_varint(buf, _zz(es - prev[0]) + 1)
+                _put_varint(buf, _zz(qx - prev[1]))
+                _put_varint(buf, _zz(qz - prev[2]))
+            self.last[pid] = (es, qx, qz)
+
+            ent = self.index["players"].get(pid)
+            if ent is None:
+                ent = {"file": track_file_name(pid), "name": p.get("name", ""), "t0": es, "t1": es, "n": 0}
+                self.index["players"][pid] = ent
+            ent["t1"] = es
+            ent["n"] += 1
+            if p.get("zx") is not None and p.get("zy") is not None:
+                try:
+                    zone = self.index["zones"].setdefault(zk(int(p["zx"]), int(p["zy"])), {})
+                except Exception:
+                    zone = None
+                if zone is not None:
+                    span = zone.get(pid)
+                    if span is None:
+                        zone[pid] = [es, es, 1]
+                    else:
+                        span[1] = es
+                        span[2] += 1
+            self.samples += 1
+            self.dirty = True
+
+    def flush(self) -> None:
+        if not self.dirty or self.day is None:
+            return
+        try:
+            day_dir = os.path.join(self.dir, self.day)
+            os.makedirs(day_dir, exist_ok=True)
+            for pid in list(self.pending):
+                buf = self.pending.pop(pid)
+                if not buf:
+                    continue
+                ent = self.index["players"][pid]
+                with open(os.path.join(day_dir, ent["file"]), "ab") as f:
+                    f.write(buf)
+                    ent["bytes"] = f.tell()
+                self.bytes_written += len(buf)
+            atomic_write_json(os.path.join(day_dir, "index.json"), self.index)
+            self.dirty = False
+        except Exception:
+            self.errors += 1
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "dir": self.dir,
+            "day": self.day,
+            "players_today": len(self.index.get("players", {})) if self.day else 0,
+            "samples": self.samples,
+            "bytes_written": self.bytes_written,
+            "bytes_per_sample": round(self.bytes_written / self.samples, 2) if self.samples else None,
+            "dropped_old": self.dropped_old,
+            "errors": self.errors,
+        }
+
+def track_days(tracks_dir: str, start_s: int, end_s: int) -> List[str]:
+    """Day directories (YYYY-MM-DD) of a track store with an index, overlapping [start_s, end_s]."""
+    try:
+        names = sorted(os.listdir(tracks_dir))
+    except Exception:
+        return []
+    first = time.strftime("%Y-%m-%d", time.gmtime(start_s))
+    last = time.strftime("%Y-%m-%d", time.gmtime(end_s))
+    return [n for n in names if first <= n <= last and os.path.isfile(os.path.join(tracks_dir, n, "index.json"))]
+
+def track_index(tracks_dir: str, day: str) -> Dict[str, Any]:
+    """One day's index.json (see TrackStore)."""
+    with open(os.path.join(tracks_dir, day, "index.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def replay_track(tracks_dir: str, pid: str, start_s: int, end_s: int) -> List[Tuple[int, float, float]]:
+    """All stored (t, x, z) samples of one player with start_s <= t <= end_s."""
+    out: List[Tuple[int, float, float]] = []
+    for day in track_days(tracks_dir, start_s, end_s):
+        ent = track_index(tracks_dir, day).get("players", {}).get(pid)
+        if ent is None or ent["t1"] < start_s or ent["t0"] > end_s:
+            continue
+        try:
+            with open(os.path.join(tracks_dir, day, ent["file"]), "rb") as f:
+                # Only the indexed prefix: the writer may be appending past it right now.
+                data = f.read(int(ent.get("bytes", -1)))
+        except Exception:
+            continue
+        out.extend(s for s in decode_track(data) if start_s <= s[0] <= end_s)
+    return out
+
+def zone_visitors(tracks_dir: str, zx: int, zy: int, start_s: int, end_s: int) -> Dict[str, Dict[str, Any]]:
+    """Players whose visit span in zone (zx, zy) overlaps [start_s, end_s], with first/last seen and samples."""
+    out: Dict[str, Dict[str, Any]] = {}
+    key = zk(zx, zy)
+    for day in track_days(tracks_dir, start_s, end_s):
+        for pid, (t0, t1, n) in (track_index(tracks_dir, day).get("zones", {}).get(key) or {}).items():
+            if t1 < start_s or t0 > end_s:
+                continue
+            cur = out.get(pid)
+            if cur is None:
+                out[pid] = {"first": t0, "last": t1, "samples": n}
+            else:
+                cur["first"] = min(cur["first"], t0)
+                cur["last"] = max(cur["last"], t1)
+                cur["samples"] += n
+    return out
@@ -0,0 +1,173 @@
+"""Event-time bucket windows with a lateness watermark (--event-time)."""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .common import STREAM_FILES, iso_utc, parse_ts_to_epoch_s
+
+@dataclass
+class EventWindows:
+    """Event-time windows keyed by frame label, sealed by a per-stream watermark.
+
+    A stream's watermark is its newest event time minus `lateness_s`; a stream with nothing
+    left to read is idle and follows wall-clock time instead, so a quiet stream never stalls
+    the others. A bucket is sealed once the minimum watermark over all streams passes it.
+    Events whose bucket is already sealed are counted as late and folded into the oldest
+    open bucket. At most `max_open` buckets are held; beyond that the oldest is force-sealed.
+    """
+    cadence_s: int
+    lateness_s: int
+    max_open: int
+    open: Dict[int, List[Tuple[int, int, str, Dict[str, Any], bool]]]
+    stream_max_s: Dict[str, int]
+    sealed_upto: Optional[int]
+    seq: int
+    late_events: Dict[str, int]
+    forced_seals: int
+    last_watermark: Optional[int]
+    # Per stream [(offset, label, segment)]: every event before (segment, offset) is buffered in a bucket <= label.
+    marks: Dict[str, List[Tuple[int, int, str]]]
+
+def new_windows(cadence_s: int, lateness_s: int) -> EventWindows:
+    lateness_s = max(0, int(lateness_s))
+    return EventWindows(
+        cadence_s=cadence_s,
+        lateness_s=lateness_s,
+        max_open=int(math.ceil(lateness_s / cadence_s)) + 2,
+        open={},
+        stream_max_s={},
+        sealed_upto=None,
+        seq=0,
+        late_events={k: 0 for k in STREAM_FILES.keys()},
+        forced_seals=0,
+        last_watermark=None,
+        marks={k: [] for k in STREAM_FILES.keys()},
+    )
+
+def event_bucket_label(event_s: int, cadence_s: int) -> int:
+    """Frame label for an event time.
+
+    Mirrors the live path, where frame `B` is written at the start of bucket B and holds what
+    was ingested during [B - cadence, B).
+    """
+    return (event_s // cadence_s + 1) * cadence_s
+
+def windows_add(w: EventWindows, stream_key: str, evt: Dict[str, Any], legacy_world: bool, now_s: int) -> bool:
+    """Buffer one validated event in its event-time bucket. Returns False if it arrived late."""
+    es = parse_ts_to_epoch_s(evt.get("t"))
+    if es is None:
+        return False
+    es = min(es, now_s)  # clock skew: never open buckets in the future
+    label = event_bucket_label(es, w.cadence_s)
+    on_time = True
+    if w.sealed_upto is not None and label <= w.sealed_upto:
+        w.late_events[stream_key] = w.late_events.get(stream_key, 0) + 1
+        label = w.sealed_upto + w.cadence_s
+        on_time = False
+    w.open.setdefault(label, []).append((es, w.seq, stream_key, evt, legacy_world))
+    w.seq += 1
+    if es > w.stream_max_s.get(stream_key, -1):
+        w.stream_max_s[stream_key] = es
+    return on_time
+
+def windows_mark(w: EventWindows, stream_key: str, offset: int, segment: str = "") -> None:
+    """Record that a stream was consumed up to (segment, offset) (call after buffering its lines)."""
+    top = w.stream_max_s.get(stream_key)
+    label = event_bucket_label(top, w.cadence_s) if top is not None else 0
+    if w.sealed_upto is not None:
+        label = max(label, w.sealed_upto + w.cadence_s)  # late events land in the next open bucket
+    marks = w.marks.setdefault(stream_key, [])
+    if marks and marks[-1][1] == label:
+        marks[-1] = (offset, label, segment)
+    else:
+        marks.append((offset, label, segment))
+
+def windows_safe_offsets(w: EventWindows, label: int) -> Dict[str, Tuple[int, str]]:
+    """Per stream, the furthest (offset, segment) whose events are all in buckets up to `label` (consumed)."""
+    out: Dict[str, Tuple[int, str]] = {}
+    for k, marks in w.marks.items():
+        i = 0
+        while i < len(marks) and marks[i][1] <= label:
+            i += 1
+        if i:
+            out[k] = (marks[i - 1][0], marks[i - 1][2])
+            del marks[:i]
+    return out
+
+def windows_watermark(w: EventWindows, idle: Dict[str, bool], now_s: int) -> Optional[int]:
+    wm: Optional[int] = None
+    for k in STREAM_FILES.keys():
+        if idle.get(k, False):
+            sw = now_s - w.lateness_s
+        elif k in w.stream_max_s:
+            sw = w.stream_max_s[k] - w.lateness_s
+        else:
+            return None
+        if wm is None or sw < wm:
+            wm = sw
+    return wm
+
+def windows_seal(w: EventWindows, watermark: Optional[int], apply: Any, emit: Any, force: bool = True) -> int:
+    """Seal every bucket the watermark has passed, in label order.
+
+    For each sealed label, its buffered events are handed to `apply(stream_key, evt, legacy)`
+    in event-time order, then `emit(label)` closes the frame. Empty labels in between are
+    emitted too, up to 10 in a row (the TTL horizon); longer gaps jump to the next open bucket.
+    With `force` False the `max_open` limit is not applied (catch-up bounds memory itself).
+    """
+    c = w.cadence_s
+    limit: Optional[int] = None
+    if watermark is not None:
+        w.last_watermark = watermark
+        limit = (watermark // c) * c
+    if force and len(w.open) > w.max_open:
+        overflow = sorted(w.open.keys())[len(w.open) - w.max_open - 1]
+        if limit is None or overflow > limit:
+            limit = overflow
+            w.forced_seals += 1
+    if limit is None:
+        return 0
+    if w.sealed_upto is None:
+        if not w.open:
+            w.sealed_upto = limit
+            return 0
+        label = min(min(w.open.keys()), limit)
+    else:
+        label = w.sealed_upto + c
+    sealed = 0
+    empty_run = 0
+    while label <= limit:
+        evts = w.open.pop(label, None)
+        if evts:
+            empty_run = 0
+            evts.sort(key=lambda x: (x[0], x[1]))
+            for _, _, stream_key, evt, legacy_world in evts:
+                apply(stream_key, evt, legacy_world)
+        else:
+            empty_run += 1
+            if empty_run > 10:
+                pending = [k for k in w.open.keys() if k <= limit]
+                label = min(pending) if pending else limit
+                empty_run = 0
+                if label in w.open:
+                    continue
+        emit(label)
+        w.sealed_upto = label
+        sealed += 1
+        label += c
+    return sealed
+
+def windows_report(w: EventWindows) -> Dict[str, Any]:
+    return {
+        "lateness_s": w.lateness_s,
+        "watermark": iso_utc(w.last_watermark) if w.last_watermark is not None else None,
+        "sealed_upto": iso_utc(w.sealed_upto) if w.sealed_upto is not None else None,
+        "open_buckets": len(w.open),
+        "max_open_buckets": w.max_open,
+        "buffered_events": sum(len(v) for v in w.open.values()),
+        "late_events": dict(w.late_events),
+        "forced_seals": w.forced_seals,
+    }
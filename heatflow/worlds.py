@@ -0,0 +1,49 @@
+"""Multi-world config (--worlds)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+from typing import List, Set, Tuple
+
+# Options that apply to the whole process in --worlds mode: one scheduler loop and one precompress,
+# catch-up ingest and zone shard pool serve every world. Each world writes its own frames, manifest
+# and state synchronously in its poll turn (state commits rely on the frames being on disk).
+WORLD_SHARED_OPTIONS = {"worlds", "poll", "precompress", "compress_workers", "world_budget_kb", "ingest_workers", "zone_shards"}
+
+def load_worlds_config(path: str, args: argparse.Namespace) -> List[Tuple[str, argparse.Namespace]]:
+    """Per-world settings from a JSON config; keys are CLI option names (dashes or underscores).
+
+    {"defaults": {"cadence": "10,300"}, "worlds": [{"name": "main", "root": "/srv/main"}, ...]}
+    Each world starts from the process CLI/env settings, then `defaults`, then its own entry.
+    `input`/`out`/`state`/`archive_dir` default to <root>/input etc. as in single-world mode.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    defaults = dict(cfg.get("defaults") or {})
+    worlds: List[Tuple[str, argparse.Namespace]] = []
+    seen: Set[str] = set()
+    for i, entry in enumerate(cfg.get("worlds") or []):
+        merged = {**defaults, **entry}
+        name = str(merged.pop("name", "") or f"world{i + 1}")
+        if name in seen:
+            raise ValueError(f"duplicate world name in {path}: {name}")
+        seen.add(name)
+        ns = argparse.Namespace(**vars(args))
+        for key, value in merged.items():
+            dest = key.replace("-", "_")
+            if dest == "archive":
+                dest = "archive_dir"
+            if not hasattr(ns, dest) or dest in WORLD_SHARED_OPTIONS:
+                raise ValueError(f"unknown or process-wide option for world {name}: {key}")
+            setattr(ns, dest, value)
+        if "root" in merged:
+            # Paths not given for this world follow its root, not the process-wide flags.
+            given = {k.replace("-", "_") for k in merged}
+            for dest in ("input", "out", "state", "archive_dir"):
+                if dest not in given:
+                    setattr(ns, dest, None)
+        worlds.append((name, ns))
+    if not worlds:
+        raise ValueError(f"no worlds in {path}")
+    return worlds
@@ -1520,6 +1520,54 @@
     return { frames: out, explicit: true };
   }
 
+  // Rotated months (manifest.archives): each month's seekable index lists its buckets; frames are
+  // fetched one by one through archive/frame/{compact}.json. Needs tools/serve_atlas.py; on a
+  // plain static server the index fetch fails and only out/frames is shown.
+  const archiveSecsCache = new Map();
+  let archiveWarned = false;
+
+  async function loadArchiveFrames(m) {
+    const arc = m?.archives;
+    const months = Array.isArray(arc?.months) ? arc.months : [];
+    if (months.length === 0) return [];
+    const prefix = typeof arc.url_prefix === 'string' ? arc.url_prefix : 'archive/';
+    const template = typeof arc.frame_template === 'string' ? arc.frame_template : `${prefix}frame/{compact}.json`;
+    const out = [];
+    for (const info of months) {
+      if (!info || typeof info.index !== 'string') continue;
+      const key = `${info.index}|${info.latest ?? ''}|${info.n_frames ?? ''}`;
+      let secs = archiveSecsCache.get(key);
+      if (!secs) {
+        try {
+          const idx = await fetchJson(resolveAgainstManifest(prefix + info.index));
+          secs = (Array.isArray(idx?.frames) ? idx.frames : []).map((e) => Number(e?.sec)).filter(Number.isFinite);
+          archiveSecsCache.set(key, secs);
+        } catch (e) {
+          if (!archiveWarned) {
+            archiveWarned = true;
+            console.info('[Valheim Atlas] Archived months not reachable (serve with tools/serve_atlas.py):', e);
+          }
+          continue;
+        }
+      }
+      for (const sec of secs) {
+        out.push({ sec, url: resolveAgainstManifest(template.replace('{compact}', toCompactFromEpochS(sec))), archived: true });
+      }
+    }
+    return out;
+  }
+
+  function getArchivesSignature(m) {
+    const months = Array.isArray(m?.archives?.months) ? m.archives.months : [];
+    return months.map((i) => `${i?.index}|${i?.latest ?? ''}|${i?.n_frames ?? ''}`).join(',');
+  }
+
+  function mergeArchiveFrames(frames, archived) {
+    if (archived.length === 0) return frames;
+    const live = new Set(frames.map((f) => f.sec));
+    return archived.filter((f) => !live.has(f.sec)).concat(frames);
+  }
+
   // ---------- map ----------
   function loadMap() {
     return new Promise((resolve, reject) => {
@@ -1665,14 +1713,15 @@
 
   async function refreshManifestAndFrames(force = false) {
     const m = await fetchJson(state.manifestUrlResolved || cfg.manifestUrl, true);
-    const sig = getManifestSignature(m);
+    const sig = `${getManifestSignature(m)}|${getArchivesSignature(m)}`;
     const changed = sig !== state.manifestSig;
     state.manifestSig = sig;
     state.manifest = m;
     if (el.manifestPath) el.manifestPath.textContent = state.manifestUrlResolved || cfg.manifestUrl;
     if (force || changed) {
       const { frames, explicit } = buildFramesFromManifest(m);
-      applyFramesList(frames, explicit, state.selectedEpochS);
+      const archived = explicit ? await loadArchiveFrames(m) : [];
+      applyFramesList(mergeArchiveFrames(frames, archived), explicit, state.selectedEpochS);
     }
   }
 
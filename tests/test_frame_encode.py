@@ -0,0 +1,81 @@
+"""encode_frame (cached sections, reused bytes) against a from-scratch frame build and json.dumps."""
+from __future__ import annotations
+
+import json
+import os
+import random
+import sys
+from typing import Any, Dict, List
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import aggregator  # noqa: E402
+from heatflow.common import STREAM_FILES, WORLD_ZDOS_SCHEMA, WORLD_ZDOS_TYPE  # noqa: E402
+from heatflow.frames import encode_frame, frame_content_hash  # noqa: E402
+from heatflow.groups import PlayerGroups  # noqa: E402
+from heatflow.live import FRAME_CACHED_SECTIONS, LiveAgg, new_live  # noqa: E402
+from heatflow.spikes import ZoneSpikes  # noqa: E402
+from heatflow.streams import FileSig, StreamState  # noqa: E402
+from heatflow.tiles import ZONE_SIZE_M  # noqa: E402
+
+BUCKET_S = 30
+T0 = 1_790_000_010 // BUCKET_S * BUCKET_S
+
+def bucket_events(rng: random.Random, b: int, players: Dict[str, List[float]]) -> List[Dict[str, Any]]:
+    """One bucket of synthetic events; some buckets are quiet so cached sections get reused."""
+    out: List[Dict[str, Any]] = []
+    if b % 4 == 3:
+        return out
+    ps = []
+    for pid, pos in players.items():
+        if rng.random() < 0.6:
+            pos[0] += rng.uniform(-80, 80)
+            pos[1] += rng.uniform(-80, 80)
+            ps.append({"id": pid, "pfid": "f" + pid, "name": "ä" + pid, "x": round(pos[0], 2), "z": round(pos[1], 2),
+                       "zx": int(pos[0] // ZONE_SIZE_M), "zy": int(pos[1] // ZONE_SIZE_M)})
+    out.append({"type": "player_positions", "players": ps})
+    if b % 3 != 2:
+        tr = [{"fx": rng.randint(-3, 3), "fy": rng.randint(-3, 3), "tx": rng.randint(-3, 3), "ty": rng.randint(-3, 3), "n": rng.randint(1, 4)}
+              for _ in range(rng.randint(1, 6))]
+        out.append({"type": "player_flow", "transitions": tr})
+    if b % 2 == 0:
+        zones = [{"zx": rng.randint(-6, 6), "zy": rng.randint(-6, 6), "count": rng.randint(1, 400) + (900 if b == 30 else 0)}
+                 for _ in range(40)]
+        out.append({"type": WORLD_ZDOS_TYPE, "schema": WORLD_ZDOS_SCHEMA, "epoch": b // 4, "zones": zones})
+    return out
+
+def make_live(flow_cap: int, flow_topk: int, spikes: bool, groups: bool) -> LiveAgg:
+    live = new_live(flow_cap=flow_cap, flow_topk=flow_topk)
+    if spikes:
+        live.spikes = ZoneSpikes(live, 5, None)
+    if groups:
+        live.groups = PlayerGroups(150.0, 2)
+    return live
+
+@pytest.mark.parametrize(
+    "flow_cap,flow_topk,spikes,groups",
+    [(0, 0, False, False), (8, 5, False, False), (0, 0, True, False), (0, 0, False, True)],
+    ids=["plain", "flow-heavy-hitters", "spikes", "groups"],
+)
+def test_encoded_frames_match_full_build(flow_cap: int, flow_topk: int, spikes: bool, groups: bool) -> None:
+    rng = random.Random(46)
+    players = {f"p{i:02d}": [rng.uniform(-500, 500), rng.uniform(-500, 500)] for i in range(12)}
+    states = {k: StreamState("", FileSig(0, 0, 0), 0, 0, 0, 0, 0, 0, 0, None, None) for k in STREAM_FILES}
+    cached = make_live(flow_cap, flow_topk, spikes, groups)
+    fresh = make_live(flow_cap, flow_topk, spikes, groups)
+    for b in range(48):
+        label = T0 + (b + 1) * BUCKET_S
+        for evt in bucket_events(rng, b, players):
+            assert aggregator.ingest_event(cached, evt) == aggregator.ingest_event(fresh, evt)
+        frame = aggregator.seal_bucket(cached, label, states, b, None, ttl_frames=3)
+        # No section of the reference build may come from the cache.
+        fresh.frame_parts.clear()
+        fresh.frame_dirty = set(FRAME_CACHED_SECTIONS)
+        ref = aggregator.seal_bucket(fresh, label, states, b, None, ttl_frames=3)
+
+        data, h = encode_frame(cached, frame)
+        assert data == json.dumps(ref, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), f"bucket {b}"
+        assert h == frame_content_hash(ref), f"bucket {b}"
+    assert cached.frame_stats["reused"] > 0
+    assert cached.frame_stats["bytes_reused"] > 0
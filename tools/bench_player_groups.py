@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the player group spatial hash (aggregator.py --group-radius) on synthetic players.
+
+  python tools/bench_player_groups.py
+  python tools/bench_player_groups.py --players 100,300,1000 --radius 30 --buckets 50
+
+Players gather around a few bases and wander between buckets; a share roams the whole map.
+Each size is timed for PlayerGroups.build and for a pairwise O(players^2) reference, whose groups
+must be identical.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from heatflow.groups import PlayerGroups  # noqa: E402
+from heatflow.live import new_live  # noqa: E402
+from heatflow.tiles import ZONE_SIZE_M  # noqa: E402
+
+WORLD_RADIUS_M = 10000.0
+
+def synth_players(n: int, bases: int, roam: float, rng: random.Random) -> List[Dict[str, Any]]:
+    centers = [(rng.uniform(-WORLD_RADIUS_M, WORLD_RADIUS_M) * 0.7, rng.uniform(-WORLD_RADIUS_M, WORLD_RADIUS_M) * 0.7) for _ in range(bases)]
+    out: List[Dict[str, Any]] = []
+    for i in range(n):
+        if rng.random() < roam:
+            x, z = rng.uniform(-WORLD_RADIUS_M, WORLD_RADIUS_M), rng.uniform(-WORLD_RADIUS_M, WORLD_RADIUS_M)
+        else:
+            cx, cz = centers[rng.randrange(bases)]
+            x, z = rng.gauss(cx, 40.0), rng.gauss(cz, 40.0)
+        out.append({"id": f"p{i:05d}", "x": x, "z": z, "zx": int(math.floor(x / ZONE_SIZE_M)), "zy": int(math.floor(z / ZONE_SIZE_M))})
+    return out
+
+def move(players: List[Dict[str, Any]], step_m: float, rng: random.Random) -> None:
+    for p in players:
+        p["x"] += rng.uniform(-step_m, step_m)
+        p["z"] += rng.uniform(-step_m, step_m)
+        p["zx"] = int(math.floor(p["x"] / ZONE_SIZE_M))
+        p["zy"] = int(math.floor(p["z"] / ZONE_SIZE_M))
+
+def pairwise_groups(players: List[Dict[str, Any]], radius: float, min_size: int) -> List[List[str]]:
+    """Reference: every pair compared, components by flood fill."""
+    r2 = radius * radius
+    n = len(players)
+    adj: List[List[int]] = [[] for _ in range(n)]
+    for a in range(n):
+        ax, az = players[a]["x"], players[a]["z"]
+        for b in range(a + 1, n):
+            if (ax - players[b]["x"]) ** 2 + (az - players[b]["z"]) ** 2 <= r2:
+                adj[a].append(b)
+                adj[b].append(a)
+    seen = [False] * n
+    out: List[List[str]] = []
+    for s in range(n):
+        if seen[s]:
+            continue
+        seen[s] = True
+        stack, comp = [s], []
+        while stack:
+            i = stack.pop()
+            comp.append(players[i]["id"])
+            for j in adj[i]:
+                if not seen[j]:
+                    seen[j] = True
+                    stack.append(j)
+        if len(comp) >= min_size:
+            out.append(sorted(comp))
+    return sorted(out, key=lambda g: (-len(g), g[0]))
+
+def bench(n: int, args: argparse.Namespace) -> Tuple[float, float, float, int, bool]:
+    rng = random.Random(args.seed + n)
+    players = synth_players(n, args.bases, args.roam, rng)
+    pg = PlayerGroups(args.radius, args.min)
+    live = new_live()
+    hash_s = ref_s = 0.0
+    same = True
+    groups = 0
+    for _ in range(args.buckets):
+        t0 = time.perf_counter()
+        sec = pg.build(live, players)
+        hash_s += time.perf_counter() - t0
+        groups = len(sec["groups"])
+        if args.check:
+            t0 = time.perf_counter()
+            ref = pairwise_groups(players, args.radius, pg.min_size)
+            ref_s += time.perf_counter() - t0
+            same = same and ref == [g["players"] for g in sec["groups"]]
+        move(players, args.step, rng)
+    return hash_s * 1000.0 / args.buckets, ref_s * 1000.0 / args.buckets, pg.pairs / args.buckets, groups, same
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", default="50,200,500,1000", help="Comma-separated player counts")
+    ap.add_argument("--radius", type=float, default=30.0, help="Group radius in meters")
+    ap.add_argument("--min", type=int, default=2, help="Smallest group size")
+    ap.add_argument("--bases", type=int, default=12, help="Number of bases players gather around")
+    ap.add_argument("--roam", type=float, default=0.25, help="Share of players anywhere on the map")
+    ap.add_argument("--step", type=float, default=15.0, help="Max movement per bucket (m)")
+    ap.add_argument("--buckets", type=int, default=20, help="Buckets per size")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--no-check", dest="check", action="store_false", help="Skip the O(players^2) reference")
+    return ap.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    ok = True
+    print(f"[bench] radius_m={args.radius:g} bases={args.bases} roam={args.roam} buckets={args.buckets}")
+    print(f"{'players':>8} {'groups':>7} {'pairs':>9} {'hash_ms':>9} {'pairwise_ms':>12} {'speedup':>8} {'same':>5}")
+    for tok in args.players.split(","):
+        n = int(tok)
+        hash_ms, ref_ms, pairs, groups, same = bench(n, args)
+        speedup = f"{ref_ms / hash_ms:.1f}x" if args.check and hash_ms > 0 else "-"
+        ref_col = f"{ref_ms:.3f}" if args.check else "-"
+        print(f"{n:>8} {groups:>7} {pairs:>9.0f} {hash_ms:>9.3f} {ref_col:>12} {speedup:>8} {str(same if args.check else '-'):>5}")
+        ok = ok and same
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Backfill the columnar per-zone export (see aggregator.py --columns) from existing frames.
+
+Reads rotated seekable archives and out/frames in time order and appends every bucket after
+the export's last bucket, so it can be re-run (or used before enabling --columns) safely.
+
+  python tools/export_columns.py --root . --columns ./columns
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from heatflow.archive import FrameArchive, open_frame_archives  # noqa: E402
+from heatflow.columns import ColumnExporter  # noqa: E402
+from heatflow.common import iso_utc  # noqa: E402
+from heatflow.frames import list_frames, load_frame  # noqa: E402
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=os.getcwd(), help="Repo root (default: cwd)")
+    ap.add_argument("--out", default=None, help="Output dir with frames (default: <root>/out)")
+    ap.add_argument("--archive-dir", default=None, help="Rotated archives (default: <root>/archive)")
+    ap.add_argument("--columns", default=None, help="Columnar export dir (default: <root>/columns)")
+    return ap.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    root = os.path.abspath(args.root)
+    out_dir = os.path.abspath(args.out or os.path.join(root, "out"))
+    archive_dir = os.path.abspath(args.archive_dir or os.path.join(root, "archive"))
+    frames_dir = os.path.join(out_dir, "frames")
+    exporter = ColumnExporter(os.path.abspath(args.columns or os.path.join(root, "columns")))
+    after = exporter.last_bucket_s if exporter.last_bucket_s is not None else -1
+
+    # Time index over both sources; a bucket still present in out/frames wins over the archive.
+    sources: Dict[int, Tuple[str, Optional[FrameArchive]]] = {}
+    for arc in open_frame_archives(archive_dir):
+        for sec in arc.secs:
+            if sec > after:
+                sources[sec] = ("archive", arc)
+    for f in list_frames(frames_dir):
+        if f["sec"] > after:
+            sources[f["sec"]] = ("frames", None)
+
+    t0 = time.monotonic()
+    print(f"[columns] dir={exporter.dir} after={iso_utc(after) if after >= 0 else None} buckets={len(sources)}")
+    for n, sec in enumerate(sorted(sources), 1):
+        kind, arc = sources[sec]
+        frame = arc.get(sec) if arc is not None else load_frame(frames_dir, sec)
+        if frame is not None:
+            exporter.append_frame(sec, frame)
+        if n % 5000 == 0:
+            print(f"[columns] {n}/{len(sources)} t={iso_utc(sec)}", flush=True)
+    exporter.close()
+    rep = exporter.report()
+    print(
+        f"[columns] exported={rep['buckets_exported']} rows={rep['rows_exported']} zones={rep['zones']} "
+        f"players={rep['players']} errors={rep['errors']} elapsed={time.monotonic() - t0:.1f}s"
+    )
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Time-range queries over playback frames: live frames dir, per-cadence rollup dirs
+(frames_<N>s) and rotated seekable archives.
+
+Examples:
+  python tools/query_atlas.py --from=-7d --metric hotspots --agg max --top 20
+  python tools/query_atlas.py --from 2024-05-04T18:00:00Z --to 2024-05-04T23:00:00Z --metric flow --format csv
+  python tools/query_atlas.py --from=-1d --metric presence --cadence 300
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from heatflow.archive import FRAME_ARCHIVE_BLOCK_FRAMES, FrameArchive, list_frame_archives  # noqa: E402
+from heatflow.common import iso_utc, parse_compact_to_epoch_s, parse_ts_to_epoch_s  # noqa: E402
+from heatflow.frames import list_frames  # noqa: E402
+
+METRICS = ("hotspots", "flow", "presence")
+AGGS = ("sum", "max", "mean")
+TASK_FRAMES = FRAME_ARCHIVE_BLOCK_FRAMES
+REL_RE = re.compile(r"^-(\d+(?:\.\d+)?)([smhdw])$")
+REL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+# Partial aggregate: key -> [sum, max, frames_present]; merged associatively across workers.
+Partial = Dict[Tuple[int, ...], List[float]]
+# One world ZDO epoch's zone counts: (epoch, rows). Tasks return their first (if closed inside
+# the task) and last epoch unfolded, so an epoch split across tasks is still counted once.
+EpochRows = Tuple[int, Dict[Tuple[int, ...], float]]
+
+def parse_time_arg(value: Optional[str], now_s: int) -> Optional[int]:
+    """Accept ISO (…Z), YYYY-MM-DD, YYYYMMDDTHHMMSS, epoch seconds, 'now' or relative '-7d'/'-12h'."""
+    if value is None:
+        return None
+    v = value.strip()
+    if v == "now":
+        return now_s
+    m = REL_RE.match(v)
+    if m:
+        return now_s - int(float(m.group(1)) * REL_UNITS[m.group(2)])
+    if v.isdigit() and len(v) >= 9:
+        return int(v)
+    if len(v) == 10 and v[4] == "-" and v[7] == "-":
+        v += "T00:00:00Z"
+    es = parse_ts_to_epoch_s(v if v.endswith("Z") else v + "Z")
+    if es is None:
+        es = parse_compact_to_epoch_s(v)
+    if es is None:
+        raise ValueError(f"unrecognized time: {value}")
+    return es
+
+def frame_epoch(frame: Dict[str, Any]) -> int:
+    try:
+        return int(frame["hotspots_meta"]["world_zdos"]["epoch"])
+    except Exception:
+        return -1
+
+def frame_rows(frame: Dict[str, Any], metric: str) -> Dict[Tuple[int, ...], float]:
+    """The frame's values per key, without rows it only repeats from earlier buckets.
+
+    Flow edges and players stay in frames for their TTL; only rows whose `last_seen` is this
+    frame's bucket are new (frames written before `last_seen` existed count every row).
+    World ZDO counts are a per-epoch snapshot; callers keep one frame per epoch (see run_task).
+    """
+    rows: Dict[Tuple[int, ...], float] = {}
+    t = (frame.get("meta") or {}).get("t")
+    if metric == "hotspots":
+        for z in (frame.get("hotspots") or {}).get("world_zdos") or []:
+            try:
+                key = (int(z["zx"]), int(z["zy"]))
+                rows[key] = rows.get(key, 0.0) + float(z.get("count", 0))
+            except Exception:
+                continue
+    elif metric == "flow":
+        for e in frame.get("flow") or []:
+            if e.get("last_seen", t) != t:
+                continue
+            try:
+                a, b = e["a"], e["b"]
+                key = (int(a["zx"]), int(a["zy"]), int(b["zx"]), int(b["zy"]))
+                rows[key] = rows.get(key, 0.0) + float(e.get("c", 0))
+            except Exception:
+                continue
+    else:
+        for p in frame.get("players") or []:
+            if p.get("last_seen", t) != t:
+                continue
+            try:
+                key = (int(p["zx"]), int(p["zy"]))
+            except Exception:
+                continue
+            rows[key] = rows.get(key, 0.0) + 1.0
+    return rows
+
+def fold(part: Partial, rows: Dict[Tuple[int, ...], float]) -> None:
+    for key, v in rows.items():
+        acc = part.get(key)
+        if acc is None:
+            part[key] = [v, v, 1]
+        else:
+            acc[0] += v
+            if v > acc[1]:
+                acc[1] = v
+            acc[2] += 1
+
+def merge(into: Partial, part: Partial) -> None:
+    for key, (s, mx, n) in part.items():
+        acc = into.get(key)
+        if acc is None:
+            into[key] = [s, mx, n]
+        else:
+            acc[0] += s
+            if mx > acc[1]:
+                acc[1] = mx
+            acc[2] += n
+
+def run_task(task: Tuple[Any, ...]) -> Tuple[Partial, int, int, Optional[EpochRows], Optional[EpochRows]]:
+    """Decode one batch of frames in time order and reduce it (runs in a worker process).
+
+    Dedupe refs are read once with the number of buckets they stand for as `weight`; their
+    rows are not new in the referencing buckets, so the weight only counts frames. Returns the
+    partial, the frames read, the world ZDO epochs folded into the partial, and the open epochs.
+    """
+    kind, metric = task[0], task[1]
+    part: Partial = {}
+    frames = 0
+    epochs = 0
+    head: Optional[EpochRows] = None
+    tail: Optional[EpochRows] = None
+
+    def feed(frame: Dict[str, Any], weight: int) -> None:
+        nonlocal frames, epochs, head, tail
+        frames += weight
+        if metric != "hotspots":
+            fold(part, frame_rows(frame, metric))
+            return
+        epoch = frame_epoch(frame)
+        if epoch < 0:
+            return
+        if tail is not None and tail[0] != epoch:
+            # The previous epoch is closed; the task's first one may have started in the task before.
+            if head is None:
+                head = tail
+            else:
+                fold(part, tail[1])
+                epochs += 1
+        # Counts only grow within an epoch, so its last frame holds the final snapshot.
+        tail = (epoch, frame_rows(frame, metric))
+
+    if kind == "files":
+        for _, path, weight in task[2]:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    frame = json.load(f)
+            except Exception:
+                continue
+            feed(frame, weight)
+    else:
+        arc = FrameArchive(task[2])
+        for sec in task[3]:
+            frame = arc.get(sec)
+            if frame is not None:
+                feed(frame, 1)
+    return part, frames, epochs, head, tail
+
+def run_tasks(tasks: List[Tuple[Any, ...]], workers: int) -> Tuple[Partial, int, int]:
+    """Merge the task results; returns the total, the frames read and the world ZDO epochs folded."""
+    total: Partial = {}
+    n_frames = 0
+    n_epochs = 0
+    if workers == 1 or len(tasks) <= 1:
+        results = [run_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(run_task, tasks))
+    # Results are in time order; stitch each task's open epochs onto its neighbours.
+    carry: Optional[EpochRows] = None
+    for part, frames, epochs, head, tail in results:
+        n_frames += frames
+        n_epochs += epochs
+        if head is not None:
+            if carry is not None and carry[0] != head[0]:
+                fold(total, carry[1])
+                n_epochs += 1
+            fold(total, head[1])
+            n_epochs += 1
+            carry = None
+        if tail is not None:
+            if carry is not None and carry[0] != tail[0]:
+                fold(total, carry[1])
+                n_epochs += 1
+            carry = tail
+        merge(total, part)
+    if carry is not None:
+        fold(total, carry[1])
+        n_epochs += 1
+    return total, n_frames, n_epochs
+
+def plan_tasks(
+    out_dir: str,
+    frames_dir: str,
+    archive_dir: Optional[str],
+    metric: str,
+    start_s: int,
+    end_s: int,
+) -> Tuple[List[Tuple[Any, ...]], Dict[str, int]]:
+    """Select frames in [start_s, end_s] via the filename/refs time index and archive indexes.
+
+    Tasks come back in time order. Archive tasks are block-aligned, so each gzip block is
+    decompressed by one worker only.
+    """
+    listed = list_frames(os.path.join(out_dir, frames_dir))
+    secs = [f["sec"] for f in listed]
+    lo, hi = bisect.bisect_left(secs, start_s), bisect.bisect_right(secs, end_s)
+    # Dedupe refs share one file: read it once, weight it by the number of buckets it stands for.
+    weights: Dict[str, List[int]] = {}
+    covered = set()
+    for f in listed[lo:hi]:
+        path = os.path.join(out_dir, frames_dir, f["url"].split("/", 1)[1])
+        w = weights.setdefault(path, [f["sec"], 0])
+        w[1] += 1
+        covered.add(f["sec"])
+    files = sorted((sec, path, n) for path, (sec, n) in weights.items())
+    planned: List[Tuple[int, Tuple[Any, ...]]] = [
+        (files[i][0], ("files", metric, files[i:i + TASK_FRAMES])) for i in range(0, len(files), TASK_FRAMES)
+    ]
+    stats = {"live_frames": hi - lo, "live_files": len(files), "archive_frames": 0, "archives": 0}
+
+    # Each frames dir is rotated into its own archives (frames_<N>s_YYYY-MM.vfa).
+    if archive_dir:
+        for info in list_frame_archives(archive_dir, frames_dir):
+            a = parse_ts_to_epoch_s(info.get("earliest"))
+            b = parse_ts_to_epoch_s(info.get("latest"))
+            if a is None or b is None or b < start_s or a > end_s:
+                continue
+            index_path = os.path.join(archive_dir, info["index"])
+            arc = FrameArchive(index_path)
+            i, j = bisect.bisect_left(arc.secs, start_s), bisect.bisect_right(arc.secs, end_s)
+            blocks: Dict[int, List[int]] = {}
+            for e in arc.frames[i:j]:
+                if int(e["sec"]) not in covered:
+                    blocks.setdefault(int(e["block"]), []).append(int(e["sec"]))
+            if not blocks:
+                continue
+            stats["archives"] += 1
+            for blk in sorted(blocks):
+                stats["archive_frames"] += len(blocks[blk])
+                planned.append((blocks[blk][0], ("archive", metric, index_path, blocks[blk])))
+    planned.sort(key=lambda p: p[0])
+    return [task for _, task in planned], stats
+
+def build_rows(total: Partial, metric: str, agg: str, n_frames: int, n_epochs: int, top: int) -> List[Dict[str, Any]]:
+    """Rows by value; hotspots hold one snapshot per world ZDO epoch, so their mean is per epoch."""
+    per = n_epochs if metric == "hotspots" else n_frames
+    rows = []
+    for key, (s, mx, n) in total.items():
+        value = s if agg == "sum" else mx if agg == "max" else s / max(1, per)
+        if metric == "flow":
+            row: Dict[str, Any] = {"ax": key[0], "ay": key[1], "bx": key[2], "by": key[3]}
+        else:
+            row = {"zx": key[0], "zy": key[1]}
+        row["value"] = round(value, 4)
+        row["frames_present"] = int(n)
+        rows.append(row)
+    rows.sort(key=lambda r: (-r["value"], -r["frames_present"]))
+    return rows[:top] if top > 0 else rows
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Aggregate frames over a time range.")
+    ap.add_argument("--root", default=os.getcwd(), help="Repo root (default: cwd)")
+    ap.add_argument("--out", default=None, help="Output dir with frames (default: <root>/out)")
+    ap.add_argument("--archive-dir", default=None, help="Rotated archives (default: <root>/archive)")
+    ap.add_argument("--from", dest="start", required=True, help="Start (ISO/…Z, YYYY-MM-DD, compact, epoch, or relative: --from=-7d)")
+    ap.add_argument("--to", dest="end", default="now", help="End, inclusive (default: now)")
+    ap.add_argument("--metric", choices=METRICS, default="hotspots", help="hotspots=world ZDO counts, flow=edges, presence=player-frames per zone")
+    ap.add_argument("--agg", choices=AGGS, default="sum", help="mean is per frame in range, per world scan epoch for hotspots (absent = 0)")
+    ap.add_argument("--cadence", type=int, default=None, help="Read frames_<N>s rollups instead of the primary frames")
+    ap.add_argument("--top", type=int, default=50, help="Rows to output (0 = all)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Decode processes (1 = in-process)")
+    ap.add_argument("--format", choices=("json", "csv"), default="json")
+    ap.add_argument("--output", default="-", help="Output file (default: stdout)")
+    return ap.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    t0 = time.monotonic()
+    now_s = int(time.time())
+    root = os.path.abspath(args.root)
+    out_dir = os.path.abspath(args.out or os.path.join(root, "out"))
+    archive_dir = os.path.abspath(args.archive_dir or os.path.join(root, "archive"))
+    start_s = parse_time_arg(args.start, now_s)
+    end_s = parse_time_arg(args.end, now_s)
+    assert start_s is not None and end_s is not None
+    frames_dir = f"frames_{args.cadence}s" if args.cadence else "frames"
+    if args.cadence and not os.path.isdir(os.path.join(out_dir, frames_dir)):
+        frames_dir = "frames"  # the primary cadence lives in frames/
+
+    tasks, stats = plan_tasks(out_dir, frames_dir, archive_dir, args.metric, start_s, end_s)
+    total, n_frames, n_epochs = run_tasks(tasks, max(1, int(args.workers)))
+
+    rows = build_rows(total, args.metric, args.agg, n_frames, n_epochs, args.top)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        if args.format == "csv":
+            fields = (["ax", "ay", "bx", "by"] if args.metric == "flow" else ["zx", "zy"]) + ["value", "frames_present"]
+            w = csv.DictWriter(out, fieldnames=fields, lineterminator="\n")
+            w.writeheader()
+            w.writerows(rows)
+        else:
+            json.dump(
+                {
+                    "query": {
+                        "from": iso_utc(start_s),
+                        "to": iso_utc(end_s),
+                        "metric": args.metric,
+                        "agg": args.agg,
+                        "frames_dir": frames_dir,
+                    },
+                    "frames_read": n_frames,
+                    "epochs_read": n_epochs,
+                    "sources": stats,
+                    "keys_total": len(total),
+                    "elapsed_s": round(time.monotonic() - t0, 3),
+                    "rows": rows,
+                },
+                out,
+                indent=2,
+            )
+            out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"[query] frames={n_frames} tasks={len(tasks)} elapsed={time.monotonic() - t0:.2f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
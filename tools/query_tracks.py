@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Queries over the per-player track store (aggregator.py --tracks).
+
+  python tools/query_tracks.py --tracks ./tracks replay --player 76561198000000000 --from 2024-05-04T18:00:00Z --to 2024-05-04T19:00:00Z
+  python tools/query_tracks.py --tracks ./tracks zone --zone 3,-2 --from=-7d
+  python tools/query_tracks.py --tracks ./tracks players --from=-1d
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from heatflow.common import iso_utc  # noqa: E402
+from heatflow.tracks import replay_track, track_days, track_index, zone_visitors  # noqa: E402
+from query_atlas import parse_time_arg  # noqa: E402
+
+def list_players(tracks_dir: str, start_s: int, end_s: int) -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
+    for day in track_days(tracks_dir, start_s, end_s):
+        for pid, ent in track_index(tracks_dir, day).get("players", {}).items():
+            if ent["t1"] < start_s or ent["t0"] > end_s:
+                continue
+            cur = out.setdefault(pid, {"name": ent.get("name", ""), "first": ent["t0"], "last": ent["t1"], "samples": 0})
+            cur["first"] = min(cur["first"], ent["t0"])
+            cur["last"] = max(cur["last"], ent["t1"])
+            cur["samples"] += ent["n"]
+    return out
+
+def write_rows(rows: List[Dict[str, Any]], fmt: str, meta: Dict[str, Any]) -> None:
+    if fmt == "csv":
+        if rows:
+            w = csv.DictWriter(sys.stdout, fieldnames=list(rows[0].keys()), lineterminator="\n")
+            w.writeheader()
+            w.writerows(rows)
+        return
+    json.dump({**meta, "rows": rows}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=os.getcwd(), help="Repo root (default: cwd)")
+    ap.add_argument("--tracks", default=None, help="Track store dir (default: <root>/tracks)")
+    ap.add_argument("--format", choices=("json", "csv"), default="json")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("replay", "zone", "players"):
+        sp = sub.add_parser(name)
+        sp.add_argument("--from", dest="start", required=True, help="Start (ISO/…Z, YYYY-MM-DD, epoch, or --from=-7d)")
+        sp.add_argument("--to", dest="end", default="now", help="End, inclusive (default: now)")
+        if name == "replay":
+            sp.add_argument("--player", required=True, help="Player id")
+        if name == "zone":
+            sp.add_argument("--zone", required=True, help="zx,zy")
+    return ap.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    t0 = time.monotonic()
+    now_s = int(time.time())
+    tracks_dir = os.path.abspath(args.tracks or os.path.join(args.root, "tracks"))
+    start_s = parse_time_arg(args.start, now_s)
+    end_s = parse_time_arg(args.end, now_s)
+    assert start_s is not None and end_s is not None
+    meta: Dict[str, Any] = {"query": args.cmd, "from": iso_utc(start_s), "to": iso_utc(end_s)}
+
+    rows: List[Dict[str, Any]]
+    if args.cmd == "replay":
+        meta["player"] = args.player
+        rows = [
+            {"t": iso_utc(t), "x": x, "z": z}
+            for t, x, z in replay_track(tracks_dir, args.player, start_s, end_s)
+        ]
+    else:
+        if args.cmd == "zone":
+            zx, zy = (int(v) for v in args.zone.split(","))
+            meta["zone"] = [zx, zy]
+            found = zone_visitors(tracks_dir, zx, zy, start_s, end_s)
+        else:
+            found = list_players(tracks_dir, start_s, end_s)
+        rows = [
+            {"player": pid, **{k: v for k, v in info.items() if k == "name"},
+             "first": iso_utc(info["first"]), "last": iso_utc(info["last"]), "samples": info["samples"]}
+            for pid, info in sorted(found.items(), key=lambda kv: kv[1]["first"])
+        ]
+    write_rows(rows, args.format, meta)
+    print(f"[tracks] rows={len(rows)} elapsed={time.monotonic() - t0:.3f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
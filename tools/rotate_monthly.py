@@ -1,25 +1,46 @@
 #!/usr/bin/env python3
 """
 Monthly rotation tool for Heatflow raw JSONL and playback frames.
-Run during a restart window before the plugin initializes.
+Run during a restart window before the plugin initializes, or with --online while the
+plugin and aggregator are running (the aggregator seals and compresses the raw streams).
 """
 from __future__ import annotations
 
 import argparse
+import calendar
 import datetime as dt
 import gzip
+import io
 import json
 import os
 import re
 import shutil
 import subprocess
+import sys
 import tarfile
-from typing import Dict, List, Optional, Tuple
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import IO, Deque, Dict, List, Optional, Tuple
 
 PREFERRED_RAW_DIR_NAMES = ("heatflow", "input", "in", "raw", "data")
 ROTATION_STATE_NAME = ".rotation_state.json"
 
 FRAME_RE = re.compile(r"^frame_(\d{8})T(\d{6})\.json$")
+FRAMES_DIR_RE = re.compile(r"^frames(?:_\d+s)?$")  # out/frames and the extra cadence dirs out/frames_<N>s
+FRAME_REFS_NAME = "frame_refs.jsonl"  # dedupe references written by aggregator.py
+
+DEFAULT_BLOCK_MB = 4
+VERIFY_CHUNK = 4 * 1024 * 1024
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from heatflow.archive import (  # noqa: E402
+    FRAME_ARCHIVE_BLOCK_FRAMES, FRAME_ARCHIVE_INDEX_SUFFIX, FRAME_ARCHIVE_SUFFIX, FrameArchive, write_frame_archive,
+)
+from heatflow.frames import frame_refs_lock  # noqa: E402
+from heatflow.rotation import ROTATE_REQUEST_FILENAME, ROTATE_STATUS_FILENAME  # noqa: E402
+from heatflow.state_store import STATE_DB_FILENAME, StateStore  # noqa: E402
 
 def find_repo_root(start: str) -> str:
     cur = os.path.abspath(start)
@@ -89,6 +110,23 @@ def find_frames_dir(root: str) -> Optional[str]:
             best_count = count
     return best
 
+def find_cadence_frames_dirs(frames_dir: str) -> List[str]:
+    """frames_dir plus its frames_<N>s siblings (one per extra --cadence)."""
+    out = [frames_dir]
+    if os.path.basename(os.path.normpath(frames_dir)) != "frames":
+        return out
+    parent = os.path.dirname(os.path.normpath(frames_dir))
+    for name in sorted(os.listdir(parent)):
+        path = os.path.join(parent, name)
+        if name != "frames" and FRAMES_DIR_RE.match(name) and os.path.isdir(path):
+            out.append(path)
+    return out
+
+def archive_prefix(frames_dir: str) -> str:
+    """Archive file name prefix: the frames dir name, so each cadence gets its own archives."""
+    name = os.path.basename(os.path.normpath(frames_dir))
+    return name if FRAMES_DIR_RE.match(name) else "frames"
+
 def unique_path(path: str) -> str:
     if not os.path.exists(path):
         return path
@@ -100,13 +138,106 @@ def unique_path(path: str) -> str:
             return candidate
         n += 1
 
-def gzip_file(src: str, dst: str, dry_run: bool) -> None:
+class ParallelGzipWriter:
+    """File-like sink that gzips fixed-size blocks on a thread pool (zlib releases the GIL).
+
+    Each block becomes an independent gzip member; concatenated members are a valid gzip
+    stream for `gzip`, `zcat` and Python's `gzip.open`. Output order is preserved and at most
+    2 x workers blocks are in flight, so memory stays bounded for GB-sized inputs.
+    """
+
+    def __init__(self, f_out: IO[bytes], workers: int, block_bytes: int, level: int = 6) -> None:
+        self.f_out = f_out
+        self.block_bytes = max(64 * 1024, int(block_bytes))
+        self.level = level
+        self.workers = max(1, int(workers))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._inflight: Deque[Future] = deque()
+        self._buf = bytearray()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.crc = 0
+
+    def _compress(self, block: bytes) -> bytes:
+        return gzip.compress(block, compresslevel=self.level, mtime=0)
+
+    def _drain(self, keep: int) -> None:
+        while len(self._inflight) > keep:
+            out = self._inflight.popleft().result()
+            self.f_out.write(out)
+            self.bytes_out += len(out)
+
+    def _submit(self, block: bytes) -> None:
+        self._inflight.append(self._pool.submit(self._compress, block))
+        self._drain(2 * self.workers)
+
+    def write(self, data: bytes) -> int:
+        self.bytes_in += len(data)
+        self.crc = zlib.crc32(data, self.crc)
+        self._buf += data
+        while len(self._buf) >= self.block_bytes:
+            block = bytes(self._buf[: self.block_bytes])
+            del self._buf[: self.block_bytes]
+            self._submit(block)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        if self._buf:
+            self._submit(bytes(self._buf))
+            self._buf.clear()
+        self._drain(0)
+        self._pool.shutdown(wait=True)
+        self.f_out.flush()
+
+def verify_gzip(path: str, want_size: int, want_crc: int) -> None:
+    """Post-write integrity check: decompress the whole stream and compare size + CRC32."""
+    size = 0
+    crc = 0
+    with gzip.open(path, "rb") as f:
+        while True:
+            chunk = f.read(VERIFY_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+            crc = zlib.crc32(chunk, crc)
+    if size != want_size or crc != want_crc:
+        raise IOError(f"gzip verify failed for {path}: size {size}!={want_size} or crc mismatch")
+
+def report_throughput(label: str, bytes_in: int, bytes_out: int, elapsed: float) -> None:
+    mb_in = bytes_in / 1_000_000
+    rate = mb_in / elapsed if elapsed > 0 else 0.0
+    ratio = (bytes_out / bytes_in) if bytes_in else 0.0
+    print(f"[rotate] {label}: in={mb_in:.1f}MB out={bytes_out / 1_000_000:.1f}MB ratio={ratio:.3f} {rate:.1f}MB/s elapsed={elapsed:.1f}s")
+
+def gzip_file(src: str, dst: str, dry_run: bool, workers: int = 1, block_bytes: int = DEFAULT_BLOCK_MB << 20) -> None:
     if dry_run:
         return
-    with open(src, "rb") as f_in, gzip.open(dst, "wb") as f_out:
-        shutil.copyfileobj(f_in, f_out)
+    t0 = time.monotonic()
+    with open(src, "rb") as f_in, open(dst, "wb") as f_out:
+        w = ParallelGzipWriter(f_out, workers, block_bytes)
+        try:
+            while True:
+                chunk = f_in.read(block_bytes)
+                if not chunk:
+                    break
+                w.write(chunk)
+        finally:
+            w.close()
+    compress_s = time.monotonic() - t0
+    verify_gzip(dst, w.bytes_in, w.crc)
+    report_throughput(f"gzip {os.path.basename(src)} (verified)", w.bytes_in, w.bytes_out, compress_s)
 
-def rotate_raw_jsonl(raw_dir: str, archive_dir: str, cur_month: str, dry_run: bool) -> int:
+def rotate_raw_jsonl(
+    raw_dir: str,
+    archive_dir: str,
+    cur_month: str,
+    dry_run: bool,
+    workers: int = 1,
+    block_bytes: int = DEFAULT_BLOCK_MB << 20,
+) -> int:
     if not os.path.isdir(raw_dir):
         return 0
     out_dir = os.path.join(archive_dir, cur_month, "raw")
@@ -129,7 +260,7 @@ def rotate_raw_jsonl(raw_dir: str, archive_dir: str, cur_month: str, dry_run: bo
                 moved = True
             gz_path = dest + ".gz"
             gz_path = unique_path(gz_path)
-            gzip_file(dest, gz_path, dry_run)
+            gzip_file(dest, gz_path, dry_run, workers, block_bytes)
             if not dry_run:
                 try:
                     os.remove(dest)
@@ -148,10 +279,104 @@ def rotate_raw_jsonl(raw_dir: str, archive_dir: str, cur_month: str, dry_run: bo
                         pass
     return count
 
-def archive_frames(frames_dir: str, archive_dir: str, target_month: str, dry_run: bool) -> int:
-    if not os.path.isdir(frames_dir):
-        return 0
-    to_archive = []
+def load_frame_refs(frames_dir: str) -> List[Dict[str, object]]:
+    path = os.path.join(frames_dir, FRAME_REFS_NAME)
+    refs: List[Dict[str, object]] = []
+    if not os.path.exists(path):
+        return refs
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for ln in f:
+            ln = ln.strip()
+            if not ln:
+                continue
+            try:
+                rec = json.loads(ln)
+            except Exception:
+                continue
+            if isinstance(rec, dict) and isinstance(rec.get("sec"), int) and isinstance(rec.get("ref"), str):
+                refs.append(rec)
+    return refs
+
+def ref_month(rec: Dict[str, object]) -> str:
+    return dt.datetime.fromtimestamp(int(rec["sec"]), dt.timezone.utc).strftime("%Y-%m")  # type: ignore[arg-type]
+
+def plan_frame_refs(
+    frames_dir: str, target_month: str, archived: List[str]
+) -> Tuple[List[Dict[str, object]], List[Dict[str, object]]]:
+    """Sort the dedupe references touching the frames being archived; nothing is written.
+
+    Returns (moving, materialize): references that belong to `target_month` (they travel with
+    the archive), and references from other months that point at an archived frame (they must
+    become their own frame file before that frame is removed).
+    """
+    archived_names = {os.path.basename(p) for p in archived}
+    moving: List[Dict[str, object]] = []
+    materialize: List[Dict[str, object]] = []
+    for rec in load_frame_refs(frames_dir):
+        if ref_month(rec) == target_month:
+            moving.append(rec)
+        elif rec["ref"] in archived_names:
+            materialize.append(rec)
+    return moving, materialize
+
+def commit_frame_refs(frames_dir: str, moving: List[Dict[str, object]], materialize: List[Dict[str, object]]) -> None:
+    """Apply a plan_frame_refs result once the archive is verified, before frames are removed.
+
+    References in `materialize` are written out as frame files (meta.t rewritten). Then
+    frame_refs.jsonl is rewritten without the moved and materialized records, under the
+    aggregator's frame_refs_lock, so references appended meanwhile are kept.
+    """
+    for rec in materialize:
+        sec = int(rec["sec"])  # type: ignore[arg-type]
+        with open(os.path.join(frames_dir, str(rec["ref"])), "r", encoding="utf-8") as f:
+            frame = json.load(f)
+        if isinstance(frame, dict) and isinstance(frame.get("meta"), dict):
+            frame["meta"]["t"] = dt.datetime.fromtimestamp(sec, dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        name = "frame_" + dt.datetime.fromtimestamp(sec, dt.timezone.utc).strftime("%Y%m%dT%H%M%S") + ".json"
+        tmp = os.path.join(frames_dir, name + ".tmp")
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            json.dump(frame, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, os.path.join(frames_dir, name))
+    drop = {(int(rec["sec"]), str(rec["ref"])) for rec in moving + materialize}  # type: ignore[arg-type]
+    if not drop:
+        return
+    path = os.path.join(frames_dir, FRAME_REFS_NAME)
+    with frame_refs_lock(frames_dir):
+        keep = [rec for rec in load_frame_refs(frames_dir) if (int(rec["sec"]), str(rec["ref"])) not in drop]  # type: ignore[arg-type]
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            for rec in keep:
+                f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        os.replace(tmp, path)
+
+def write_refs_member(tf: tarfile.TarFile, refs: List[Dict[str, object]]) -> None:
+    if not refs:
+        return
+    data = "".join(json.dumps(rec, separators=(",", ":")) + "\n" for rec in refs).encode("utf-8")
+    info = tarfile.TarInfo(FRAME_REFS_NAME)
+    info.size = len(data)
+    tf.addfile(info, io.BytesIO(data))
+
+def verify_tar_members(f_in: IO[bytes], expected: List[str]) -> None:
+    """Read a tar stream end to end and check it holds exactly the expected members."""
+    names = []
+    with tarfile.open(fileobj=f_in, mode="r|") as tf:
+        for member in tf:
+            names.append(member.name)
+            fobj = tf.extractfile(member)
+            if fobj is not None:
+                while fobj.read(VERIFY_CHUNK):
+                    pass
+    if sorted(names) != sorted(expected):
+        raise IOError(f"tar verify failed: {len(names)} members, expected {len(expected)}")
+
+def add_frames_to_tar(tf: tarfile.TarFile, to_archive: List[str], month_refs: List[Dict[str, object]]) -> None:
+    for p in to_archive:
+        tf.add(p, arcname=os.path.basename(p))
+    write_refs_member(tf, month_refs)
+
+def month_frames(frames_dir: str, target_month: str) -> List[str]:
+    out = []
     for name in os.listdir(frames_dir):
         m = FRAME_RE.match(name)
         if not m:
@@ -160,53 +385,226 @@ def archive_frames(frames_dir: str, archive_dir: str, target_month: str, dry_run
         month = f"{ymd[0:4]}-{ymd[4:6]}"
         if month != target_month:
             continue
-        to_archive.append(os.path.join(frames_dir, name))
+        out.append(os.path.join(frames_dir, name))
+    return out
+
+def frame_sec(name: str) -> int:
+    m = FRAME_RE.match(os.path.basename(name))
+    if not m:
+        raise ValueError(f"not a frame filename: {name}")
+    return int(calendar.timegm(dt.datetime.strptime(m.group(1) + m.group(2), "%Y%m%d%H%M%S").timetuple()))
+
+def remove_frame_files(paths: List[str]) -> None:
+    for p in paths:
+        # Precompressed siblings (aggregator --precompress) go with their frame.
+        for suffix in ("", ".gz", ".zst", ".br"):
+            try:
+                os.remove(p + suffix)
+            except Exception:
+                pass
+
+def archive_frames_seekable(
+    frames_dir: str,
+    archive_dir: str,
+    target_month: str,
+    dry_run: bool,
+    workers: int = 1,
+    block_frames: int = FRAME_ARCHIVE_BLOCK_FRAMES,
+) -> int:
+    """Archive a month of frames as <frames dir>_YYYY-MM.vfa + index (random access per frame)."""
+    if not os.path.isdir(frames_dir):
+        return 0
+    to_archive = month_frames(frames_dir, target_month)
+    if not to_archive:
+        return 0
+    month_refs, materialize = plan_frame_refs(frames_dir, target_month, to_archive)
+    if dry_run:
+        return len(to_archive)
+    out_dir = os.path.join(archive_dir, target_month, "frames")
+    os.makedirs(out_dir, exist_ok=True)
+    data_path = unique_path(os.path.join(out_dir, f"{archive_prefix(frames_dir)}_{target_month}{FRAME_ARCHIVE_SUFFIX}"))
+    index_path = data_path[: -len(FRAME_ARCHIVE_SUFFIX)] + FRAME_ARCHIVE_INDEX_SUFFIX
+    frames = [(frame_sec(p), p) for p in to_archive]
+    refs = [(int(rec["sec"]), str(rec["ref"])) for rec in month_refs]  # type: ignore[arg-type]
+    bytes_in = sum(os.path.getsize(p) for p in to_archive)
+
+    t0 = time.monotonic()
+    index = write_frame_archive(data_path, frames, refs, block_frames=block_frames, workers=workers)
+    elapsed = time.monotonic() - t0
+
+    # Verify through the reader before deleting anything: every frame byte-identical, every ref resolvable.
+    arc = FrameArchive(index_path, cache_blocks=2)
+    for sec, p in sorted(frames):
+        with open(p, "rb") as f:
+            if arc.get_bytes(sec) != f.read():
+                raise IOError(f"seekable archive verify failed at {os.path.basename(p)}")
+    for sec, _ref in refs:
+        if arc.get_bytes(sec) is None:
+            raise IOError(f"seekable archive verify failed: unresolved ref at {sec}")
+    report_throughput(
+        f"{archive_prefix(frames_dir)} {target_month} seekable ({len(index['blocks'])} blocks, verified)",
+        bytes_in,
+        os.path.getsize(data_path),
+        elapsed,
+    )
+    commit_frame_refs(frames_dir, month_refs, materialize)
+    remove_frame_files(to_archive)
+    return len(to_archive)
+
+def archive_frames(
+    frames_dir: str,
+    archive_dir: str,
+    target_month: str,
+    dry_run: bool,
+    workers: int = 1,
+    block_bytes: int = DEFAULT_BLOCK_MB << 20,
+) -> int:
+    if not os.path.isdir(frames_dir):
+        return 0
+    to_archive = month_frames(frames_dir, target_month)
     if not to_archive:
         return 0
+    month_refs, materialize = plan_frame_refs(frames_dir, target_month, to_archive)
     out_dir = os.path.join(archive_dir, target_month, "frames")
     os.makedirs(out_dir, exist_ok=True)
-    tar_base = os.path.join(out_dir, f"frames_{target_month}.tar")
+    tar_base = os.path.join(out_dir, f"{archive_prefix(frames_dir)}_{target_month}.tar")
+    expected = [os.path.basename(p) for p in to_archive] + ([FRAME_REFS_NAME] if month_refs else [])
+    bytes_in = sum(os.path.getsize(p) for p in to_archive)
 
     used_zstd = False
     zstd_path = shutil.which("zstd")
     if zstd_path:
-        tar_path = unique_path(tar_base)
         if not dry_run:
-            with tarfile.open(tar_path, "w") as tf:
-                for p in to_archive:
-                    tf.add(p, arcname=os.path.basename(p))
-            zst_path = unique_path(tar_path + ".zst")
+            # Stream tar straight into multithreaded zstd; no intermediate .tar on disk.
+            zst_path = unique_path(tar_base + ".zst")
+            t0 = time.monotonic()
+            procs: List[subprocess.Popen] = []
             try:
-                subprocess.run([zstd_path, "-q", "-f", tar_path, "-o", zst_path], check=True)
+                proc = subprocess.Popen([zstd_path, "-q", "-f", f"-T{max(1, workers)}", "-o", zst_path], stdin=subprocess.PIPE)
+                procs.append(proc)
+                assert proc.stdin is not None
+                with tarfile.open(fileobj=proc.stdin, mode="w|") as tf:
+                    add_frames_to_tar(tf, to_archive, month_refs)
+                proc.stdin.close()
+                if proc.wait() != 0:
+                    raise IOError("zstd failed")
+                elapsed = time.monotonic() - t0
+                check = subprocess.Popen([zstd_path, "-q", "-d", "-c", zst_path], stdout=subprocess.PIPE)
+                procs.append(check)
+                assert check.stdout is not None
+                verify_tar_members(check.stdout, expected)
+                if check.wait() != 0:
+                    raise IOError("zstd verify failed")
+                report_throughput(f"{archive_prefix(frames_dir)} {target_month} tar.zst (verified)", bytes_in, os.path.getsize(zst_path), elapsed)
                 used_zstd = True
-                os.remove(tar_path)
-            except Exception:
+            except Exception as e:
+                print(f"[rotate] zstd archive failed ({e}); falling back to tar.gz")
+                # Stop the children before removing their output, so no zstd keeps writing it.
+                for p in procs:
+                    for pipe in (p.stdin, p.stdout):
+                        try:
+                            if pipe is not None:
+                                pipe.close()
+                        except Exception:
+                            pass
+                    if p.poll() is None:
+                        p.kill()
+                    p.wait()
+                try:
+                    os.remove(zst_path)
+                except FileNotFoundError:
+                    pass
                 used_zstd = False
         else:
             used_zstd = True
     if not used_zstd:
         tgz_path = unique_path(tar_base + ".gz")
         if not dry_run:
-            with tarfile.open(tgz_path, "w:gz") as tf:
-                for p in to_archive:
-                    tf.add(p, arcname=os.path.basename(p))
+            t0 = time.monotonic()
+            with open(tgz_path, "wb") as f_out:
+                w = ParallelGzipWriter(f_out, workers, block_bytes)
+                try:
+                    with tarfile.open(fileobj=w, mode="w|") as tf:  # type: ignore[arg-type]
+                        add_frames_to_tar(tf, to_archive, month_refs)
+                finally:
+                    w.close()
+            elapsed = time.monotonic() - t0
+            verify_gzip(tgz_path, w.bytes_in, w.crc)
+            with gzip.open(tgz_path, "rb") as f_in:
+                verify_tar_members(f_in, expected)  # type: ignore[arg-type]
+            report_throughput(f"{archive_prefix(frames_dir)} {target_month} tar.gz (verified)", bytes_in, w.bytes_out, elapsed)
 
     if not dry_run:
-        for p in to_archive:
-            try:
-                os.remove(p)
-            except Exception:
-                pass
+        commit_frame_refs(frames_dir, month_refs, materialize)
+        remove_frame_files(to_archive)
     return len(to_archive)
 
+def prune_frame_index(state_dir: str, frames_dir: str) -> None:
+    """Keep the aggregator's SQLite frame index (--state-store sqlite) in step with removed frames."""
+    db_path = os.path.join(state_dir, STATE_DB_FILENAME)
+    if not os.path.exists(db_path):
+        return
+    store = StateStore(db_path)
+    try:
+        n = store.prune_missing(os.path.basename(os.path.normpath(frames_dir)), frames_dir)
+    finally:
+        store.close()
+    print(f"[rotate] frame index: removed {n} rows from {db_path}")
+
+def request_online_rotation(state_dir: str, archive_dir: str, cur_month: str, timeout_s: int, dry_run: bool) -> str:
+    """Ask the running aggregator to seal its streams at the consumed offsets (see heatflow.rotation.OnlineRotation)."""
+    req_id = dt.datetime.now(dt.timezone.utc).strftime("%Y%m%dT%H%M%S")
+    req = {
+        "id": req_id,
+        "month": cur_month,
+        "archive_dir": archive_dir,
+        "timeout_s": int(timeout_s),
+        "requested_at": dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    if not dry_run:
+        os.makedirs(state_dir, exist_ok=True)
+        path = os.path.join(state_dir, ROTATE_REQUEST_FILENAME)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            json.dump(req, f, indent=2)
+        os.replace(tmp, path)
+    print(f"[rotate] online request {req_id} -> {state_dir}")
+    return req_id
+
+def wait_online_rotation(state_dir: str, req_id: str, wait_s: float) -> Optional[Dict[str, object]]:
+    path = os.path.join(state_dir, ROTATE_STATUS_FILENAME)
+    deadline = time.monotonic() + wait_s
+    while time.monotonic() < deadline:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                status = json.load(f)
+            if status.get("id") == req_id and status.get("finished"):
+                return status
+        except Exception:
+            pass
+        time.sleep(1.0)
+    return None
+
 def parse_args() -> argparse.Namespace:
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", default=None, help="Repo root (auto-detect if omitted)")
     ap.add_argument("--raw-dir", default=None, help="Raw JSONL directory override")
-    ap.add_argument("--frames-dir", default=None, help="Frames directory override")
+    ap.add_argument("--frames-dir", default=None, help="Frames directory override (its frames_<N>s siblings are rotated too)")
     ap.add_argument("--archive-dir", default=None, help="Archive output directory override")
     ap.add_argument("--dry-run", action="store_true", help="Show actions without modifying files")
     ap.add_argument("--force", action="store_true", help="Rotate even if already done this month")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Compression threads (default: all cores)")
+    ap.add_argument("--block-mb", type=float, default=DEFAULT_BLOCK_MB, help="Parallel gzip block size in MB")
+    ap.add_argument(
+        "--frames-format",
+        choices=("seekable", "tar"),
+        default="seekable",
+        help="seekable: indexed .vfa archive readable per frame (default); tar: tar.zst/tar.gz",
+    )
+    ap.add_argument("--online", action="store_true", help="Rotate raw JSONL through the running aggregator (no restart window)")
+    ap.add_argument("--state-dir", default=None, help="Aggregator state dir for --online and the sqlite frame index (default: <root>/state)")
+    ap.add_argument("--online-timeout", type=int, default=120, help="Seconds the aggregator keeps trying to rename each stream")
+    ap.add_argument("--wait", type=float, default=0.0, help="Wait up to N seconds for the online rotation to finish")
     return ap.parse_args()
 
 def main() -> int:
@@ -230,17 +628,44 @@ def main() -> int:
         candidates = find_jsonl_candidates(root)
         raw_dir = candidates[0] if candidates else None
     frames_dir = args.frames_dir or find_frames_dir(root)
+    frames_dirs = find_cadence_frames_dirs(frames_dir) if frames_dir else []
 
     print(f"[rotate] root={root}")
     print(f"[rotate] raw_dir={raw_dir or 'N/A'}")
-    print(f"[rotate] frames_dir={frames_dir or 'N/A'}")
+    print(f"[rotate] frames_dirs={', '.join(frames_dirs) or 'N/A'}")
     print(f"[rotate] archive_dir={archive_dir}")
     print(f"[rotate] month={cur_month} prev={prev_month_str}")
 
-    raw_count = rotate_raw_jsonl(raw_dir, archive_dir, cur_month, args.dry_run) if raw_dir else 0
-    frame_count = archive_frames(frames_dir, archive_dir, prev_month_str, args.dry_run) if frames_dir else 0
+    workers = max(1, int(args.workers))
+    block_bytes = max(64 * 1024, int(float(args.block_mb) * 1024 * 1024))
+    print(f"[rotate] workers={workers} block_bytes={block_bytes}")
+
+    t0 = time.monotonic()
+    if args.online:
+        state_dir = os.path.abspath(args.state_dir or os.path.join(root, "state"))
+        req_id = request_online_rotation(state_dir, archive_dir, cur_month, args.online_timeout, args.dry_run)
+        raw_count = 0
+        if args.wait > 0 and not args.dry_run:
+            status = wait_online_rotation(state_dir, req_id, args.wait)
+            if status is None:
+                print(f"[rotate] online rotation not finished after {args.wait:.0f}s; see {ROTATE_STATUS_FILENAME}")
+            else:
+                for key, info in (status.get("streams") or {}).items():  # type: ignore[union-attr]
+                    print(f"[rotate] online {key}: {info}")
+                    raw_count += 1 if info.get("state") == "done" else 0
+    else:
+        raw_count = rotate_raw_jsonl(raw_dir, archive_dir, cur_month, args.dry_run, workers, block_bytes) if raw_dir else 0
+    frame_count = 0
+    for fdir in frames_dirs:
+        if args.frames_format == "seekable":
+            n = archive_frames_seekable(fdir, archive_dir, prev_month_str, args.dry_run, workers)
+        else:
+            n = archive_frames(fdir, archive_dir, prev_month_str, args.dry_run, workers, block_bytes)
+        if n and not args.dry_run:
+            prune_frame_index(os.path.abspath(args.state_dir or os.path.join(root, "state")), fdir)
+        frame_count += n
 
-    print(f"[rotate] raw_rotated={raw_count} frames_archived={frame_count}")
+    print(f"[rotate] raw_rotated={raw_count} frames_archived={frame_count} elapsed={time.monotonic() - t0:.1f}s")
 
     state = {
         "last_rotated_month": cur_month,
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Static file server for the viewer with access to rotated (archived) months.
+
+Drop-in for `python -m http.server --directory out`, plus:
+  /archive/<path>                    files under the archive dir, with HTTP Range support
+                                     (seekable .vfa blocks can be fetched individually)
+  /archive/frame/<YYYYMMDDTHHMMSS>.json
+                                     one archived frame, decoded from its seekable archive
+"""
+from __future__ import annotations
+
+import argparse
+import calendar
+import datetime as dt
+import json
+import os
+import re
+import sys
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from heatflow.archive import FrameArchive, list_frame_archives, open_frame_archives  # noqa: E402
+
+COMPACT_RE = re.compile(r"^/archive/frame/(\d{8}T\d{6})\.json$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+class ArchiveSet:
+    """Open seekable archives, reloaded when the archive dir listing changes."""
+
+    def __init__(self, archive_dir: str) -> None:
+        self.archive_dir = archive_dir
+        self._lock = threading.Lock()
+        self._key: Optional[Tuple[str, ...]] = None
+        self._archives: List[FrameArchive] = []
+
+    def archives(self) -> List[FrameArchive]:
+        infos = list_frame_archives(self.archive_dir)
+        key = tuple(f"{i['index']}:{i.get('latest')}" for i in infos)
+        with self._lock:
+            if key != self._key:
+                self._archives = open_frame_archives(self.archive_dir)
+                self._key = key
+            return list(self._archives)
+
+    def frame_bytes(self, bucket_s: int) -> Optional[bytes]:
+        for arc in self.archives():
+            frame = arc.get(bucket_s)
+            if frame is not None:
+                return json.dumps(frame, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return None
+
+def make_handler(out_dir: str, archives: ArchiveSet):
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *a, **kw) -> None:
+            super().__init__(*a, directory=out_dir, **kw)
+
+        def translate_path(self, path: str) -> str:
+            clean = path.split("?", 1)[0].split("#", 1)[0]
+            if clean.startswith("/archive/"):
+                rel = os.path.normpath(clean[len("/archive/"):]).lstrip(os.sep)
+                if rel.startswith(".."):
+                    return os.path.join(archives.archive_dir, "__forbidden__")
+                return os.path.join(archives.archive_dir, rel)
+            return super().translate_path(path)
+
+        def _send_bytes(self, data: bytes, ctype: str) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Cache-Control", "public, max-age=86400")
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(data)
+
+        def _send_range(self, path: str) -> bool:
+            m = RANGE_RE.match(self.headers.get("Range", "").strip())
+            if not m or not os.path.isfile(path):
+                return False
+            size = os.path.getsize(path)
+            a, b = m.group(1), m.group(2)
+            if a == "" and b == "":
+                return False
+            if a == "":
+                start, end = max(0, size - int(b)), size - 1
+            else:
+                start, end = int(a), (int(b) if b else size - 1)
+            end = min(end, size - 1)
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return True
+            self.send_response(206)
+            self.send_header("Content-Type", self.guess_type(path))
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+            if self.command != "HEAD":
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    self.wfile.write(f.read(end - start + 1))
+            return True
+
+        def _send_special(self) -> bool:
+            m = COMPACT_RE.match(self.path.split("?", 1)[0])
+            if m:
+                sec = calendar.timegm(dt.datetime.strptime(m.group(1), "%Y%m%dT%H%M%S").timetuple())
+                data = archives.frame_bytes(int(sec))
+                if data is None:
+                    self.send_error(404, "frame not archived")
+                else:
+                    self._send_bytes(data, "application/json")
+                return True
+            return "Range" in self.headers and self._send_range(self.translate_path(self.path))
+
+        def do_GET(self) -> None:
+            if not self._send_special():
+                super().do_GET()
+
+        def do_HEAD(self) -> None:
+            if not self._send_special():
+                super().do_HEAD()
+
+        def end_headers(self) -> None:
+            self.send_header("Accept-Ranges", "bytes")
+            super().end_headers()
+
+    return Handler
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=os.getcwd(), help="Repo root (default: cwd)")
+    ap.add_argument("--out", default=None, help="Viewer directory (default: <root>/out)")
+    ap.add_argument("--archive-dir", default=None, help="Archive directory (default: <root>/archive)")
+    ap.add_argument("--bind", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    return ap.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    root = os.path.abspath(args.root)
+    out_dir = os.path.abspath(args.out or os.path.join(root, "out"))
+    archive_dir = os.path.abspath(args.archive_dir or os.path.join(root, "archive"))
+    archives = ArchiveSet(archive_dir)
+    print(f"[serve] out={out_dir} archive={archive_dir} months={len(list_frame_archives(archive_dir))}")
+    httpd = ThreadingHTTPServer((args.bind, args.port), make_handler(out_dir, archives))
+    print(f"[serve] http://{args.bind}:{args.port}/")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())